@@ -1,5 +1,6 @@
 import importlib_metadata as metadata
 
+from .. import profiler
 from ..objutils import memoize
 
 
@@ -32,7 +33,9 @@ class BuildRuleHandler:
 
     def run(self, edges, *args, **kwargs):
         for e in edges:
-            self.handlers[type(e)](e, *args, **kwargs)
+            kind = type(e)
+            with profiler.phase(kind.__name__, 'rule_handler'):
+                self.handlers[kind](e, *args, **kwargs)
 
 
 class BuildHook:
@@ -45,4 +48,5 @@ class BuildHook:
 
     def run(self, *args, **kwargs):
         for i in self.hooks:
-            i(*args, **kwargs)
+            with profiler.phase(i.__name__, 'hook'):
+                i(*args, **kwargs)
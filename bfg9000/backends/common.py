@@ -0,0 +1,42 @@
+from .. import safe_str
+
+__all__ = ['SharedVariables']
+
+
+class SharedVariables:
+    # Lots of rules set a variable to the same value (e.g. compiling each file
+    # in a target with the same flags). The first time we see a value, just
+    # return it; after that, hoist it into a numbered global variable so that
+    # it's only written out (and parsed) once.
+
+    def __init__(self, buildfile, var):
+        self._buildfile = buildfile
+        self._var = var
+
+        # Values that have been shared, and the global variables created to
+        # hold them.
+        self._values = {}
+        self._counts = {}
+
+    def __call__(self, name, value, section):
+        name = self._var(name)
+        try:
+            key = (name, safe_str.render_key(value))
+        except TypeError:
+            key = (name, self._buildfile._shell_str(value))
+
+        shared = self._values.get(key)
+        if shared is None:
+            self._values[key] = False
+            return value
+        elif shared is False:
+            count = self._counts.get(name, 0)
+            while True:
+                count += 1
+                shared = self._var('{}_{}'.format(name.name, count))
+                if not self._buildfile.has_variable(shared):
+                    break
+            self._counts[name] = count
+            self._values[key] = self._buildfile.variable(shared, value,
+                                                         section)
+        return shared
@@ -82,5 +82,5 @@ def write(env, build_inputs):
         if type(e) in _rule_handlers:
             _rule_handlers[type(e)](e, build_inputs, buildfile, env)
 
-    with open(filepath.string(env.base_dirs), 'w') as out:
+    with path.update_file(filepath, env.base_dirs) as out:
         buildfile.write(out)
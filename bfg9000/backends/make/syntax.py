@@ -1,13 +1,17 @@
+import functools
 import re
+import shutil
 from collections import namedtuple
 from enum import Enum
 from io import StringIO
+from tempfile import SpooledTemporaryFile
 
 from ... import path
 from ... import safe_str
 from ... import iterutils
 from ...platforms.host import platform_info
 from ...tools.common import Command
+from ..common import SharedVariables
 
 # XXX: Make currently only supports sh-style shells.
 from ...shell import posix as pshell
@@ -22,6 +26,13 @@ Include = namedtuple('Include', ['name', 'optional'])
 Syntax = Enum('Syntax', ['target', 'dependency', 'function', 'shell', 'clean'])
 Section = Enum('Section', ['path', 'command', 'flags', 'other'])
 
+# The maximum size of the in-memory buffer for streamed rules before spilling
+# them to disk.
+_spool_size = 1024 * 1024
+
+# The maximum number of distinct escaped tokens to remember.
+_token_cache_size = 64 * 1024
+
 _comment_tmpl = """
 # Do not edit this file! It was automatically generated by bfg9000.
 # Instead, you should edit the source file that created this:
@@ -59,6 +70,9 @@ class Writer:
     def __init__(self, stream, path_vars):
         self.stream = stream
         self.path_vars = path_vars
+        # Paths are written many times over (e.g. include dirs on every
+        # compilation), so remember how we rendered each of them.
+        self._paths = {}
 
     @classmethod
     def escape_str(cls, string, syntax):
@@ -82,56 +96,79 @@ class Writer:
             "unknown syntax '{}'".format(syntax)
         )  # pragma: no cover
 
+    @classmethod
+    @functools.lru_cache(maxsize=_token_cache_size)
+    def _escape_token(cls, string, syntax, shell_quote):
+        # Most tokens (flags, file names, etc) are written repeatedly, and most
+        # of those don't need escaping anyway, so cache the results.
+        escaped = False
+        if syntax in [Syntax.function, Syntax.shell] and shell_quote:
+            string, escaped = shell_quote(string)
+        return cls.escape_str(string, syntax), escaped
+
     def quote(self, string):
         return pshell.quote(string)
 
     def write_literal(self, string):
         self.stream.write(string)
 
-    def write(self, thing, syntax, shell_quote=pshell.quote_info):
+    def _render(self, thing, syntax, shell_quote):
+        # Convert `thing` to its escaped form, returning the resulting string
+        # and whether it needed to be escaped.
         thing = safe_str.safe_str(thing)
-        shelly = syntax in [Syntax.function, Syntax.shell]
-        escaped = False
 
-        if isinstance(thing, safe_str.literal):
-            escaped = True
-            self.write_literal(thing.string)
+        if isinstance(thing, str):
+            return self._escape_token(thing, syntax, shell_quote)
+        elif isinstance(thing, safe_str.literal):
+            return thing.string, True
         elif isinstance(thing, safe_str.shell_literal):
-            escaped = True
-            self.write_literal(self.escape_str(thing.string, syntax))
-        elif isinstance(thing, str):
-            if shelly and shell_quote:
-                thing, escaped = shell_quote(thing)
-            self.write_literal(self.escape_str(thing, syntax))
+            return self.escape_str(thing.string, syntax), True
         elif isinstance(thing, syntax_string):
-            out = Writer(StringIO(), self.path_vars)
-            escaped = out.write(thing.data, thing.syntax or syntax,
-                                None if thing.quoted else shell_quote)
-            result = out.stream.getvalue()
+            result, escaped = self._render(
+                thing.data, thing.syntax or syntax,
+                None if thing.quoted else shell_quote
+            )
             if thing.quoted:
                 result = pshell.wrap_quotes(result)
-            self.write_literal(result)
+            return result, escaped
         elif isinstance(thing, safe_str.jbos):
+            result, escaped = [], False
             for i in thing.bits:
-                escaped |= self.write(i, syntax, shell_quote)
+                r, e = self._render(i, syntax, shell_quote)
+                result.append(r)
+                escaped |= e
+            return ''.join(result), escaped
         elif isinstance(thing, path.BasePath):
-            out = Writer(StringIO(), self.path_vars)
-            thing = thing.realize(self.path_vars, shelly)
-            escaped = out.write(thing, syntax, pshell.inner_quote_info)
-
-            thing = out.stream.getvalue()
+            key = (thing, syntax)
+            try:
+                return self._paths[key]
+            except KeyError:
+                pass
+
+            shelly = syntax in [Syntax.function, Syntax.shell]
+            result, escaped = self._render(
+                thing.realize(self.path_vars, shelly), syntax,
+                pshell.inner_quote_info
+            )
             if shelly and escaped:
-                thing = pshell.wrap_quotes(thing)
-            self.write_literal(thing)
-        else:
-            raise TypeError(type(thing))
+                result = pshell.wrap_quotes(result)
+            self._paths[key] = result, escaped
+            return result, escaped
 
+        raise TypeError(type(thing))
+
+    def write(self, thing, syntax, shell_quote=pshell.quote_info):
+        result, escaped = self._render(thing, syntax, shell_quote)
+        self.write_literal(result)
         return escaped
 
     def write_each(self, things, syntax, delim=safe_str.literal(' '),
                    prefix=None, suffix=None, shell_quote=pshell.quote_info):
-        for i in iterutils.tween(things, delim, prefix, suffix):
-            self.write(i, syntax, shell_quote)
+        # Render everything first so we only need to write to the stream once.
+        self.write_literal(''.join(
+            self._render(i, syntax, shell_quote)[0]
+            for i in iterutils.tween(things, delim, prefix, suffix)
+        ))
 
     def write_shell(self, thing, syntax=Syntax.shell):
         if isinstance(thing, Silent):
@@ -243,7 +280,7 @@ class Silent:
 class Makefile:
     Section = Section
 
-    def __init__(self, bfgfile, destdir=False, *, gnu=False):
+    def __init__(self, bfgfile, destdir=False, *, gnu=False, stream=False):
         self.path_vars = {
             path.Root.srcdir  : Variable('srcdir'),
             path.Root.builddir: None,
@@ -260,10 +297,20 @@ class Makefile:
         self._target_variables = []
         self._defines = []
 
+        # When streaming, serialize rules as soon as they're added instead of
+        # holding onto them until we write the file.
         self._rules = []
+        self._rule_stream = (
+            self.writer(SpooledTemporaryFile(_spool_size, 'w+'))
+            if stream else None
+        )
         self._targets = set()
         self._includes = []
 
+        self._shared = SharedVariables(self, var)
+
+        self._scratch = self.writer(StringIO())
+
     def variable(self, name, value, section=Section.other, exist_ok=False):
         name, exists = self._unique_var(name, exist_ok)
         if not exists:
@@ -290,6 +337,9 @@ class Makefile:
         name = cmd.command_var.upper()
         return self.variable(name, cmd.command, Section.command, exist_ok=True)
 
+    def shared_variable(self, name, value, section=Section.flags):
+        return self._shared(name, self._convert_args(value), section)
+
     def has_variable(self, name):
         return var(name) in self._var_table
 
@@ -305,10 +355,19 @@ class Makefile:
         self._includes.append(Include(name, optional))
 
     def _target_str(self, name):
-        out = self.writer(StringIO())
+        out = self._scratch
+        out.stream.seek(0)
+        out.stream.truncate()
         out.write(name, Syntax.target)
         return out.stream.getvalue()
 
+    def _shell_str(self, value):
+        out = self._scratch
+        out.stream.seek(0)
+        out.stream.truncate()
+        out.write_shell(value)
+        return out.stream.getvalue()
+
     def rule(self, target, deps=None, order_only=None, recipe=None,
              variables=None, phony=False):
         targets = iterutils.listify(target)
@@ -325,10 +384,12 @@ class Makefile:
 
         variables = {var(k): v for k, v in (variables or {}).items()}
 
-        self._rules.append(Rule(
-            targets, iterutils.listify(deps), iterutils.listify(order_only),
-            recipe, variables, phony
-        ))
+        rule = Rule(targets, iterutils.listify(deps),
+                    iterutils.listify(order_only), recipe, variables, phony)
+        if self._rule_stream is not None:
+            self._write_rule(self._rule_stream, rule)
+        else:
+            self._rules.append(rule)
 
     def has_rule(self, name):
         return name in self._targets
@@ -419,6 +480,12 @@ class Makefile:
         for name, value in self._defines:
             self._write_define(out, name, value)
 
+        if self._rule_stream is not None:
+            # The spooled stream is only needed until it's been copied out,
+            # so close it here rather than waiting for it to be collected.
+            with self._rule_stream.stream as stream:
+                stream.seek(0)
+                shutil.copyfileobj(stream, out.stream)
         for r in self._rules:
             self._write_rule(out, r)
 
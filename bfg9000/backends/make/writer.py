@@ -28,6 +28,7 @@ def version(env=os.environ):
 priority = 2
 filepath = path.Path('Makefile')
 dir_sentinel = '.dir'
+depfile_db = '.deps'
 
 rule_handler = BuildRuleHandler()
 pre_rules_hook = BuildHook()
@@ -37,7 +38,7 @@ post_rules_hook = BuildHook()
 def write(env, build_inputs):
     buildfile = Makefile(build_inputs.bfgpath.string(env.base_dirs),
                          env.supports_destdir,
-                         gnu=env.backend_version is not None)
+                         gnu=env.backend_version is not None, stream=True)
     buildfile.variable(buildfile.path_vars[path.Root.srcdir], env.srcdir,
                        Section.path)
 
@@ -45,7 +46,9 @@ def write(env, build_inputs):
     rule_handler.run(build_inputs.edges(), build_inputs, buildfile, env)
     post_rules_hook.run(build_inputs, buildfile, env)
 
-    with open(filepath.string(env.base_dirs), 'w') as out:
+    # Always update the modification time of the Makefile so that it's newer
+    # than the inputs to the `regenerate` step.
+    with path.update_file(filepath, env.base_dirs, touch=True) as out:
         buildfile.write(out)
 
 
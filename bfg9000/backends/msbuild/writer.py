@@ -42,10 +42,10 @@ def write(env, build_inputs):
     post_rules_hook.run(build_inputs, solution, env)
 
     sln_file = path.Path(build_inputs['project'].name + '.sln')
-    with open(sln_file.string(env.base_dirs), 'w') as out:
+    with path.update_file(sln_file, env.base_dirs) as out:
         solution.write(out)
     for p in solution:
         os.makedirs(p.path.parent().string(env.base_dirs), exist_ok=True)
-        with open(p.path.string(env.base_dirs), 'wb') as out:
+        with path.update_file(p.path, env.base_dirs, 'wb') as out:
             p.write(out)
     uuids.save()
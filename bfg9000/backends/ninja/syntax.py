@@ -1,7 +1,10 @@
+import functools
 import re
+import shutil
 from collections import namedtuple
 from enum import Enum
 from io import StringIO
+from tempfile import SpooledTemporaryFile
 
 from ... import path
 from ... import safe_str
@@ -9,6 +12,7 @@ from ... import shell
 from ... import iterutils
 from ...platforms.host import platform_info
 from ...tools.common import Command
+from ..common import SharedVariables
 from ...versioning import SpecifierSet, Version
 
 __all__ = ['features', 'NinjaFile', 'Section', 'Syntax', 'var', 'Variable',
@@ -22,6 +26,13 @@ Build = namedtuple('Build', ['outputs', 'rule', 'inputs', 'implicit',
 Syntax = Enum('Syntax', ['output', 'input', 'shell', 'clean'])
 Section = Enum('Section', ['path', 'command', 'flags', 'other'])
 
+# The maximum size of the in-memory buffer for streamed builds before spilling
+# them to disk.
+_spool_size = 1024 * 1024
+
+# The maximum number of distinct escaped tokens to remember.
+_token_cache_size = 64 * 1024
+
 _comment_tmpl = """
 # Do not edit this file! It was automatically generated by bfg9000.
 # Instead, you should edit the source file that created this:
@@ -30,18 +41,23 @@ _comment_tmpl = """
 
 
 class Writer:
+    __escape_ex = re.compile(r'([:$ ])')
+
     def __init__(self, stream, path_vars, shell=shell):
         self.stream = stream
         self.path_vars = path_vars
         self.shell = shell
+        # Paths are written many times over (e.g. include dirs on every
+        # compilation), so remember how we rendered each of them.
+        self._paths = {}
 
-    @staticmethod
-    def escape_str(string, syntax):
+    @classmethod
+    def escape_str(cls, string, syntax):
         if '\n' in string:
             raise ValueError('illegal newline')
 
         if syntax in [Syntax.output, Syntax.input]:
-            return re.sub(r'([:$ ])', r'$\1', string)
+            return cls.__escape_ex.sub(r'$\1', string)
         elif syntax in [Syntax.shell, Syntax.clean]:
             return string.replace('$', '$$')
 
@@ -49,50 +65,74 @@ class Writer:
             'unknown syntax {!r}'.format(syntax)
         )  # pragma: no cover
 
+    @classmethod
+    @functools.lru_cache(maxsize=_token_cache_size)
+    def _escape_token(cls, string, syntax, shell_quote):
+        # Most tokens (flags, file names, etc) are written repeatedly, and most
+        # of those don't need escaping anyway, so cache the results.
+        escaped = False
+        if syntax == Syntax.shell and shell_quote:
+            string, escaped = shell_quote(string)
+        return cls.escape_str(string, syntax), escaped
+
     def quote(self, string):
         return self.shell.quote(string)
 
     def write_literal(self, string):
         self.stream.write(string)
 
-    def write(self, thing, syntax, shell_quote=iterutils.default_sentinel):
-        if shell_quote is iterutils.default_sentinel:
-            shell_quote = self.shell.quote_info
+    def _render(self, thing, syntax, shell_quote):
+        # Convert `thing` to its escaped form, returning the resulting string
+        # and whether it needed to be escaped.
         thing = safe_str.safe_str(thing)
-        shelly = syntax == Syntax.shell
-        escaped = False
 
-        if isinstance(thing, safe_str.literal):
-            escaped = True
-            self.write_literal(thing.string)
+        if isinstance(thing, str):
+            return self._escape_token(thing, syntax, shell_quote)
+        elif isinstance(thing, safe_str.literal):
+            return thing.string, True
         elif isinstance(thing, safe_str.shell_literal):
-            escaped = True
-            self.write_literal(self.escape_str(thing.string, syntax))
-        elif isinstance(thing, str):
-            if shelly and shell_quote:
-                thing, escaped = shell_quote(thing)
-            self.write_literal(self.escape_str(thing, syntax))
+            return self.escape_str(thing.string, syntax), True
         elif isinstance(thing, safe_str.jbos):
+            result, escaped = [], False
             for i in thing.bits:
-                escaped |= self.write(i, syntax, shell_quote)
+                r, e = self._render(i, syntax, shell_quote)
+                result.append(r)
+                escaped |= e
+            return ''.join(result), escaped
         elif isinstance(thing, path.BasePath):
-            out = Writer(StringIO(), self.path_vars, self.shell)
-            thing = thing.realize(self.path_vars, shelly)
-            escaped = out.write(thing, syntax, self.shell.inner_quote_info)
-
-            thing = out.stream.getvalue()
+            key = (thing, syntax)
+            try:
+                return self._paths[key]
+            except KeyError:
+                pass
+
+            shelly = syntax == Syntax.shell
+            result, escaped = self._render(
+                thing.realize(self.path_vars, shelly), syntax,
+                self.shell.inner_quote_info
+            )
             if shelly and escaped:
-                thing = self.shell.wrap_quotes(thing)
-            self.write_literal(thing)
-        else:
-            raise TypeError(type(thing))
+                result = self.shell.wrap_quotes(result)
+            self._paths[key] = result, escaped
+            return result, escaped
+
+        raise TypeError(type(thing))
 
+    def write(self, thing, syntax, shell_quote=iterutils.default_sentinel):
+        if shell_quote is iterutils.default_sentinel:
+            shell_quote = self.shell.quote_info
+        result, escaped = self._render(thing, syntax, shell_quote)
+        self.write_literal(result)
         return escaped
 
     def write_each(self, things, syntax, delim=safe_str.literal(' '),
                    prefix=None, suffix=None):
-        for i in iterutils.tween(things, delim, prefix, suffix):
-            self.write(i, syntax)
+        # Render everything first so we only need to write to the stream once.
+        shell_quote = self.shell.quote_info
+        self.write_literal(''.join(
+            self._render(i, syntax, shell_quote)[0]
+            for i in iterutils.tween(things, delim, prefix, suffix)
+        ))
 
     def write_shell(self, thing, syntax=Syntax.shell, can_wrap=False):
         if ( can_wrap and isinstance(thing, shell.shell_list) and
@@ -155,7 +195,7 @@ features = _NinjaFeatures()
 class NinjaFile:
     Section = Section
 
-    def __init__(self, bfgfile, destdir=False):
+    def __init__(self, bfgfile, destdir=False, *, stream=False):
         self.path_vars = {
             path.Root.srcdir  : Variable('srcdir'),
             path.Root.builddir: None,
@@ -172,10 +212,20 @@ class NinjaFile:
 
         self._rules = {}
 
+        # When streaming, serialize builds as soon as they're added instead of
+        # holding onto them until we write the file.
         self._builds = []
+        self._build_stream = (
+            self.writer(SpooledTemporaryFile(_spool_size, 'w+'))
+            if stream else None
+        )
         self._build_outputs = set()
         self._defaults = []
 
+        self._shared = SharedVariables(self, var)
+
+        self._scratch = self.writer(StringIO())
+
     def min_version(self, version):
         version = Version(version)
         if self._min_version is None or version > self._min_version:
@@ -196,6 +246,9 @@ class NinjaFile:
         return self.variable(cmd.command_var, cmd.command, Section.command,
                              exist_ok=True)
 
+    def shared_variable(self, name, value, section=Section.flags):
+        return self._shared(name, self._convert_args(value), section)
+
     def has_variable(self, name):
         return var(name) in self._var_table
 
@@ -222,10 +275,19 @@ class NinjaFile:
         return name in self._rules
 
     def _output_str(self, name):
-        out = self.writer(StringIO())
+        out = self._scratch
+        out.stream.seek(0)
+        out.stream.truncate()
         out.write(name, Syntax.output)
         return out.stream.getvalue()
 
+    def _shell_str(self, value):
+        out = self._scratch
+        out.stream.seek(0)
+        out.stream.truncate()
+        out.write_shell(value)
+        return out.stream.getvalue()
+
     def build(self, output, rule, inputs=None, implicit=None, order_only=None,
               variables=None):
         if rule != 'phony' and not self.has_rule(rule):
@@ -234,17 +296,24 @@ class NinjaFile:
         variables = {var(k): self._convert_args(v) for k, v in
                      (variables or {}).items()}
 
-        outputs = iterutils.listify(output)
-        for i in outputs:
+        outputs = []
+        for i in iterutils.iterate(output):
             out = self._output_str(i)
             if self.has_build(out):
                 raise ValueError('build for {!r} already exists'.format(out))
             self._build_outputs.add(out)
-        self._builds.append(Build(
-            outputs, rule, iterutils.listify(inputs),
-            iterutils.listify(implicit), iterutils.listify(order_only),
-            variables
-        ))
+            outputs.append(out)
+
+        build = Build(
+            [safe_str.literal(i) for i in outputs], rule,
+            iterutils.listify(inputs), iterutils.listify(implicit),
+            iterutils.listify(order_only), variables
+        )
+        if self._build_stream is not None:
+            self._write_build(self._build_stream, build)
+            self._build_stream.write_literal('\n')
+        else:
+            self._builds.append(build)
 
     def has_build(self, name):
         return name in self._build_outputs
@@ -325,6 +394,12 @@ class NinjaFile:
             self._write_rule(out, name, rule)
             out.write_literal('\n')
 
+        if self._build_stream is not None:
+            # The spooled stream is only needed until it's been copied out,
+            # so close it here rather than waiting for it to be collected.
+            with self._build_stream.stream as stream:
+                stream.seek(0)
+                shutil.copyfileobj(stream, out.stream)
         for build in self._builds:
             self._write_build(out, build)
             out.write_literal('\n')
@@ -33,7 +33,7 @@ post_rules_hook = BuildHook()
 
 def write(env, build_inputs):
     buildfile = NinjaFile(build_inputs.bfgpath.string(env.base_dirs),
-                          env.supports_destdir)
+                          env.supports_destdir, stream=True)
     buildfile.variable(buildfile.path_vars[path.Root.srcdir], env.srcdir,
                        Section.path)
 
@@ -41,7 +41,9 @@ def write(env, build_inputs):
     rule_handler.run(build_inputs.edges(), build_inputs, buildfile, env)
     post_rules_hook.run(build_inputs, buildfile, env)
 
-    with open(filepath.string(env.base_dirs), 'w') as out:
+    # Always update the modification time of build.ninja so that it's newer
+    # than the inputs to the `regenerate` step.
+    with path.update_file(filepath, env.base_dirs, touch=True) as out:
         buildfile.write(out)
 
 
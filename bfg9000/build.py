@@ -1,7 +1,7 @@
 import os
 from itertools import chain
 
-from . import log
+from . import log, profiler
 from .arguments.parser import ArgumentParser
 from .builtins import builtin, init as builtin_init
 from .build_inputs import BuildInputs, Regenerating
@@ -33,7 +33,8 @@ def is_srcdir(path):
 def _execute_script(f, context, path, *, run_hooks=True):
     filename = path.string(context.env.base_dirs)
 
-    with pushd(path.parent().string(context.env.base_dirs)), \
+    with profiler.phase(path.suffix, 'execute_file', kind=context.kind), \
+         pushd(path.parent().string(context.env.base_dirs)), \
          context.push_path(path) as p:
         if run_hooks:
             context.run_hook('pre_execute_hook')
@@ -114,8 +115,9 @@ def fill_user_help(env, parent):
 
 def configure_build(env, regenerating=Regenerating.false):
     builtin_init()
-    parser, opts_paths = _execute_options(env)
-    argv = parser.parse_args(env.extra_args)
+    with profiler.phase('options', 'configure'):
+        parser, opts_paths = _execute_options(env)
+        argv = parser.parse_args(env.extra_args)
 
     bfgpath = Path(builtin.BuildContext.filename, Root.srcdir)
     build = BuildInputs(env, bfgpath)
@@ -4,6 +4,7 @@ import inspect
 from contextlib import contextmanager
 from itertools import chain
 
+from .. import profiler
 from ..build_inputs import Regenerating
 from ..iterutils import iterate, listify
 from ..platforms.basepath import BasePath
@@ -159,9 +160,17 @@ class _PartialFunctionBinder(_Binder):
     builtin_bound = 1
 
     def bind(self, context):
-        @functools.wraps(self._fn)
-        def wrapper(*args, **kwargs):
-            return self._fn(context, *args, **kwargs)
+        if profiler.enabled():
+            name = self._fn._builtin_name
+
+            @functools.wraps(self._fn)
+            def wrapper(*args, **kwargs):
+                with profiler.phase(name, 'builtin'):
+                    return self._fn(context, *args, **kwargs)
+        else:
+            @functools.wraps(self._fn)
+            def wrapper(*args, **kwargs):
+                return self._fn(context, *args, **kwargs)
 
         sig = inspect.signature(wrapper)
         params = list(sig.parameters.values())[self.builtin_bound:]
@@ -12,9 +12,11 @@ from ..file_types import *
 from ..iterutils import first, flatten, iterate, unlistify
 from ..objutils import convert_each, convert_one
 from ..path import Path
+from ..safe_str import shell_literal
 from ..shell import posix as pshell
 
 build_input('compile_options')(lambda: defaultdict(list))
+build_input('make_depfiles')(lambda: defaultdict(list))
 
 
 class BaseCompile(Edge):
@@ -290,7 +292,9 @@ def _get_flags(backend, rule, build_inputs, buildfile):
         )
         cmd_kwargs['flags'] = cflags
         if flags := rule.flags(gopts):
-            variables[cflags] = [global_cflags] + flags
+            variables[cflags] = buildfile.shared_variable(
+                cflags, [global_cflags] + flags
+            )
 
     return variables, cmd_kwargs
 
@@ -338,7 +342,14 @@ def make_compile(rule, build_inputs, buildfile, env):
     if compiler.deps_flavor == 'gcc':
         depfile = rule.output[0].path.addext('.d')
         build_inputs.add_target(File(depfile))
-        buildfile.include(depfile, optional=True)
+        if env.merge_depfiles:
+            db = depfile.parent().append(make.depfile_db)
+            depfiles = build_inputs['make_depfiles']
+            if db not in depfiles:
+                build_inputs.add_target(File(db))
+            depfiles[db].append(depfile)
+        else:
+            buildfile.include(depfile, optional=True)
 
     make.multitarget_rule(
         build_inputs, buildfile,
@@ -350,6 +361,25 @@ def make_compile(rule, build_inputs, buildfile, env):
     )
 
 
+@make.post_rules_hook
+def make_depfile_db_rules(build_inputs, buildfile, env):
+    # Merge the depfiles in each directory into a single file so that Make
+    # only has to read one file per directory when it starts. Make remakes
+    # included files that are out of date before doing anything else, so this
+    # picks up any depfiles updated by the previous build.
+    for db, depfiles in build_inputs['make_depfiles'].items():
+        buildfile.rule(
+            target=db,
+            deps=[make.Function('wildcard', depfiles)],
+            order_only=make.directory_deps([db]),
+            recipe=[make.Silent([
+                'cat', '/dev/null', make.var('^'), shell_literal('>'),
+                make.qvar('@')
+            ])]
+        )
+        buildfile.include(db, optional=True)
+
+
 @ninja.rule_handler(CompileSource, CompileHeader, GenerateSource)
 def ninja_compile(rule, build_inputs, buildfile, env):
     compiler = rule.compiler
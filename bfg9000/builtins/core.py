@@ -9,6 +9,13 @@ def getenv(context):
     return context.env
 
 
+@builtin.execute_hook()
+def prefetch_tools(context):
+    # Do this here instead of when loading the environment so that lazy
+    # regeneration can bail out before finding any tools.
+    context.env.prefetch()
+
+
 @builtin.default(context='*')
 def warning(*args):
     warnings.warn(log.format_message(*args))
@@ -3,13 +3,14 @@ import os
 import re
 from collections import namedtuple
 from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from enum import Enum
-from functools import reduce
 
 from . import builtin, regenerate
 from .. import path as _path
 from ..exceptions import SerializationError
-from ..glob import NameGlob, PathGlob
+from ..glob import NameGlob, NameGlobSet, PathGlob, PathGlobSet
 from ..iterutils import iterate, listify
 from ..backends.make import writer as make
 from ..backends.ninja import writer as ninja
@@ -20,6 +21,9 @@ from ..path import Path, Root
 from ..platforms import known_platforms
 
 build_input('find_dirs')(set)
+# Share directory listings between all the `find_files` calls (and the checks
+# in `find_check_cache`) during a single configuration.
+build_input('find_snapshot')(_path.DirectorySnapshot)
 depfile_name = '.bfg_find_deps'
 
 
@@ -30,19 +34,19 @@ class FindCache(Mapping):
     def __init__(self):
         self._cache = {}
 
-    def to_json(self):
+    def to_json(self, paths):
         return [
             [file_filter.to_json(),
-             *[[i.to_json() for i in matches] for matches in cache]]
+             *[[paths.add(i) for i in matches] for matches in cache]]
             for file_filter, cache in self._cache.items()
         ]
 
     @classmethod
-    def from_json(cls, data, context):
+    def from_json(cls, data, context, paths):
         cache = cls.__new__(cls)
         cache._cache = {
             FileFilter.from_json(k, context):
-            cls.FindCacheEntry._make([Path.from_json(i) for i in matches]
+            cls.FindCacheEntry._make([paths[i] for i in matches]
                                      for matches in v)
             for k, *v in data
         }
@@ -92,6 +96,7 @@ class FileFilter:
         self.extra = tuple(NameGlob(i, type) for i in iterate(extra))
         self.exclude = tuple(NameGlob(i, type) for i in iterate(exclude))
         self.filter_fn = filter_fn
+        self._compile()
 
     def to_json(self):
         # We can only serialize built-in filter functions. Arbitrary functions
@@ -116,33 +121,47 @@ class FileFilter:
                            else None)
         except KeyError as e:
             raise SerializationError(str(e))
+        f._compile()
         return f
 
+    def _compile(self):
+        self._include_set = PathGlobSet(self.include)
+        self._extra_set = NameGlobSet(self.extra)
+        self._exclude_set = NameGlobSet(self.exclude)
+
     def bases(self):
         return _path.uniquetrees([i.base for i in self.include])
 
     def _match_globs(self, path):
-        if any(i.match(path) for i in self.exclude):
-            return FindResult.exclude_recursive
+        if self._exclude_set.match(path):
+            return FindResult.exclude_recursive, False
 
         skip_base = len(self.include) == 1
-        result = reduce(lambda a, b: a | b,
-                        (i.match(path, skip_base) for i in self.include))
+        result, subtree = self._include_set.match_subtree(path, skip_base)
+        # Paths matching `extra` can be anywhere we walk, so if we have any
+        # `extra` globs, we can't skip any children we'd otherwise visit.
+        subtree = subtree or bool(self.extra)
         if result:
-            return FindResult.include
+            return FindResult.include, subtree
 
-        if any(i.match(path) for i in self.extra):
-            return FindResult.not_now
+        if self._extra_set.match(path):
+            return FindResult.not_now, subtree
 
         if result == PathGlob.Result.never:
-            return FindResult.exclude_recursive
-        return FindResult.exclude
+            return FindResult.exclude_recursive, False
+        return FindResult.exclude, subtree
+
+    def match_subtree(self, path):
+        # Return the result of matching `path`, along with whether any of its
+        # descendants could possibly match (i.e. whether to keep searching
+        # inside `path` if it's a directory).
+        result, subtree = self._match_globs(path)
+        if self.filter_fn:
+            result = result & self.filter_fn(path)
+        return result, subtree and result != FindResult.exclude_recursive
 
     def match(self, path):
-        result = self._match_globs(path)
-        if self.filter_fn:
-            return result & self.filter_fn(path)
-        return result
+        return self.match_subtree(path)[0]
 
     def __eq__(self, rhs):
         return (self.include == rhs.include and self.extra == rhs.extra and
@@ -166,31 +185,49 @@ class CacheVersionError(RuntimeError):
     pass
 
 
-class FindCacheFile(namedtuple('FindCacheFile', ['regen_files', 'cache'])):
-    version = 1
+# Prior to version 3 of the find cache, each path was stored in full rather
+# than as an index into a `PathTable`.
+class _LegacyPathTable:
+    def __getitem__(self, data):
+        return Path.from_json(data)
+
+
+# The snapshot holds the directory listings (and their modification times) that
+# we read while finding files. When checking the cache, we can reuse these for
+# any directory that hasn't changed instead of listing it again.
+class FindCacheFile(namedtuple('FindCacheFile', [
+    'regen_files', 'cache', 'snapshot'
+])):
+    version = 3
     cachefile = '.bfg_find_cache'
 
+    def __new__(cls, regen_files, cache, snapshot=None):
+        if snapshot is None:
+            snapshot = _path.DirectorySnapshot()
+        return super().__new__(cls, regen_files, cache, snapshot)
+
     def save(self, path):
-        if self.cache:
-            try:
-                data = {
-                    'version': self.version,
-                    'data': {
-                        'regen_files': self.regen_files.to_json(),
-                        'cache': self.cache.to_json(),
-                    }
+        # Save this even if there are no cached `find_files` results, since
+        # `find_check_cache` can still use `regen_files` on its own.
+        try:
+            paths = _path.PathTable()
+            data = {
+                'version': self.version,
+                'data': {
+                    'regen_files': self.regen_files.to_json(),
+                    'cache': self.cache.to_json(paths),
+                    'snapshot': self.snapshot.to_json(paths),
+                    'paths': paths.to_json(),
                 }
-                with open(os.path.join(path, self.cachefile), 'w') as out:
-                    json.dump(data, out)
-                return
-            except SerializationError:
+            }
+            with open(os.path.join(path, self.cachefile), 'w') as out:
+                json.dump(data, out)
+        except SerializationError:
+            try:
+                os.remove(os.path.join(path, self.cachefile))
+            except FileNotFoundError:  # pragma: no cover
                 pass
 
-        try:
-            os.remove(os.path.join(path, self.cachefile))
-        except FileNotFoundError:  # pragma: no cover
-            pass
-
     @classmethod
     def load(cls, path, context):
         with open(os.path.join(path, cls.cachefile)) as inp:
@@ -199,12 +236,22 @@ class FindCacheFile(namedtuple('FindCacheFile', ['regen_files', 'cache'])):
         if version > cls.version:
             raise CacheVersionError('saved version exceeds expected version')
 
-        return cls(regenerate.RegenerateFiles.from_json(data['regen_files']),
-                   FindCache.from_json(data['cache'], context))
+        regen_files = regenerate.RegenerateFiles.from_json(data['regen_files'])
+        if version < 3:
+            # Older snapshots stored only the names of each directory's
+            # entries, so just discard them.
+            return cls(regen_files, FindCache.from_json(
+                data['cache'], context, _LegacyPathTable()
+            ))
+
+        paths = _path.PathTable.from_json(data['paths'])
+        return cls(regen_files,
+                   FindCache.from_json(data['cache'], context, paths),
+                   _path.DirectorySnapshot.from_json(data['snapshot'], paths))
 
 
 def write_depfile(env, path, output, seen_dirs, makeify=False):
-    with open(path.string(env.base_dirs), 'w') as f:
+    with _path.update_file(path, env.base_dirs) as f:
         # Since this file is in the build dir, we can use relative dirs for
         # deps also in the build dir.
         roots = env.base_dirs.copy()
@@ -238,27 +285,35 @@ def filter_by_platform(context, path):
             else FindResult.include)
 
 
-def _find_files(env, filter, seen_dirs=None):
+def _walk_executor(env):
+    if env.find_jobs > 1:
+        return ThreadPoolExecutor(max_workers=env.find_jobs)
+    return nullcontext()
+
+
+def _find_files(env, filter, seen_dirs=None, snapshot=None):
     paths = filter.bases()
 
     for p in paths:
         yield p, filter.match(p)
-    for p in paths:
-        for base, dirs, files in _path.walk(p, env.base_dirs):
-            if seen_dirs is not None:
-                seen_dirs.append(base)
-            to_remove = []
-
-            for i, p in enumerate(dirs):
-                m = filter.match(p)
-                if m == FindResult.exclude_recursive:
-                    to_remove.append(i)
-                yield p, m
-            for p in files:
-                yield p, filter.match(p)
-
-            for i in reversed(to_remove):
-                del dirs[i]
+    with _walk_executor(env) as executor:
+        for p in paths:
+            for base, dirs, files in _path.walk(p, env.base_dirs, snapshot,
+                                                executor):
+                if seen_dirs is not None:
+                    seen_dirs.append(base)
+                to_remove = []
+
+                for i, p in enumerate(dirs):
+                    m, subtree = filter.match_subtree(p)
+                    if not subtree:
+                        to_remove.append(i)
+                    yield p, m
+                for p in files:
+                    yield p, filter.match(p)
+
+                for i in reversed(to_remove):
+                    del dirs[i]
 
 
 def find(env, pattern, type=None, extra=None, exclude=None):
@@ -286,7 +341,8 @@ def find_from_filter(context, file_filter, *, file_type=None, dir_type=None,
             pass
 
     results, found, extra, seen_dirs = [], [], [], []
-    for path, matched in _find_files(context.env, file_filter, seen_dirs):
+    for path, matched in _find_files(context.env, file_filter, seen_dirs,
+                                     context.build['find_snapshot']):
         if matched == FindResult.include:
             if cache:
                 found.append(path)
@@ -335,27 +391,27 @@ def find_check_cache(context):
         return
 
     try:
-        regen_files, old_cache = FindCacheFile.load(
-            context.env.builddir.string(), context
-        )
+        cachefile = FindCacheFile.load(context.env.builddir.string(),
+                                       context)
     except FileNotFoundError:
         return
+    regen_files, old_cache, old_snapshot = cachefile
 
-    # Check if any of the explicit inputs are newer than any of the explicit
-    # outputs. If so, we definitely want to regenerate the build files.
-    if ( max(_path.getmtime_ns(i, context.env.base_dirs, strict=False)
-             for i in regen_files.inputs) >
-         min(_path.getmtime_ns(i, context.env.base_dirs, strict=False)
-             for i in regen_files.outputs) ):
+    # Check if any of the explicit inputs have changed. If so, we definitely
+    # want to regenerate the build files.
+    if regen_files.changed(context.env):
         return
 
     # Otherwise, check to see if any of the `find_files` calls have different
     # results. If not, we can avoid regenerating.
     regenerate = False
+    snapshot = context.build['find_snapshot']
+    snapshot.reuse(old_snapshot)
 
     for file_filter, results in old_cache.items():
         found, extra, seen_dirs = [], [], []
-        for path, matched in _find_files(context.env, file_filter, seen_dirs):
+        for path, matched in _find_files(context.env, file_filter, seen_dirs,
+                                         snapshot):
             if matched == FindResult.include:
                 found.append(path)
             elif matched == FindResult.not_now:
@@ -373,6 +429,11 @@ def find_check_cache(context):
         for i in regen_files.outputs:
             if _path.exists(i, context.env.base_dirs):
                 _path.touch(i, context.env.base_dirs)
+        # Save the directory listings we just read so that next time, we only
+        # need to re-list the directories that have changed since now.
+        cachefile._replace(snapshot=snapshot).save(
+            context.env.builddir.string()
+        )
         raise AbortConfigure()
 
 
@@ -385,7 +446,8 @@ def make_find_dirs(build_inputs, buildfile, env):
 
     FindCacheFile(
         regenerate.RegenerateFiles.make(build_inputs, env),
-        build_inputs['find_cache']
+        build_inputs['find_cache'],
+        build_inputs['find_snapshot']
     ).save(env.builddir.string())
 
 
@@ -397,5 +459,6 @@ def ninja_find_dirs(build_inputs, buildfile, env):
 
     FindCacheFile(
         regenerate.RegenerateFiles.make(build_inputs, env),
-        build_inputs['find_cache']
+        build_inputs['find_cache'],
+        build_inputs['find_snapshot']
     ).save(env.builddir.string())
@@ -420,7 +420,9 @@ def _get_flags(backend, rule, build_inputs, buildfile):
         )
         cmd_kwargs['flags'] = ldflags
         if flags := rule.flags(gopts):
-            variables[ldflags] = [global_ldflags] + flags
+            variables[ldflags] = buildfile.shared_variable(
+                ldflags, [global_ldflags] + flags
+            )
 
     if hasattr(linker, 'libs_var'):
         global_ldlibs, ldlibs = backend.flags_vars(
@@ -430,7 +432,9 @@ def _get_flags(backend, rule, build_inputs, buildfile):
         )
         cmd_kwargs['libs'] = ldlibs
         if lib_flags := rule.lib_flags(gopts):
-            variables[ldlibs] = [global_ldlibs] + lib_flags
+            variables[ldlibs] = buildfile.shared_variable(
+                ldlibs, [global_ldlibs] + lib_flags
+            )
 
     if hasattr(rule, 'manifest'):
         var = backend.var('manifest')
@@ -1,3 +1,5 @@
+import ast
+import hashlib
 from collections import namedtuple
 
 from . import builtin
@@ -7,14 +9,35 @@ from ..backends.make import writer as make
 from ..backends.ninja import writer as ninja
 from ..build_inputs import build_input
 from ..iterutils import listify
-from ..path import Path
+from ..path import getmtime_ns, Path
+
+
+def _scripts(build_inputs, env):
+    return build_inputs.bootstrap_paths + listify(env.toolchain.path)
 
 
 def _inputs(build_inputs, env):
     extra = []
     if env.mopack:
         extra = [env.tool('mopack').metadata_file]
-    return build_inputs.bootstrap_paths + listify(env.toolchain.path) + extra
+    return _scripts(build_inputs, env) + extra
+
+
+_digesters = {
+    # Hash the parsed form of a bfg script so that edits which can't change
+    # the result of executing it (e.g. to comments or formatting) are ignored.
+    'script': lambda data: ast.dump(ast.parse(data)).encode('utf-8'),
+    'file': lambda data: data,
+}
+
+
+def input_digest(path, env, kind='file'):
+    try:
+        with open(path.string(env.base_dirs), 'rb') as f:
+            data = _digesters[kind](f.read())
+    except (OSError, SyntaxError, ValueError):
+        return None
+    return hashlib.sha1(data).hexdigest()
 
 
 def _outputs(build_inputs, env):
@@ -31,17 +54,61 @@ class Regenerate:
 
 # This class is used to help serialize the direct inputs/outputs for the
 # `regenerate` build step so that we can consult it when determining whether to
-# abort regeneration in `find_check_cache`.
-class RegenerateFiles(namedtuple('RegenerateFiles', ['inputs', 'outputs'])):
+# abort regeneration in `find_check_cache`. `digests` holds the kind and value
+# of the `input_digest` for each input (or None if it couldn't be computed),
+# and `environment` holds the digest of the saved `Environment`.
+class RegenerateFiles(namedtuple('RegenerateFiles', [
+    'inputs', 'outputs', 'digests', 'environment'
+])):
+    def __new__(cls, inputs, outputs, digests=None, environment=None):
+        if digests is None:
+            digests = [None] * len(inputs)
+        return super().__new__(cls, inputs, outputs, digests, environment)
+
     @classmethod
     def make(cls, build_inputs, env):
-        return RegenerateFiles(_inputs(build_inputs, env),
-                               _outputs(build_inputs, env))
+        scripts = _scripts(build_inputs, env)
+        inputs = _inputs(build_inputs, env)
+
+        digests = []
+        for i in inputs:
+            kind = 'script' if i in scripts else 'file'
+            digest = input_digest(i, env, kind)
+            digests.append([kind, digest] if digest else None)
+
+        return RegenerateFiles(inputs, _outputs(build_inputs, env), digests,
+                               env.digest())
+
+    def changed(self, env):
+        # Check if any of the inputs have changed since the build files were
+        # last generated. Where possible, we compare the contents of each
+        # input so that changes to mtimes alone (e.g. from `git checkout` or
+        # restoring a cached build directory) don't count.
+        if self.environment is not None and self.environment != env.digest():
+            return True
+
+        outputs_mtime = None
+        for path, digest in zip(self.inputs, self.digests):
+            if digest is not None:
+                if input_digest(path, env, digest[0]) != digest[1]:
+                    return True
+                continue
+
+            if outputs_mtime is None:
+                outputs_mtime = min(
+                    getmtime_ns(i, env.base_dirs, strict=False)
+                    for i in self.outputs
+                )
+            if getmtime_ns(path, env.base_dirs, strict=False) > outputs_mtime:
+                return True
+        return False
 
     def to_json(self):
         return {
             'inputs': [i.to_json() for i in self.inputs],
             'outputs': [i.to_json() for i in self.outputs],
+            'digests': self.digests,
+            'environment': self.environment,
         }
 
     @classmethod
@@ -49,6 +116,8 @@ class RegenerateFiles(namedtuple('RegenerateFiles', ['inputs', 'outputs'])):
         return cls(
             [Path.from_json(i) for i in data['inputs']],
             [Path.from_json(i) for i in data['outputs']],
+            data.get('digests'),
+            data.get('environment'),
         )
 
 
@@ -106,12 +175,15 @@ def ninja_regenerate_rule(build_inputs, buildfile, env):
             implicit=listify(env.toolchain.path)
         )
 
+    # Use `restat` since regenerating won't update the modification times of
+    # unchanged outputs.
     buildfile.rule(
         name='regenerate',
         command=bfg9000('regenerate', lazy=True),
         generator=True,
         depfile=build_inputs['regenerate'].depfile,
         description='regenerate',
+        restat=True,
         **rule_kwargs
     )
     buildfile.build(
@@ -1,3 +1,4 @@
+import re
 import sys
 
 from enum import Enum
@@ -23,48 +24,71 @@ class UnexpectedTokenError(ParseError):
         super().__init__("unexpected token '{}'".format(tok))
 
 
-def tokenize(s):
+# The size of each chunk to read from the input stream.
+_chunk_size = 64 * 1024
+
+# A colon is only a separator when followed by whitespace (or the end of the
+# file), and the character right after a colon that isn't a separator is never
+# one either. Runs of spaces and of ordinary characters are each returned as a
+# single token, since the parser below handles them the same as a series of
+# one-char tokens.
+_token_ex = re.compile(
+    r'(?P<colon>:(?=[ \t\n]|\Z))|'
+    r'(?P<space>[ \t]+)|'
+    r'(?P<newline>\n)|'
+    r'(?P<char>(?:[^ \t\n:\\]+|\\\n|\\.|\\\Z|::|:(?![ \t\n]|\Z))+)'
+)
+
+
+def _read_chunks(stream):
+    while True:
+        chunk = stream.read(_chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _make_token(match):
+    kind = match.lastgroup
+    if kind == 'char':
+        # Swallow escaped newlines.
+        value = match.group().replace('\\\n', '')
+        return (Token.char, value) if value else None
+    return (Token[kind], None)
+
+
+def tokenize(chunks):
     # The depfile syntax is a bit weird, since it seems no one quite
     # understands the correct ways to escape characters for Make in all cases
     # (made worse by the fact that even GNU Make's behavior varies across
     # versions). For our purposes though, we only need to recognize when
     # unescaped colons (always followed by whitespace in the depfile
     # generators) and unescaped spaces are emitted.
-
-    s = iter(s)
-    while True:
-        c = next(s, None)
-        if c is None:
-            return
-
-        if c == ':':
-            c = next(s, None)
-            if c is None or c in ' \t\n':
-                yield (Token.colon, None)
-                if c is None:
-                    return
-            else:
-                yield (Token.char, ':')
-
-        if c == '\\':
-            c = next(s, None)
-            if c != '\n':  # Swallow escaped newlines.
-                yield (Token.char, '\\')
-                if c is None:
-                    return
-                yield (Token.char, c)
-        elif c in ' \t':
-            yield (Token.space, None)
-        elif c == '\n':
-            yield (Token.newline, None)
-        else:
-            yield (Token.char, c)
+    #
+    # `chunks` is an iterable of strings. The last token in each chunk might
+    # continue into the next one, so hold it back until we've seen more.
+    rest = ''
+    for chunk in chunks:
+        rest += chunk
+        last = None
+        for m in _token_ex.finditer(rest):
+            if last and (tok := _make_token(last)):
+                yield tok
+            last = m
+        rest = rest[last.start():] if last else ''
+
+    for m in _token_ex.finditer(rest):
+        if tok := _make_token(m):
+            yield tok
 
 
 def emit_deps(instream, outstream):
     state = State.target
+    # Don't write anything until we've read all the input: when run from Make,
+    # we append to the same file we're reading from.
+    result = []
 
-    for tok, value in tokenize(instream.read()):
+    for tok, value in tokenize(_read_chunks(instream)):
         if state == State.target:
             if tok == Token.space:
                 state = State.between_targets
@@ -81,19 +105,19 @@ def emit_deps(instream, outstream):
                 raise UnexpectedTokenError(tok)
         elif state == State.dep:
             if tok == Token.char:
-                outstream.write(value)
+                result.append(value)
             elif tok == Token.space:
-                outstream.write(':\n')
+                result.append(':\n')
                 state = State.between_deps
             elif tok == Token.newline:
-                outstream.write(':\n')
+                result.append(':\n')
                 state = State.target
             else:
                 raise UnexpectedTokenError(tok)
         else:  # state == State.between_deps
             if tok == Token.char:
                 state = State.dep
-                outstream.write(value)
+                result.append(value)
             elif tok == Token.newline:
                 state = State.target
             elif tok != Token.space:
@@ -101,6 +125,7 @@ def emit_deps(instream, outstream):
 
     if state != State.target:
         raise ParseError('unexpected end of file')
+    outstream.write(''.join(result))
 
 
 def main():
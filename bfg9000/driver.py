@@ -1,8 +1,10 @@
 import os
 import subprocess
 import sys
+import warnings
+from contextlib import contextmanager
 
-from . import build, log, path
+from . import build, log, path, profiler, shell
 from .app_version import version
 from .arguments import parser as argparse
 from .backends import list_backends
@@ -11,9 +13,16 @@ from .build_inputs import Regenerating
 from .environment import Environment, EnvVersionError
 from .exceptions import AbortConfigure
 from .platforms.target import platform_info
+from .probe_cache import ProbeCache
+from .shell.stats import ExecuteStats
 
 logger = log.getLogger(__name__)
 
+# Subprocesses run while building the argument parser (e.g. the backend version
+# checks in `list_backends`). These happen before we know whether `--stats` was
+# passed, so we always record them.
+_startup_stats = ExecuteStats()
+
 description = """
 bfg9000 ("build file generator") is a cross-platform build configuration system
 with an emphasis on making it easy to define how to build your software. It
@@ -86,14 +95,49 @@ def environment_from_args(args):
 
 
 def finalize_environment(env, args, extra_args=None):
+    # Merging depfiles relies on GNU Make features, so don't let it silently
+    # do nothing (or generate a broken Makefile) elsewhere.
+    merge_depfiles = args.merge_depfiles
+    if merge_depfiles and (env.backend != 'make' or
+                           env.backend_version is None):
+        warnings.warn('--enable-merge-depfiles requires the make backend ' +
+                      'with GNU Make; ignoring')
+        merge_depfiles = False
+
     env.finalize(
         install_dirs={i: getattr(args, i.name) for i in path.InstallRoot},
         library_mode=(args.shared, args.static),
         compdb=args.compdb,
         extra_args=extra_args,
+        prefetch=args.prefetch,
+        find_jobs=args.find_jobs,
+        merge_depfiles=merge_depfiles,
     )
 
 
+def write_build_files(env, backend, build_inputs):
+    with profiler.phase(env.backend, 'backend'):
+        backend.write(env, build_inputs)
+    if env.compdb:
+        with profiler.phase('compdb', 'backend'):
+            compdb.write(env, build_inputs)
+
+
+@contextmanager
+def subprocess_stats(enabled):
+    if not enabled:
+        yield
+        return
+
+    stats = ExecuteStats()
+    stats.update(_startup_stats)
+    try:
+        with shell.execute_hook(stats.add):
+            yield
+    finally:
+        logger.info(stats.summary())
+
+
 def directory_pair(srcname, buildname):
     class DirectoryPair(argparse.Action):
         def __call__(self, parser, namespace, values, option_string=None):
@@ -150,6 +194,19 @@ def add_generic_args(parser):
                         help='only emit a given warning once')
 
 
+def add_profile_arg(parser):
+    parser.add_argument('--profile', metavar='FILE',
+                        default=os.getenv('BFG_PROFILE'),
+                        help=('write a trace of the time spent in each ' +
+                              'phase of configuration to FILE'))
+
+
+def add_stats_arg(parser):
+    parser.add_argument('--stats', action='store_true',
+                        help=('show a summary of the external commands run ' +
+                              'during configuration'))
+
+
 def add_configure_args(parser):
     backends = list_backends()
 
@@ -173,6 +230,18 @@ def add_configure_args(parser):
     build.add_argument('--compdb', action='enable', default=True,
                        help=('generate compile_commands.json ' +
                              '(default: enabled)'))
+    build.add_argument('--prefetch', action='append', metavar='NAME',
+                       help=('a builder or tool to find in parallel before ' +
+                             'executing the build script'))
+    build.add_argument('--find-jobs', metavar='N', type=int, default=1,
+                       help=('number of threads to use when searching for ' +
+                             'files with find_files (default: %(default)s)'))
+    build.add_argument('--merge-depfiles', action='enable', default=False,
+                       help=('merge dependency files into one per directory ' +
+                             'when using the Make backend (default: ' +
+                             'disabled)'))
+    add_profile_arg(build)
+    add_stats_arg(build)
 
     pkg = parser.add_argument_group('packaging arguments')
     pkg.add_argument('-p', '--package-file', action='append', metavar='FILE',
@@ -232,23 +301,26 @@ def configure(parser, subparser, args, extra):
     os.makedirs(args.builddir.string(), exist_ok=True)
 
     try:
-        env, backend = environment_from_args(args)
-        if args.toolchain:
-            build.load_toolchain(env, args.toolchain)
-        finalize_environment(env, args, extra)
-
-        if not args.no_resolve_packages:
-            env.mopack = build.resolve_packages(
-                env, args.package_files, args.package_flags,
-                verbose=args.verbose
-            )
-
-        env.save(args.builddir.string())
-
-        build_inputs = build.configure_build(env)
-        backend.write(env, build_inputs)
-        if env.compdb:
-            compdb.write(env, build_inputs)
+        with profiler.profiling(args.profile, 'configure'), \
+             subprocess_stats(args.stats), \
+             path.interning():
+            env, backend = environment_from_args(args)
+            env.probe_cache = ProbeCache.load(args.builddir.string())
+            if args.toolchain:
+                build.load_toolchain(env, args.toolchain)
+            finalize_environment(env, args, extra)
+
+            if not args.no_resolve_packages:
+                env.mopack = build.resolve_packages(
+                    env, args.package_files, args.package_flags,
+                    verbose=args.verbose
+                )
+
+            env.save(args.builddir.string())
+
+            build_inputs = build.configure_build(env)
+            write_build_files(env, backend, build_inputs)
+            env.probe_cache.save(args.builddir.string())
     except AbortConfigure:
         pass
     except Exception as e:
@@ -265,17 +337,21 @@ def regenerate(parser, subparser, args, extra):
                         .format(build.bfgfile))
 
     try:
-        env = Environment.load(args.builddir.string())
-        if env.toolchain.path:
-            build.load_toolchain(env, env.toolchain.path, args.regenerating)
-
-        env.save(args.builddir.string())
-
-        backend = list_backends()[env.backend]
-        build_inputs = build.configure_build(env, args.regenerating)
-        backend.write(env, build_inputs)
-        if env.compdb:
-            compdb.write(env, build_inputs)
+        with profiler.profiling(args.profile, 'regenerate'), \
+             subprocess_stats(args.stats), \
+             path.interning():
+            env = Environment.load(args.builddir.string())
+            env.probe_cache = ProbeCache.load(args.builddir.string())
+            if env.toolchain.path:
+                build.load_toolchain(env, env.toolchain.path,
+                                     args.regenerating)
+
+            env.save(args.builddir.string())
+
+            backend = list_backends()[env.backend]
+            build_inputs = build.configure_build(env, args.regenerating)
+            write_build_files(env, backend, build_inputs)
+            env.probe_cache.save(args.builddir.string())
     except AbortConfigure:
         pass
     except Exception as e:
@@ -348,7 +424,12 @@ def generate_completion(parser, subparser, args, extra):
         return 1
 
 
-def main():
+def startup_parser(make_parser):
+    with shell.execute_hook(_startup_stats.add):
+        return make_parser()
+
+
+def main_parser():
     parser = argparse.ArgumentParser(prog='bfg9000', description=description)
     subparsers = parser.add_subparsers(metavar='COMMAND')
     subparsers.required = True
@@ -387,6 +468,8 @@ def main():
                               const=Regenerating.lazy,
                               default=Regenerating.true, dest='regenerating',
                               help='only regenerate if something changed')
+    add_profile_arg(regenerate_p)
+    add_stats_arg(regenerate_p)
     regenerate_p.add_argument('builddir',
                               type=argparse.Directory(must_exist=True),
                               metavar='BUILDDIR', nargs='?', default='.',
@@ -444,6 +527,11 @@ def main():
     completion_p.add_argument('-s', '--shell', metavar='SHELL', default=shell,
                               help='shell type (default: %(default)s)')
 
+    return parser
+
+
+def main():
+    parser = startup_parser(main_parser)
     args, extra = parser.parse_known_args()
     log.init(args.color, debug=args.debug, warn_once=args.warn_once)
 
@@ -451,7 +539,7 @@ def main():
 
 
 def simple_main():
-    parser = simple_parser()
+    parser = startup_parser(simple_parser)
 
     args, extra = parser.parse_known_args()
     log.init(args.color, debug=args.debug, warn_once=args.warn_once)
@@ -1,9 +1,13 @@
+import hashlib
 import json
 import os
 import platform
+import threading
 from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
 
 from . import platforms
+from . import profiler
 from . import tools
 from . import shell
 from .backends import list_backends
@@ -124,7 +128,7 @@ class Toolchain:
 
 
 class Environment:
-    version = 18
+    version = 21
     envfile = '.bfg_environ'
 
     Mode = shell.Mode
@@ -134,6 +138,10 @@ class Environment:
         tools.init()
         env.__builders = {}
         env.__tools = {}
+        env.__pending = {}
+        env.__lock = threading.Lock()
+        env.__base_dirs = None
+        env.probe_cache = None
         return env
 
     def __init__(self, bfgdir, backend, backend_version, srcdir, builddir,
@@ -154,7 +162,8 @@ class Environment:
 
         self.variables = EnvVarDict(dict(os.environ))
 
-    def finalize(self, install_dirs, library_mode, compdb, extra_args=None):
+    def finalize(self, install_dirs, library_mode, compdb, extra_args=None,
+                 prefetch=None, find_jobs=1, merge_depfiles=False):
         # Fill in any install dirs that aren't already set (e.g. by a
         # toolchain file) with defaults from the target platform, but skip
         # absolute paths if this is a cross-compilation build.
@@ -173,6 +182,9 @@ class Environment:
         self.library_mode = LibraryMode(*library_mode)
         self.compdb = compdb
         self.extra_args = extra_args
+        self.prefetch_names = prefetch or []
+        self.find_jobs = find_jobs
+        self.merge_depfiles = merge_depfiles
 
     def reload(self):
         self.variables.reset()
@@ -188,6 +200,14 @@ class Environment:
             Root.builddir: self.builddir
         }
         dirs.update(self.install_dirs)
+
+        # Return the same mapping as last time if none of the directories have
+        # changed. This lets paths reuse their cached string forms.
+        old = self.__base_dirs
+        if ( old is not None and len(old) == len(dirs) and
+             all(old.get(k) is v for k, v in dirs.items()) ):
+            return old
+        self.__base_dirs = dirs
         return dirs
 
     @property
@@ -198,15 +218,79 @@ class Environment:
     def getvar(self, key, default=None):
         return self.variables.get(key, default)
 
+    def __fetch(self, cache, name, fn):
+        with self.__lock:
+            if name in cache:
+                return cache[name]
+            # If this is currently being created by another thread (e.g. when
+            # prefetching), wait for that to finish instead of creating a
+            # duplicate.
+            future = self.__pending.get((fn, name))
+            if future is None:
+                future = self.__pending[fn, name] = Future()
+                owner = True
+            else:
+                owner = False
+
+        if owner:
+            return self.__resolve(cache, name, fn, future)
+        return future.result()
+
+    def __resolve(self, cache, name, fn, future):
+        try:
+            result = self.__create(fn, name)
+        except BaseException as e:
+            # Forget about failures so that we report the error again the
+            # next time this is requested.
+            with self.__lock:
+                del self.__pending[fn, name]
+            future.set_exception(e)
+            raise
+
+        with self.__lock:
+            cache[name] = result
+            del self.__pending[fn, name]
+        future.set_result(result)
+        return result
+
+    def __create(self, fn, name):
+        kind = 'builder' if fn is tools.get_builder else 'tool'
+        with profiler.phase(name, kind):
+            return fn(self, name)
+
     def builder(self, lang):
-        if lang not in self.__builders:
-            self.__builders[lang] = tools.get_builder(self, lang)
-        return self.__builders[lang]
+        return self.__fetch(self.__builders, lang, tools.get_builder)
 
     def tool(self, name):
-        if name not in self.__tools:
-            self.__tools[name] = tools.get_tool(self, name)
-        return self.__tools[name]
+        return self.__fetch(self.__tools, name, tools.get_tool)
+
+    def prefetch(self, names=None):
+        if names is None:
+            names = self.prefetch_names
+
+        # Register all the tasks before starting any of them so that if one
+        # task needs another (e.g. `pkg_config` needs the C builder), it waits
+        # for that instead of creating its own.
+        tasks = {}
+        with self.__lock:
+            for i in names:
+                if tools.has_builder(i):
+                    fn, cache = tools.get_builder, self.__builders
+                else:
+                    fn, cache = tools.get_tool, self.__tools
+                if i not in cache and (fn, i) not in self.__pending:
+                    future = self.__pending[fn, i] = Future()
+                    tasks[fn, i] = (cache, future)
+        if not tasks:
+            return
+
+        # Creating builders and tools is mostly spent waiting on probe
+        # subprocesses, so create them all concurrently. Use one worker per
+        # task, since tasks can wait on each other. If creating something
+        # fails, we'll report the error if/when it's actually used.
+        with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+            for (fn, name), (cache, future) in tasks.items():
+                executor.submit(self.__resolve, cache, name, fn, future)
 
     def _runner(self, lang):
         try:
@@ -238,7 +322,8 @@ class Environment:
                             .format(lang))
         return args
 
-    def execute(self, args, *, env=None, extra_env=None, **kwargs):
+    def execute(self, args, *, env=None, extra_env=None, probe=False,
+                **kwargs):
         if env is None:
             env = self.variables
         if extra_env:
@@ -246,6 +331,16 @@ class Environment:
 
         if not kwargs.get('shell', False):
             args = Command.convert_args(args, lambda x: x.command)
+            # Probes are commands whose output depends only on the command
+            # itself and its environment, so we can reuse the results from
+            # previous runs. If `probe` isn't simply `True`, it holds extra
+            # data for the cache key (e.g. the state of files the command
+            # reads).
+            if probe and self.probe_cache is not None:
+                return self.probe_cache.execute(
+                    args, env=env, base_dirs=self.base_dirs,
+                    extra_key=None if probe is True else probe, **kwargs
+                )
 
         return shell.execute(args, env=env, base_dirs=self.base_dirs,
                              **kwargs)
@@ -253,35 +348,45 @@ class Environment:
     def run(self, args, lang=None, *posargs, **kwargs):
         return self.execute(self.run_arguments(args, lang), *posargs, **kwargs)
 
+    def to_json(self):
+        return {
+            'version': self.version,
+            'data': {
+                'bfgdir': self.bfgdir.to_json(),
+                'backend': self.backend,
+                'backend_version': str(self.backend_version),
+                'verbose': self.verbose,
+
+                'host_platform': self.host_platform.to_json(),
+                'target_platform': self.target_platform.to_json(),
+
+                'srcdir': self.srcdir.to_json(),
+                'builddir': self.builddir.to_json(),
+                'install_dirs': {
+                    k.name: try_to_json(v)
+                    for k, v in self.install_dirs.items()
+                },
+                'toolchain': self.toolchain.to_json(),
+                'mopack': [i.to_json() for i in self.mopack],
+
+                'library_mode': self.library_mode,
+                'compdb': self.compdb,
+                'extra_args': self.extra_args,
+                'prefetch': self.prefetch_names,
+                'find_jobs': self.find_jobs,
+                'merge_depfiles': self.merge_depfiles,
+
+                'variables': self.variables.to_json(),
+            }
+        }
+
+    def digest(self):
+        return hashlib.sha1(json.dumps(self.to_json(), sort_keys=True)
+                            .encode('utf-8')).hexdigest()
+
     def save(self, path):
         with open(os.path.join(path, self.envfile), 'w') as out:
-            json.dump({
-                'version': self.version,
-                'data': {
-                    'bfgdir': self.bfgdir.to_json(),
-                    'backend': self.backend,
-                    'backend_version': str(self.backend_version),
-                    'verbose': self.verbose,
-
-                    'host_platform': self.host_platform.to_json(),
-                    'target_platform': self.target_platform.to_json(),
-
-                    'srcdir': self.srcdir.to_json(),
-                    'builddir': self.builddir.to_json(),
-                    'install_dirs': {
-                        k.name: try_to_json(v)
-                        for k, v in self.install_dirs.items()
-                    },
-                    'toolchain': self.toolchain.to_json(),
-                    'mopack': [i.to_json() for i in self.mopack],
-
-                    'library_mode': self.library_mode,
-                    'compdb': self.compdb,
-                    'extra_args': self.extra_args,
-
-                    'variables': self.variables.to_json(),
-                }
-            }, out)
+            json.dump(self.to_json(), out)
 
     @classmethod
     def load(cls, path):
@@ -385,6 +490,18 @@ class Environment:
         if version < 18:
             data['verbose'] = False
 
+        # v19 adds the list of builders and tools to prefetch.
+        if version < 19:
+            data['prefetch'] = []
+
+        # v20 adds the number of threads to use when finding files.
+        if version < 20:
+            data['find_jobs'] = 1
+
+        # v21 adds the option to merge depfiles for Make.
+        if version < 21:
+            data['merge_depfiles'] = False
+
         # ----- bfg v0.8.0 -----
 
         # Now that we've upgraded, initialize the Environment object.
@@ -410,5 +527,8 @@ class Environment:
         env.mopack = [Path.from_json(i) for i in data['mopack']]
         env.variables = EnvVarDict.from_json(data['variables'])
         env.library_mode = LibraryMode(*data['library_mode'])
+        env.prefetch_names = data['prefetch']
+        env.find_jobs = data['find_jobs']
+        env.merge_depfiles = data['merge_depfiles']
 
         return env
@@ -232,3 +232,131 @@ class NameGlob(Glob):
             found_type = self.Type.dir if path.directory else self.Type.file
             return bool(self.type & found_type)
         return False
+
+
+class NameGlobSet:
+    # Match a path's basename against several `NameGlob`s at once by merging
+    # their regexes (one for each type of path).
+
+    def __init__(self, globs):
+        self.globs = tuple(globs)
+        self._regexes = {}
+        for t in (Glob.Type.file, Glob.Type.dir):
+            patterns = [i.regex.pattern for i in self.globs if i.type & t]
+            if patterns:
+                self._regexes[t] = re.compile('|'.join(patterns))
+
+    def match(self, path):
+        regex = self._regexes.get(Glob.Type.dir if path.directory else
+                                  Glob.Type.file)
+        return bool(regex and regex.match(path.basename()))
+
+
+class _GlobState:
+    __slots__ = ('literals', 'patterns', 'starstar', 'loop', 'accept')
+
+    def __init__(self, loop=False):
+        self.literals = {}
+        self.patterns = {}
+        self.starstar = None
+        self.loop = loop
+        self.accept = Glob.Type(0)
+
+
+class PathGlobSet:
+    # Match a path against several `PathGlob`s at once. The globs are compiled
+    # into a single NFA over path components: literal components (including
+    # the globs' bases) form a trie shared between all the globs, and each `**`
+    # is a looping state reachable from its parent. This way, we only need to
+    # look at each component of a path once, no matter how many globs there
+    # are. The results are the same as OR-ing the results of `PathGlob.match`
+    # for each glob.
+
+    def __init__(self, globs):
+        self.globs = tuple(globs)
+        self._roots = {}
+        self._glob_start = None
+
+        for i in self.globs:
+            state = self._roots.setdefault(i.base.root, _GlobState())
+            bits = i.pattern.split()
+            base_len = len(i.base.split())
+            state = self._add(state, bits[:base_len])
+            self._glob_start = state
+            self._base_len = base_len
+            state = self._add(state, bits[base_len:])
+            state.accept |= i.type
+
+    @staticmethod
+    def _add(state, bits):
+        for bit in bits:
+            if bit == '**':
+                # Consecutive `**`s are equivalent to a single one.
+                if not state.loop:
+                    if state.starstar is None:
+                        state.starstar = _GlobState(loop=True)
+                    state = state.starstar
+            elif PathGlob._is_glob(bit):
+                if bit not in state.patterns:
+                    state.patterns[bit] = (
+                        re.compile(fnmatch.translate(bit)).match, _GlobState()
+                    )
+                state = state.patterns[bit][1]
+            else:
+                state = state.literals.setdefault(bit, _GlobState())
+        return state
+
+    @staticmethod
+    def _closure(states):
+        result = {}
+        for i in states:
+            result[i] = None
+            if i.starstar:
+                result[i.starstar] = None
+        return result
+
+    def match(self, path, skip_base=False):
+        return self.match_subtree(path, skip_base)[0]
+
+    def match_subtree(self, path, skip_base=False):
+        # Return the result of matching `path`, along with whether any of its
+        # descendants could possibly match. This lets us prune directories
+        # that `match` alone can't rule out, e.g. a directory named `foo.c`
+        # for the glob `*.c`.
+        if skip_base:
+            # This is only allowed if there's exactly one glob, just like with
+            # `PathGlob.match`.
+            assert len(self.globs) == 1
+            start = self._glob_start
+            bits = path.split()[self._base_len:]
+            other_roots = False
+        else:
+            start = self._roots.get(path.root)
+            bits = path.split()
+            other_roots = len(self._roots) > (start is not None)
+            if start is None:
+                return PathGlob.Result.no, False
+
+        active = self._closure([start])
+        for bit in bits:
+            step = []
+            for state in active:
+                if state.loop:
+                    step.append(state)
+                if bit in state.literals:
+                    step.append(state.literals[bit])
+                for matcher, next_state in state.patterns.values():
+                    if matcher(bit):
+                        step.append(next_state)
+            if not step:
+                # No children of `path` could ever match any of our globs
+                # (except ones rooted elsewhere).
+                return (PathGlob.Result.no if other_roots
+                        else PathGlob.Result.never), False
+            active = self._closure(step)
+
+        found_type = Glob.Type.dir if path.directory else Glob.Type.file
+        result = (PathGlob.Result.yes if any(i.accept & found_type
+                                             for i in active)
+                  else PathGlob.Result.no)
+        return result, any(i.loop or i.literals or i.patterns for i in active)
@@ -14,12 +14,26 @@ from .path import BasePath
 class option_list:
     def __init__(self, *args):
         self._options = []
+        # The match keys of all the options in this list, so we can check for
+        # duplicates in constant time. Options without a match key are checked
+        # against the whole list instead.
+        self._keys = set()
         self.collect(*args)
 
     def append(self, option):
-        if ( isinstance(option, safe_str.stringy_types) or
-             not any(option.matches(i) for i in self._options) ):
+        if isinstance(option, safe_str.stringy_types):
             self._options.append(option)
+            return
+
+        key = option.match_key() if isinstance(option, Option) else None
+        if key is None:
+            if any(option.matches(i) for i in self._options):
+                return
+        elif key in self._keys:
+            return
+        else:
+            self._keys.add(key)
+        self._options.append(option)
 
     def extend(self, options):
         for i in options:
@@ -52,6 +66,9 @@ class option_list:
 
     def __setitem__(self, key, value):
         self._options[key] = value
+        self._keys = {k for k in (
+            i.match_key() for i in self._options if isinstance(i, Option)
+        ) if k is not None}
 
     def __eq__(self, rhs):
         return type(self) is type(rhs) and self._options == rhs._options
@@ -79,7 +96,8 @@ class option_list:
 
 
 class ForwardOptions:
-    __slots__ = ['compile_options', 'link_options', 'libs', 'packages']
+    __slots__ = ['compile_options', 'link_options', 'libs', 'packages',
+                 '_inherited']
 
     def __init__(self, *, compile_options=None, link_options=None, libs=None,
                  packages=None):
@@ -87,27 +105,69 @@ class ForwardOptions:
         self.link_options = link_options or option_list()
         self.libs = libs or []
         self.packages = packages or []
+        self._inherited = None
+
+    @property
+    def _fields(self):
+        return self.__slots__[:-1]
 
     def update(self, rhs):
-        for i in self.__slots__:
+        for i in self._fields:
             getattr(self, i).extend(getattr(rhs, i))
+        self._inherited = None
+
+    def _merge(self, rhs, seen):
+        # Like `update`, but skip any libs or packages we've already seen. This
+        # keeps the first occurrence of each, which is the same one that the
+        # option lists (and thus the linker flags) would keep.
+        self.compile_options.extend(rhs.compile_options)
+        self.link_options.extend(rhs.link_options)
+        for i in ('libs', 'packages'):
+            mine = getattr(self, i)
+            for j in getattr(rhs, i):
+                if j not in seen[i]:
+                    seen[i].add(j)
+                    mine.append(j)
+
+    def inherited(self):
+        # Get the options forwarded from all the libraries that this one
+        # depends on. Libraries are usually shared by many consumers (often in
+        # diamond-shaped graphs), so compute this once per library and reuse
+        # it. This assumes that our options are fully set up before anything
+        # links to our library.
+        if self._inherited is None:
+            # Fill in any missing results in topological order so that each
+            # library's dependencies are ready before we get to it.
+            stack = [(self, False)]
+            while stack:
+                node, ready = stack.pop()
+                if node._inherited is not None:
+                    continue
+                if ready:
+                    node._inherited = node.recurse(node.libs)
+                    continue
+
+                stack.append((node, True))
+                for i in node.libs:
+                    forward_opts = getattr(i, 'forward_opts', None)
+                    if forward_opts and forward_opts._inherited is None:
+                        stack.append((forward_opts, False))
+        return self._inherited
 
     def __eq__(self, rhs):
-        return all(getattr(self, i) == getattr(rhs, i) for i in self.__slots__)
+        return all(getattr(self, i) == getattr(rhs, i) for i in self._fields)
 
     def __repr__(self):
-        return repr({i: getattr(self, i) for i in self.__slots__})
+        return repr({i: getattr(self, i) for i in self._fields})
 
     @classmethod
     def recurse(cls, libs):
-        def do_recurse(result, libs):
-            for i in libs:
-                if forward_opts := getattr(i, 'forward_opts', None):
-                    result.update(forward_opts)
-                    do_recurse(result, forward_opts.libs)
-
         result = cls()
-        do_recurse(result, libs)
+        seen = {'libs': set(), 'packages': set()}
+        for i in libs:
+            if forward_opts := getattr(i, 'forward_opts', None):
+                result._merge(forward_opts, seen)
+                result._merge(forward_opts.inherited(), seen)
         return result
 
 
@@ -206,6 +266,23 @@ class Option(metaclass=OptionMeta):
     def matches(self, rhs):
         return self == rhs
 
+    def match_key(self):
+        # Return a hashable key such that two options match if and only if
+        # their keys are equal, or None if there's no such key (e.g. if some
+        # of our values are unhashable). Subclasses that override `matches`
+        # should override this too; otherwise, they won't have a key.
+        if type(self).matches is not Option.matches:
+            return None
+        key = (type(self),) + tuple(
+            (list, tuple(v)) if isinstance(v, list) else v
+            for v in (getattr(self, i) for i in self.__slots__)
+        )
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
     def __eq__(self, rhs):
         return type(self) is type(rhs) and all(
             getattr(self, i) == getattr(rhs, i) for i in self.__slots__
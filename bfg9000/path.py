@@ -1,10 +1,13 @@
 import functools
 import ntpath
 import os
+import time
+from concurrent.futures import Future
 from contextlib import contextmanager
+from itertools import chain
 
 from .platforms.basepath import (BasePath, Root, InstallRoot,  # noqa: F401
-                                 DestDir)
+                                 DestDir, interning)
 from .platforms.host import platform_info
 
 Path = platform_info().Path
@@ -95,30 +98,248 @@ def touch(path, variables=None):
     os.utime(path.string(variables), None)
 
 
-def listdir(path, variables=None):
-    dirs, nondirs = [], []
+def _same_contents(a, b, bufsize=65536):
     try:
-        names = os.listdir(path.string(variables))
-        for name in names:
-            curpath = path.append(name)
-            if isdir(curpath, variables):
-                dirs.append(curpath.as_directory())
-            else:
-                nondirs.append(curpath)
+        with open(a, 'rb') as fa, open(b, 'rb') as fb:
+            if os.fstat(fa.fileno()).st_size != os.fstat(fb.fileno()).st_size:
+                return False
+            while True:
+                ba, bb = fa.read(bufsize), fb.read(bufsize)
+                if ba != bb:
+                    return False
+                if not ba:
+                    return True
+    except OSError:
+        return False
+
+
+@contextmanager
+def update_file(path, variables=None, mode='w', *, touch=False):
+    # Write to a temporary file next to `path`, and then replace `path` with it
+    # only if the contents differ. This way, regenerating a file with the same
+    # contents doesn't change its modification time, which would otherwise
+    # make build tools (or anything else watching it) think it's changed. If
+    # `touch` is true, update the modification time of an unchanged file
+    # anyway.
+    filename = path.string(variables)
+    tmpname = '{}.{}.tmp'.format(filename, os.getpid())
+    try:
+        with open(tmpname, mode) as f:
+            yield f
+        if _same_contents(tmpname, filename):
+            os.remove(tmpname)
+            if touch:
+                os.utime(filename, None)
+        else:
+            os.replace(tmpname, filename)
+    except BaseException:
+        try:
+            os.remove(tmpname)
+        except OSError:  # pragma: no cover
+            pass
+        raise
+
+
+def _scandir(path, variables=None):
+    # Use the file type information from `os.scandir` so that we don't need to
+    # stat each entry separately. Along with the subdirectories and other
+    # entries, return the set of subdirectories that are actually symlinks.
+    dirs, nondirs, links = [], [], set()
+    try:
+        with os.scandir(path.string(variables)) as entries:
+            for entry in entries:
+                curpath = path.append(entry.name)
+                if entry.is_dir():
+                    curpath = curpath.as_directory()
+                    dirs.append(curpath)
+                    if entry.is_symlink():
+                        links.add(curpath)
+                else:
+                    nondirs.append(curpath)
     except OSError:
         pass
-    return dirs, nondirs
+    return dirs, nondirs, links
+
+
+class DirectorySnapshot:
+    # An in-memory record of the directory listings we've already read. This
+    # lets multiple walks over the same (or overlapping) trees share a single
+    # traversal of the filesystem.
+    #
+    # Along with each listing, we record the directory's modification time so
+    # that we can save the snapshot and reuse listings for any unchanged
+    # directories later on.
+
+    # Don't record modification times that are this close to the current time,
+    # since the directory could change again without its modification time
+    # changing (e.g. on filesystems with coarse timestamps).
+    _racy_ns = 2 * 10**9
+
+    def __init__(self):
+        self._listings = {}
+        self._mtimes = {}
+        self._saved = {}
+
+    @classmethod
+    def _read(cls, path, variables, saved):
+        # Get the modification time *before* listing the directory; that way,
+        # if it changes while we're reading it, we'll notice next time.
+        try:
+            mtime = os.stat(path.string(variables)).st_mtime_ns
+            if mtime > time.time_ns() - cls._racy_ns:
+                mtime = None
+        except OSError:
+            mtime = None
+
+        if mtime is not None and path in saved and saved[path][0] == mtime:
+            return mtime, saved[path][1]
+        return mtime, _scandir(path, variables)
+
+    def scandir(self, path, variables=None):
+        result = self._listings.get(path)
+        if result is None:
+            result = self._read(path, variables, self._saved)
+        elif isinstance(result, Future):
+            result = result.result()
+        else:
+            return result
+
+        self._mtimes[path], self._listings[path] = result
+        return self._listings[path]
+
+    def prefetch(self, executor, paths, variables=None):
+        # Start reading each of these directories in the background so that
+        # their listings are (hopefully) ready by the time we need them.
+        for i in paths:
+            if i not in self._listings:
+                self._listings[i] = executor.submit(self._read, i, variables,
+                                                    self._saved)
+
+    def reuse(self, other):
+        # Reuse the listings from `other` (typically loaded from a previous
+        # run) for any directories whose modification times haven't changed.
+        self._saved.update(other._saved)
+
+    def __len__(self):
+        return len(self._listings)
+
+    def to_json(self, paths):
+        result = []
+        for path, mtime in self._mtimes.items():
+            if mtime is None:
+                continue
+            dirs, nondirs, links = self._listings[path]
+            result.append([paths.add(path), mtime,
+                           [paths.add(i) for i in dirs],
+                           [paths.add(i) for i in nondirs],
+                           sorted(paths.add(i) for i in links)])
+        return result
+
+    @classmethod
+    def from_json(cls, data, paths):
+        snapshot = cls()
+        for path, mtime, dirs, nondirs, links in data:
+            snapshot._saved[paths[path]] = (mtime, (
+                [paths[i] for i in dirs], [paths[i] for i in nondirs],
+                {paths[i] for i in links}
+            ))
+        return snapshot
+
+
+class PathTable:
+    # A compact, serializable table of paths. Each path is stored only once,
+    # as its name plus the index of its parent directory's entry (or, for the
+    # root of a path, the name of its root), and is referred to elsewhere by
+    # its index in the table. Since the paths were already normalized when
+    # they were added, loading them doesn't need to normalize them again,
+    # which makes loading large tables much faster than `Path.from_json`.
+
+    _roots = {i.name: i for i in chain(Root, InstallRoot)}
+
+    def __init__(self, paths=None):
+        self._entries = []
+        self._index = {}
+        self._paths = [] if paths is None else paths
+
+    def add(self, path):
+        key = (path.suffix, path.root, path.destdir, path.directory)
+        try:
+            return self._index[key]
+        except KeyError:
+            pass
+
+        if not path.suffix:
+            entry = [None, path.root.name, path.destdir]
+        else:
+            # Absolute paths are stored whole, since their suffixes can't be
+            # split as simply (e.g. if they have a drive letter).
+            parent, _, name = (('', None, path.suffix)
+                               if path.root == Root.absolute else
+                               path.suffix.rpartition(BasePath.sep))
+            parent = type(path)._from_normalized(parent, path.root,
+                                                 path.destdir, True)
+            entry = [self.add(parent), name, path.directory]
+
+        self._index[key] = len(self._entries)
+        self._entries.append(entry)
+        self._paths.append(path)
+        return self._index[key]
+
+    def __getitem__(self, index):
+        return self._paths[index]
+
+    def to_json(self):
+        return self._entries
+
+    @classmethod
+    def from_json(cls, data, type=Path):
+        # Since parent entries always come before their children, we can
+        # build every path in a single pass.
+        paths = []
+        for parent, name, flag in data:
+            if parent is None:
+                paths.append(type._from_normalized('', cls._roots[name], flag,
+                                                   True))
+            else:
+                parent = paths[parent]
+                suffix = (parent.suffix + BasePath.sep + name if parent.suffix
+                          else name)
+                paths.append(type._from_normalized(suffix, parent.root,
+                                                   parent.destdir, flag))
+        return cls(paths)
 
 
-def walk(top, variables=None):
+def listdir(path, variables=None, snapshot=None):
+    scandir = _scandir if snapshot is None else snapshot.scandir
+    dirs, nondirs, _ = scandir(path, variables)
+    return list(dirs), list(nondirs)
+
+
+def walk(top, variables=None, snapshot=None, executor=None):
     if not exists(top, variables):
         return
-    dirs, nondirs = listdir(top, variables)
-    yield top, dirs, nondirs
-    for d in dirs:
-        if not islink(d, variables):
-            for i in walk(d, variables):
-                yield i
+
+    # If we have an executor, read subdirectories concurrently, storing the
+    # pending listings in the snapshot.
+    if executor is not None and snapshot is None:
+        snapshot = DirectorySnapshot()
+
+    # Walk the tree depth-first, yielding each directory before its children.
+    # As with `os.walk`, callers can prune the walk by removing elements from
+    # `dirs`. Since we only ever consume listings in this order, the results
+    # are the same regardless of how (or when) the directories were read.
+    scandir = _scandir if snapshot is None else snapshot.scandir
+    stack = [top]
+    while stack:
+        path = stack.pop()
+        dirs, nondirs, links = scandir(path, variables)
+        dirs = list(dirs)
+        yield path, dirs, list(nondirs)
+
+        subdirs = [i for i in dirs if i not in links]
+        if executor is not None:
+            snapshot.prefetch(executor, subdirs, variables)
+        stack.extend(reversed(subdirs))
 
 
 @contextmanager
@@ -0,0 +1,385 @@
+import os
+import re
+from shlex import shlex
+
+__all__ = ['PcFile', 'PcFileError', 'PcNotFoundError', 'PcResolver']
+
+_line_ex = re.compile(r'^([A-Za-z0-9_.]+)\s*([:=])\s*(.*)$')
+_var_ex = re.compile(r'\$\$|\$\{([^}]*)\}')
+_required_fields = ('name', 'description', 'version')
+_requires_ops = {
+    '=': lambda x: x == 0, '==': lambda x: x == 0, '!=': lambda x: x != 0,
+    '<': lambda x: x < 0, '<=': lambda x: x <= 0, '>': lambda x: x > 0,
+    '>=': lambda x: x >= 0,
+}
+_version_ex = re.compile(r'[^A-Za-z0-9~]*(?:(~)|([0-9]+)|([A-Za-z]+))?')
+
+
+class PcFileError(Exception):
+    """An error indicating that a .pc file (or a query about it) can't be
+    handled by the native parser. Callers should fall back to the real
+    pkg-config executable."""
+
+
+class PcNotFoundError(LookupError):
+    pass
+
+
+def _split_args(s):
+    lexer = shlex(s, posix=True)
+    lexer.commenters = ''
+    lexer.whitespace_split = True
+    try:
+        return list(lexer)
+    except ValueError as e:
+        raise PcFileError(str(e))
+
+
+def _split_requires(s):
+    # Requirements look like `foo >= 1.0, bar, baz`. Commas are optional.
+    tokens = s.replace(',', ' ').split()
+    result = []
+    while tokens:
+        name = tokens.pop(0)
+        if tokens and tokens[0] in _requires_ops:
+            if len(tokens) < 2:
+                raise PcFileError('missing version for {!r}'.format(name))
+            result.append((name, (tokens.pop(0), tokens.pop(0))))
+        else:
+            result.append((name, None))
+    return result
+
+
+def _compare_versions(a, b):
+    # Compare two version strings like pkgconf (i.e. with RPM's `rpmvercmp`),
+    # returning -1, 0, or 1. Versions are split into runs of digits or
+    # letters; digits compare numerically and sort after letters, `~` sorts
+    # before everything (even the end of the version), and if all else is
+    # equal, the longer version wins.
+    if a.lower() == b.lower():
+        return 0
+
+    i = j = 0
+    while i < len(a) or j < len(b):
+        m, n = _version_ex.match(a, i), _version_ex.match(b, j)
+        i, j = m.end(), n.end()
+        if m.group(1) or n.group(1):
+            if not m.group(1):
+                return 1
+            if not n.group(1):
+                return -1
+            continue
+
+        x, y = m.group(2) or m.group(3), n.group(2) or n.group(3)
+        if not x or not y:
+            return (x is not None) - (y is not None)
+        if m.group(2):
+            if not n.group(2):
+                return 1
+            x, y = x.lstrip('0'), y.lstrip('0')
+            if len(x) != len(y):
+                return 1 if len(x) > len(y) else -1
+        elif not n.group(3):
+            return -1
+        if x != y:
+            return 1 if x > y else -1
+    return 0
+
+
+# Flags that pkgconf never splits into a type and a value.
+_special_flags = ('-lib:', '-framework', '-isystem', '-idirafter', '-pthread',
+                  '-Wa,', '-Wl,', '-Wp,', '-trigraphs', '-pedantic', '-ansi',
+                  '-std=', '-stdlib=', '-include', '-nostdinc',
+                  '-nostdlibinc', '-nobuiltininc')
+# Flags that pkgconf groups with the arguments that follow them.
+_grouped_flags = ('-Wl,--start-group', '-framework', '-isystem', '-idirafter',
+                  '-include')
+
+
+def _fragment(arg):
+    # Split a flag into a (type, value) pair the way pkgconf does, e.g.
+    # `-lfoo` becomes `('l', 'foo')`. Special flags have an empty type.
+    if arg in ('-I', '-L', '-l') or arg.startswith(_grouped_flags):
+        raise PcFileError('unsupported flag {!r}'.format(arg))
+    if len(arg) > 1 and arg[0] == '-' and not arg.startswith(_special_flags):
+        return arg[1], arg[2:]
+    return '', arg
+
+
+def _merge_fragments(fragments, args, private):
+    # Add flags to a list of fragments the same way as pkgconf. Private flags
+    # are always added. Otherwise, -I and -L flags only keep their first
+    # occurrence, and most other flags replace their last occurrence so that
+    # they end up after everything that uses them.
+    for arg in args:
+        frag = _fragment(arg)
+        type, data = frag
+        if not private:
+            found = next((n for n in range(len(fragments) - 1, -1, -1)
+                          if fragments[n] == frag), None)
+            if type in ('F', 'I', 'L'):
+                if found is not None:
+                    continue
+            elif found is not None and (
+                not data.startswith('-') or data.startswith(_special_flags)
+            ):
+                prev = fragments[found - 1][0] if found else None
+                if ( prev is None or prev in ('I', 'L', 'l') or not type or
+                     prev == type ):
+                    del fragments[found]
+        fragments.append(frag)
+
+
+class PcFile:
+    def __init__(self, name, path, variables, fields):
+        self.name = name
+        self.path = path
+        self.variables = variables
+        self.fields = fields
+
+    @classmethod
+    def parse(cls, name, path, text):
+        variables = {'pcfiledir': os.path.dirname(path),
+                     'pc_sysrootdir': '/'}
+        fields = {}
+
+        def expand(m):
+            if m.group(0) == '$$':
+                return '$'
+            try:
+                return variables[m.group(1)]
+            except KeyError:
+                raise PcFileError('undefined variable {!r} in {}'
+                                  .format(m.group(1), path))
+
+        # Join continued lines and strip comments, then parse each line.
+        text = re.sub(r'\\\r?\n', '', text)
+        for line in text.splitlines():
+            line = re.sub(r'(?<!\\)#.*$', '', line).replace(r'\#', '#')
+            line = line.strip()
+            if not line:
+                continue
+
+            m = _line_ex.match(line)
+            if not m:
+                raise PcFileError('unable to parse {!r} in {}'
+                                  .format(line, path))
+
+            key, kind, value = m.groups()
+            value = _var_ex.sub(expand, value.strip())
+            if kind == '=':
+                variables[key] = value
+            else:
+                fields[key.lower()] = value
+
+        return cls(name, path, variables, fields)
+
+    @property
+    def version(self):
+        try:
+            return self.fields['version']
+        except KeyError:
+            raise PcFileError('no version in {}'.format(self.path))
+
+    def requires(self):
+        return _split_requires(self.fields.get('requires', ''))
+
+    def requires_private(self):
+        return _split_requires(self.fields.get('requires.private', ''))
+
+    def cflags(self):
+        return _split_args(self.fields.get('cflags', ''))
+
+    def cflags_private(self):
+        return _split_args(self.fields.get('cflags.private', ''))
+
+    def libs(self):
+        return _split_args(self.fields.get('libs', ''))
+
+    def libs_private(self):
+        return _split_args(self.fields.get('libs.private', ''))
+
+    def __repr__(self):
+        return '<PcFile({!r}, {!r})>'.format(self.name, self.path)
+
+
+class PcResolver:
+    """Resolve pkg-config queries in-process by reading .pc files directly.
+    This mimics the behavior of `pkgconf` (as of version 1.8), raising
+    `PcFileError` for anything it can't handle."""
+
+    # pkgconf walks the full dependency graph, visiting shared dependencies
+    # once for each path to them. For large graphs, it's cheaper to let
+    # pkgconf do this than to emulate it.
+    max_visits = 256
+
+    def __init__(self, search_dirs, *, system_include_dirs=(),
+                 system_lib_dirs=(), allow_system_cflags=False,
+                 allow_system_libs=False, disable_uninstalled=False):
+        self.search_dirs = search_dirs
+        self.system_include_dirs = {os.path.normpath(i)
+                                    for i in system_include_dirs}
+        self.system_lib_dirs = {os.path.normpath(i) for i in system_lib_dirs}
+        self.allow_system_cflags = allow_system_cflags
+        self.allow_system_libs = allow_system_libs
+        self.disable_uninstalled = disable_uninstalled
+        self._files = {}
+        self._fragments = {}
+
+    def _find(self, name):
+        candidates = [name]
+        if not self.disable_uninstalled and not name.endswith('-uninstalled'):
+            candidates.insert(0, name + '-uninstalled')
+
+        for i in candidates:
+            for d in self.search_dirs:
+                path = os.path.join(d, i + '.pc')
+                if os.path.isfile(path):
+                    if i.endswith('-uninstalled'):
+                        # Uninstalled packages get special treatment (e.g.
+                        # `pc_top_builddir`), so let pkg-config handle them.
+                        raise PcFileError('uninstalled package {!r}'
+                                          .format(name))
+                    return path
+        raise PcNotFoundError(name)
+
+    def find(self, name):
+        if name not in self._files:
+            try:
+                path = self._find(name)
+                with open(path, 'r') as f:
+                    pc = PcFile.parse(name, path, f.read())
+            except OSError as e:
+                raise PcFileError(str(e))
+
+            # pkgconf ignores files without these fields.
+            if not all(i in pc.fields for i in _required_fields):
+                raise PcFileError('missing required fields in {}'
+                                  .format(path))
+            self._files[name] = pc
+        return self._files[name]
+
+    def _traverse(self, names, visit, search_private):
+        # Walk the dependency graph like pkgconf: call `visit` on each package
+        # before its requirements, and don't skip packages we've already
+        # visited. `visit` also gets whether we reached the package via a
+        # private requirement. Note that pkgconf resets this after walking
+        # *any* package's private requirements, even in the middle of walking
+        # its parent's, so we do too.
+        private = False
+        visits = 0
+
+        def walk(name, spec):
+            nonlocal private, visits
+            visits += 1
+            if visits > self.max_visits:
+                raise PcFileError('dependency graph is too large')
+
+            try:
+                pc = self.find(name)
+            except PcNotFoundError:
+                # Let pkg-config report missing requirements.
+                raise PcFileError('unable to find {!r}'.format(name))
+
+            if spec:
+                op, version = spec
+                if not _requires_ops[op](_compare_versions(pc.version,
+                                                           version)):
+                    raise PcFileError('unsatisfied requirement {!r}'
+                                      .format(name))
+
+            visit(pc, private)
+            for i, j in pc.requires():
+                walk(i, j)
+            if search_private:
+                private = True
+                for i, j in pc.requires_private():
+                    walk(i, j)
+                private = False
+
+        # Make sure all the top-level packages exist first so that we can
+        # report a missing package instead of a missing requirement.
+        for i in names:
+            self.find(i)
+        for i in names:
+            walk(i, None)
+
+    def _fragments_for(self, names, kind, static):
+        # Each query for a set of packages only filters the same fragments
+        # differently, so remember them (or the reason we couldn't get them).
+        key = (tuple(names), kind, static)
+        if key not in self._fragments:
+            try:
+                self._fragments[key] = self._get_fragments(names, kind, static)
+            except PcFileError as e:
+                self._fragments[key] = e
+        result = self._fragments[key]
+        if isinstance(result, PcFileError):
+            raise result
+        return result
+
+    def _get_fragments(self, names, kind, static):
+        result = []
+        if kind == 'cflags':
+            # pkgconf always includes private requirements for cflags, but
+            # only includes `Cflags.private` when linking statically.
+            self._traverse(names, lambda pc, private: _merge_fragments(
+                result, pc.cflags(), False
+            ), True)
+            if static:
+                self._traverse(names, lambda pc, private: _merge_fragments(
+                    result, pc.cflags_private(), True
+                ), True)
+        else:
+            def visit(pc, private):
+                _merge_fragments(result, pc.libs(), private)
+                if static:
+                    _merge_fragments(result, pc.libs_private(), True)
+
+            self._traverse(names, visit, static)
+        return result
+
+    def _flags(self, names, kind, only, static):
+        allow = (self.allow_system_cflags if kind == 'cflags' else
+                 self.allow_system_libs)
+        result = []
+        for type, data in self._fragments_for(names, kind, static):
+            if not allow and self._is_system(type, data):
+                continue
+            if kind == 'cflags':
+                flag_kind = 'I' if type == 'I' else 'other'
+            else:
+                flag_kind = type if type in ('L', 'l') else 'other'
+            if flag_kind == only:
+                result.append('-' + type + data if type else data)
+        return result
+
+    def _is_system(self, type, data):
+        if type == 'I':
+            return os.path.normpath(data) in self.system_include_dirs
+        elif type == 'L':
+            return os.path.normpath(data) in self.system_lib_dirs
+        return False
+
+    def modversion(self, names):
+        return '\n'.join(self.find(i).version for i in names)
+
+    def variable(self, names, var):
+        if len(names) != 1:
+            raise PcFileError('multiple packages')
+        return self.find(names[0]).variables.get(var, '')
+
+    def requires(self, names):
+        result = []
+        for i in names:
+            for name, spec in self.find(i).requires():
+                result.append(name if spec is None else ' '.join(
+                    (name,) + spec
+                ))
+        return result
+
+    def cflags(self, names, only, static=False):
+        return self._flags(names, 'cflags', only, static)
+
+    def libs(self, names, only, static=False):
+        return self._flags(names, 'libs', only, static)
@@ -1,6 +1,7 @@
 import ntpath
 import os
 import posixpath
+from contextlib import contextmanager
 from enum import Enum
 from itertools import chain
 
@@ -12,13 +13,28 @@ InstallRoot = Enum('InstallRoot', ['prefix', 'exec_prefix', 'bindir', 'libdir',
                                    'includedir', 'datadir', 'mandir'])
 DestDir = Enum('DestDir', ['destdir'])
 
+# When enabled, paths created from already-normalized components are interned
+# so that identical paths share a single object.
+_intern_table = None
+
+
+@contextmanager
+def interning():
+    global _intern_table
+    old, _intern_table = _intern_table, {}
+    try:
+        yield
+    finally:
+        _intern_table = old
+
 
 class BasePath(safe_str.safe_string):
-    __slots__ = ['destdir', 'root', 'suffix']
+    __slots__ = ['destdir', 'root', 'suffix', '_string']
 
     curdir = posixpath.curdir
     pardir = posixpath.pardir
     sep = posixpath.sep
+    __parprefix = posixpath.pardir + posixpath.sep
 
     __repr_variables = dict(
         [(i, '$({})'.format(i.name)) for i in chain(Root, InstallRoot)] +
@@ -53,6 +69,31 @@ class BasePath(safe_str.safe_string):
         self.root = root
         self.directory = directory or isdir or normpath == ''
         self.destdir = bool(destdir)
+        self._string = None
+
+    @classmethod
+    def _from_normalized(cls, suffix, root, destdir, directory):
+        # Create a path from components that are already normalized (e.g. from
+        # another path or a serialized path table), skipping the relatively
+        # expensive normalization and validation in `__init__`.
+        table = _intern_table
+        if table is not None:
+            key = (cls, suffix, root, destdir, directory)
+            result = table.get(key)
+            if result is not None:
+                return result
+
+        result = cls.__new__(cls)
+        result.suffix = suffix
+        result.root = root
+        result.directory = directory
+        result.destdir = destdir
+        result._string = None
+        if table is not None:
+            # Use `setdefault` in case another thread (e.g. when walking
+            # directories in parallel) just interned this same path.
+            result = table.setdefault(key, result)
+        return result
 
     @classmethod
     def abspath(cls, path, directory=None, absdrive=True):
@@ -108,13 +149,26 @@ class BasePath(safe_str.safe_string):
             return self._localize_path(thing)
         return thing
 
+    def __simple(self):
+        # Paths that are relative to a root (and don't have anything that looks
+        # like a drive or a home directory) can be modified without needing to
+        # normalize or validate them again. Other paths take the slow route.
+        return (self.root != Root.absolute and
+                not self.suffix.startswith((posixpath.sep, '~')))
+
     def cross(self, env):
         cls = env.target_platform.Path
+        if self.__simple():
+            return cls._from_normalized(self.suffix, self.root, False,
+                                        self.directory)
         return cls(self.suffix, self.root, False, self.directory)
 
     def as_directory(self):
         if self.directory:
             return self
+        if self.__simple():
+            return self._from_normalized(self.suffix, self.root, self.destdir,
+                                         True)
         return type(self)(self.suffix, self.root, self.destdir, True)
 
     def has_drive(self):
@@ -124,6 +178,9 @@ class BasePath(safe_str.safe_string):
     def parent(self):
         if not self.suffix:
             raise ValueError('already at root')
+        if self.__simple():
+            return self._from_normalized(posixpath.dirname(self.suffix),
+                                         self.root, self.destdir, True)
         return type(self)(posixpath.dirname(self.suffix), self.root,
                           self.destdir, directory=True)
 
@@ -131,20 +188,37 @@ class BasePath(safe_str.safe_string):
         drive, path, isdir = self.__normalize(path, expand_user=True)
         if not posixpath.isabs(path):
             path, _ = self.__join(self.suffix, path or '.')
+            if not drive and self.__simple():
+                if ( path == posixpath.pardir or
+                     path.startswith(self.__parprefix) ):
+                    raise ValueError("too many '..': path cannot escape root")
+                return self._from_normalized(path, self.root, self.destdir,
+                                             isdir or path == '')
         return type(self)(drive + path, self.root, self.destdir, isdir)
 
     def ext(self):
         return posixpath.splitext(self.suffix)[1]
 
     def addext(self, ext):
-        return type(self)(self.suffix + ext, self.root, self.destdir,
-                          self.directory)
+        return self.__derive(self.suffix + ext, ext)
 
     def stripext(self, replace=None):
         name = posixpath.splitext(self.suffix)[0]
         if replace:
             name += replace
-        return type(self)(name, self.root, self.destdir, self.directory)
+        return self.__derive(name, replace)
+
+    def __derive(self, suffix, added):
+        # Create a path with a new suffix for the same root. If we only added
+        # something without any separators (like an extension) to a non-empty
+        # suffix, the result is still normalized, so we can skip normalizing
+        # it again.
+        if self.suffix and self.__simple() and (
+            not added or ('/' not in added and '\\' not in added)
+        ):
+            return self._from_normalized(suffix, self.root, self.destdir,
+                                         self.directory)
+        return type(self)(suffix, self.root, self.destdir, self.directory)
 
     def splitleaf(self):
         return self.parent(), self.basename()
@@ -170,6 +244,13 @@ class BasePath(safe_str.safe_string):
         return self.__localize(result, localize)
 
     def reroot(self, root=Root.builddir):
+        # Absolute paths stay absolute, and other paths need to be validated
+        # against their new root.
+        if ( self.__simple() and root != Root.absolute and
+             isinstance(root, (Root, InstallRoot)) and
+             not (self.destdir and isinstance(root, Root)) ):
+            return self._from_normalized(self.suffix, root, self.destdir,
+                                         self.directory)
         return type(self)(self.suffix, root, self.destdir, self.directory)
 
     def to_json(self):
@@ -219,20 +300,23 @@ class BasePath(safe_str.safe_string):
                 self.__localize(suffix, localize))
 
     def string(self, variables=None):
-        path = self
-        result = ''
-
-        while True:
-            real = path.realize(variables)
-            if isinstance(real, safe_str.jbos):
-                path, suffix = real.bits
-                result = suffix + result
-            elif isinstance(real, BasePath):
-                path = real
-            else:
-                result = real + result
-                break
+        # Paths are immutable, so we can cache the result for the last
+        # `variables` we were called with. This is almost always the
+        # environment's `base_dirs`, which is reused as long as it's unchanged.
+        cached = self._string
+        if cached is not None and cached[0] is variables:
+            return cached[1]
+
+        real = self.realize(variables)
+        if isinstance(real, safe_str.jbos):
+            path, suffix = real.bits
+            result = path.string(variables) + suffix
+        elif isinstance(real, BasePath):
+            result = real.string(variables)
+        else:
+            result = real
 
+        self._string = (variables, result)
         return result
 
     def __repr__(self):
@@ -245,6 +329,9 @@ class BasePath(safe_str.safe_string):
         return hash(self.suffix)
 
     def __eq__(self, rhs):
+        # Interned paths are often identical, so check that first.
+        if self is rhs:
+            return True
         if type(self) is not type(rhs):
             return NotImplemented
         return (self.root == rhs.root and self.suffix == rhs.suffix and
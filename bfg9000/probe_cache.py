@@ -0,0 +1,98 @@
+import json
+import os
+
+from . import shell
+from .iterutils import listify
+
+# Environment variables that can affect the output of toolchain probes without
+# appearing on the command line.
+probe_vars = (
+    'PATH', 'CPATH', 'C_INCLUDE_PATH', 'CPLUS_INCLUDE_PATH',
+    'OBJC_INCLUDE_PATH', 'LIBRARY_PATH', 'COMPILER_PATH', 'GCC_EXEC_PREFIX',
+    'CPPFLAGS', 'CFLAGS', 'CXXFLAGS', 'OBJCFLAGS', 'OBJCXXFLAGS', 'FFLAGS',
+    'LDFLAGS', 'LDLIBS', 'SDKROOT', 'MACOSX_DEPLOYMENT_TARGET',
+    'PKG_CONFIG_PATH', 'PKG_CONFIG_LIBDIR', 'PKG_CONFIG_SYSROOT_DIR',
+    'PKG_CONFIG_DISABLE_UNINSTALLED', 'PKG_CONFIG_ALLOW_SYSTEM_CFLAGS',
+    'PKG_CONFIG_ALLOW_SYSTEM_LIBS', 'PKG_CONFIG_TOP_BUILD_DIR',
+)
+
+
+class ProbeCache:
+    version = 1
+    cachefile = '.bfg_probe_cache'
+
+    def __init__(self, entries=None):
+        self._entries = entries or {}
+        # The keys we've looked up this time. When saving, we drop everything
+        # else so that the cache doesn't grow forever as the toolchain changes.
+        self._used = set()
+        self._dirty = False
+
+    @staticmethod
+    def _command_stat(args, env):
+        try:
+            command = shell.which(args[0], env=env, resolve=True)[0]
+            st = os.stat(command)
+        except OSError:
+            return None
+        return [command, st.st_mtime_ns, st.st_ino, st.st_size]
+
+    def key(self, args, env, extra_key=None, **kwargs):
+        stat = self._command_stat(args, env)
+        if stat is None:
+            return None
+        return json.dumps([
+            args, stat, [env.get(i) for i in probe_vars],
+            {k: (v.name if isinstance(v, shell.Mode) else v)
+             for k, v in sorted(kwargs.items())},
+        ] + ([extra_key] if extra_key is not None else []))
+
+    def execute(self, args, *, env, base_dirs=None, extra_key=None,
+                **kwargs):
+        args = shell.convert_args(listify(args), base_dirs)
+        key = self.key(args, env, extra_key, **kwargs)
+        if key is None:
+            return shell.execute(args, env=env, **kwargs)
+
+        self._used.add(key)
+        if key in self._entries:
+            result = self._entries[key]['result']
+            return tuple(result) if isinstance(result, list) else result
+
+        # Don't cache failures: they're often transient (e.g. a tool that
+        # hasn't been installed yet), and we'd never notice once it's fixed.
+        result = shell.execute(args, env=env, **kwargs)
+        self._entries[key] = {'result': result}
+        self._dirty = True
+        return result
+
+    def __len__(self):
+        return len(self._entries)
+
+    def save(self, path):
+        entries = {k: v for k, v in self._entries.items() if k in self._used}
+        if not self._dirty and len(entries) == len(self._entries):
+            return
+        with open(os.path.join(path, self.cachefile), 'w') as out:
+            json.dump({
+                'version': self.version,
+                'data': entries,
+            }, out)
+        self._entries = entries
+        self._dirty = False
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(os.path.join(path, cls.cachefile)) as inp:
+                state = json.load(inp)
+                version, data = state['version'], state['data']
+        except (OSError, ValueError, KeyError):
+            return cls()
+
+        # The probe cache is purely an optimization, so if it's from a newer
+        # version of bfg9000, just start over with an empty cache.
+        if version > cls.version:
+            return cls()
+        # Older caches could hold failed probes too; ignore those.
+        return cls({k: v for k, v in data.items() if 'result' in v})
@@ -0,0 +1,91 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+__all__ = ['disable', 'enable', 'enabled', 'events', 'phase', 'profiling',
+           'save']
+
+_null_phase = nullcontext()
+_events = None
+_start = 0
+
+
+class _Phase:
+    __slots__ = ('name', 'category', 'args', 'start')
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = time.perf_counter_ns()
+        event = {
+            'name': self.name,
+            'cat': self.category,
+            'ph': 'X',
+            'ts': (self.start - _start) / 1000,
+            'dur': (end - self.start) / 1000,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+        }
+        if self.args:
+            event['args'] = self.args
+        # Appending to a list is atomic, so this is safe even when phases are
+        # recorded from several threads (e.g. when prefetching tools).
+        _events.append(event)
+
+
+def enabled():
+    return _events is not None
+
+
+def enable():
+    global _events, _start
+    _events = []
+    _start = time.perf_counter_ns()
+
+
+def disable():
+    global _events
+    _events = None
+
+
+def phase(name, category, **kwargs):
+    # This is called in some fairly hot loops, so when profiling is disabled,
+    # just return a shared, do-nothing context manager.
+    if _events is None:
+        return _null_phase
+    return _Phase(name, category, kwargs)
+
+
+def events():
+    return list(_events or [])
+
+
+def save(filename):
+    # Write the results as a Chrome trace so they can be viewed in e.g.
+    # `chrome://tracing` or Perfetto.
+    with open(filename, 'w') as out:
+        json.dump({'traceEvents': events(), 'displayTimeUnit': 'ms'}, out)
+
+
+@contextmanager
+def profiling(filename, name, category='bfg9000'):
+    if not filename:
+        yield
+        return
+
+    enable()
+    try:
+        with phase(name, category):
+            yield
+    finally:
+        save(filename)
+        disable()
@@ -69,28 +69,49 @@ class literal(literal_types):
 
 
 class jbos(safe_string):  # Just a Bunch of Strings
+    # Internally, a jbos is a view of the first `__size` parts in a list which
+    # may be shared with other jbos objects. Appending to a jbos that's at the
+    # end of its list (the usual case when building up a string piece by piece)
+    # can then extend the list in place instead of copying it, so repeatedly
+    # appending is amortized O(1). We only canonicalize the parts into `bits`
+    # when someone asks for them.
+
     def __init__(self, *args):
-        self.__bits = tuple(self.__canonicalize(args))
+        self.__init_parts(self.__flatten(args, []))
+
+    def __init_parts(self, parts):
+        self.__parts = parts
+        self.__size = len(parts)
+        self.__bits = None
 
     @classmethod
-    def from_iterable(cls, iterable):
+    def __make(cls, parts):
         result = cls.__new__(cls)
-        result.__bits = tuple(cls.__canonicalize(iterable))
-        return result.simplify()
+        result.__init_parts(parts)
+        return result
+
+    @classmethod
+    def from_iterable(cls, iterable):
+        return cls.__make(cls.__flatten(iterable, [])).simplify()
+
+    @staticmethod
+    def __flatten(value, parts):
+        for i in value:
+            if isinstance(i, jbos):
+                parts.extend(i.__view())
+            elif isinstance(i, stringy_types):
+                parts.append(i)
+            else:
+                raise TypeError(type(i))
+        return parts
+
+    def __view(self):
+        parts = self.__parts
+        return parts if len(parts) == self.__size else parts[:self.__size]
 
     @staticmethod
-    def __canonicalize(value):
-        def flatten_bits(value):
-            for i in value:
-                if isinstance(i, jbos):
-                    for j in i.bits:
-                        yield j
-                elif isinstance(i, stringy_types):
-                    yield i
-                else:
-                    raise TypeError(type(i))
-
-        bits = filter(None, flatten_bits(value))
+    def __canonicalize(parts):
+        bits = filter(None, parts)
         try:
             last = next(bits)
         except StopIteration:
@@ -107,8 +128,24 @@ class jbos(safe_string):  # Just a Bunch of Strings
                 last = i
         yield last
 
+    def __add__(self, rhs):
+        rhs = safe_str(rhs)
+        parts = self.__parts
+        # If nothing has been appended to our list after our own parts, we can
+        # extend it in place; otherwise, copy our parts first.
+        if len(parts) != self.__size:
+            parts = parts[:self.__size]
+        return self.__make(self.__flatten((rhs,), parts))
+
+    def __radd__(self, lhs):
+        return self.__make(self.__flatten((safe_str(lhs), self), []))
+
     @property
     def bits(self):
+        if self.__bits is None:
+            self.__bits = tuple(self.__canonicalize(
+                self.__parts[:self.__size]
+            ))
         return self.__bits
 
     def simplify(self):
@@ -137,6 +174,29 @@ def join(iterable, delim):
     return jbos.from_iterable(iterable)
 
 
+def render_key(value):
+    # Get a hashable key for `value` (a safe string or an iterable of them)
+    # without rendering it. Two values with equal keys are always rendered the
+    # same way, though values that render the same way don't necessarily have
+    # equal keys. Raises TypeError if `value` holds anything we can't key.
+    if isinstance(value, str):
+        return value
+    elif isinstance(value, literal_types):
+        return (type(value), value.string)
+    elif isinstance(value, jbos):
+        return (jbos, tuple(render_key(i) for i in value.bits))
+    elif isinstance(value, safe_string):
+        # Other safe strings (e.g. paths) compare equal only when they refer
+        # to the same thing, so we can use them as-is if they're hashable.
+        hash(value)
+        return (type(value), value)
+    elif hasattr(value, '_safe_str'):
+        return render_key(value._safe_str())
+    elif iterutils.isiterable(value):
+        return tuple(render_key(i) for i in value)
+    raise TypeError(type(value))
+
+
 def format_field(value, format_spec):
     t = type(value)
     if hasattr(t, '_safe_format'):
@@ -1,10 +1,13 @@
 import os
 import subprocess
 import textwrap
+import time
+from collections import namedtuple
+from contextlib import contextmanager
 from enum import Enum
 from signal import Signals
 
-from .. import iterutils
+from .. import iterutils, profiler
 from .list import shell_list  # noqa: F401
 from ..iterutils import default_sentinel, isiterable
 from ..path import BasePath, Path, issemiabs
@@ -114,13 +117,58 @@ def convert_args(args, base_dirs=None):
     return [convert(i) for i in args]
 
 
+# Information about a finished subprocess. `returncode` is None if the process
+# couldn't be started, and `output_size` is the number of bytes of output we
+# captured (i.e. excluding anything sent straight to the terminal).
+ExecuteResult = namedtuple('ExecuteResult', ['args', 'returncode', 'duration',
+                                             'output_size'])
+
+_execute_hooks = []
+
+
+@contextmanager
+def execute_hook(fn):
+    _execute_hooks.append(fn)
+    try:
+        yield fn
+    finally:
+        _execute_hooks.remove(fn)
+
+
+def _output_size(proc):
+    if proc is None:
+        return 0
+    return sum(len(i.encode('utf-8')) for i in (proc.stdout, proc.stderr)
+               if i)
+
+
+def _run(args, *, shell, **kwargs):
+    name = args if shell else os.path.basename(args[0])
+    with profiler.phase(name, 'subprocess', command=args):
+        if not _execute_hooks:
+            return subprocess.run(args, shell=shell, **kwargs)
+
+        proc = None
+        start = time.perf_counter()
+        try:
+            proc = subprocess.run(args, shell=shell, **kwargs)
+            return proc
+        finally:
+            result = ExecuteResult(
+                args, proc.returncode if proc else None,
+                time.perf_counter() - start, _output_size(proc)
+            )
+            for hook in _execute_hooks:
+                hook(result)
+
+
 def execute(args, *, shell=False, env=None, base_dirs=None, stdout=Mode.normal,
             stderr=Mode.normal, returncode=0):
     if not shell:
         args = convert_args(args, base_dirs)
 
-    proc = subprocess.run(args, text=True, shell=shell, env=env,
-                          stdout=Mode.conv(stdout), stderr=Mode.conv(stderr))
+    proc = _run(args, text=True, shell=shell, env=env,
+                stdout=Mode.conv(stdout), stderr=Mode.conv(stderr))
     if not (returncode == 'any' or
             (returncode == 'fail' and proc.returncode != 0) or
             proc.returncode in iterutils.listify(returncode)):
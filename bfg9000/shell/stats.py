@@ -0,0 +1,76 @@
+import os
+import threading
+from collections import namedtuple
+
+__all__ = ['ExecuteStats', 'ToolStats']
+
+ToolStats = namedtuple('ToolStats', ['calls', 'failures', 'duration',
+                                     'output_size'])
+
+
+class ExecuteStats:
+    def __init__(self):
+        self.tools = {}
+        # Subprocesses can be run from several threads at once (e.g. when
+        # prefetching tools), so make sure we don't lose any updates.
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _tool_name(args):
+        if isinstance(args, str):
+            args = args.split()
+        return os.path.basename(args[0]) if args else ''
+
+    def add(self, result):
+        name = self._tool_name(result.args)
+        with self._lock:
+            calls, failures, duration, output_size = self.tools.get(
+                name, ToolStats(0, 0, 0, 0)
+            )
+            self.tools[name] = ToolStats(
+                calls + 1, failures + (result.returncode != 0),
+                duration + result.duration, output_size + result.output_size
+            )
+
+    def update(self, other):
+        with self._lock:
+            for name, stats in other.tools.items():
+                mine = self.tools.get(name, ToolStats(0, 0, 0, 0))
+                self.tools[name] = ToolStats(*(i + j for i, j in
+                                               zip(mine, stats)))
+
+    @property
+    def calls(self):
+        return sum(i.calls for i in self.tools.values())
+
+    @property
+    def duration(self):
+        return sum(i.duration for i in self.tools.values())
+
+    def summary(self):
+        lines = ['ran {} subprocess{} in {:.3f}s'.format(
+            self.calls, '' if self.calls == 1 else 'es', self.duration
+        )]
+        tools = sorted(self.tools.items(),
+                       key=lambda i: (-i[1].duration, i[0]))
+        width = max((len(name) for name, _ in tools), default=0)
+        for name, stats in tools:
+            line = '  {name:{width}}  {calls:4} call{s}  {duration:8.3f}s  ' \
+                   '{output:>10} output'.format(
+                       name=name, width=width, calls=stats.calls,
+                       s=' ' if stats.calls == 1 else 's',
+                       duration=stats.duration,
+                       output=_format_size(stats.output_size),
+                   )
+            if stats.failures:
+                line += ' ({} exited non-zero)'.format(stats.failures)
+            lines.append(line)
+        return '\n'.join(lines)
+
+
+def _format_size(size):
+    for unit in ('B', 'KiB', 'MiB'):
+        if size < 1024 or unit == 'MiB':
+            break
+        size /= 1024
+    return ('{} {}' if unit == 'B' else '{:.1f} {}').format(size, unit)
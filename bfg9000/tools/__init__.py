@@ -28,6 +28,10 @@ def builder(*args):
     return wrapper
 
 
+def has_builder(lang):
+    return lang in _builders
+
+
 def get_builder(env, lang):
     try:
         fn, multi = _builders[lang]
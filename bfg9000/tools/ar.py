@@ -16,7 +16,7 @@ class ArLinker(SimpleBuildCommand):
         try:
             output = self.env.execute(
                 self.command + ['--version'], stdout=shell.Mode.pipe,
-                stderr=shell.Mode.devnull
+                stderr=shell.Mode.devnull, probe=True
             )
             if 'GNU ar' in output:
                 return 'gnu', detect_version(output)
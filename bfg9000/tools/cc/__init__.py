@@ -63,7 +63,7 @@ class CcBuilder(Builder):
             output = env.execute(
                 command + ldflags + ['-v', '-Wl,-v', '-Wl,--not-a-real-flag'],
                 stdout=shell.Mode.pipe, stderr=shell.Mode.stdout,
-                returncode='any'
+                returncode='any', probe=True
             )
 
             for line in output.split('\n'):
@@ -114,7 +114,8 @@ class CcBuilder(Builder):
             if env.is_cross:
                 triplet = parse_triplet(env.execute(
                     command + ['-dumpmachine'],
-                    stdout=shell.Mode.pipe, stderr=shell.Mode.devnull
+                    stdout=shell.Mode.pipe, stderr=shell.Mode.devnull,
+                    probe=True
                 ).rstrip())
                 target_flags = cls._gcc_arch_flags(
                     env.target_platform.arch, triplet.arch
@@ -143,7 +144,7 @@ class CcBuilder(Builder):
     @staticmethod
     def check_command(env, command):
         return env.execute(command + ['--version'], stdout=shell.Mode.pipe,
-                           stderr=shell.Mode.devnull)
+                           stderr=shell.Mode.devnull, probe=True)
 
     @property
     def flavor(self):
@@ -32,7 +32,7 @@ class CcBaseCompiler(BuildCommand):
                 (self.command + self._always_flags + self.global_flags +
                  ['-E', '-Wp,-v', '/dev/null']),
                 extra_env=extra_env, stdout=shell.Mode.pipe,
-                stderr=shell.Mode.stdout
+                stderr=shell.Mode.stdout, probe=True
             )
 
             found = False
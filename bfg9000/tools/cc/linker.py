@@ -78,7 +78,7 @@ class CcLinker(BuildCommand):
             # XXX: clang doesn't support -print-sysroot.
             return self.env.execute(
                 self.command + self.global_flags + ['-print-sysroot'],
-                stdout=shell.Mode.pipe, stderr=shell.Mode.devnull
+                stdout=shell.Mode.pipe, stderr=shell.Mode.devnull, probe=True
             ).rstrip()
         except (OSError, shell.CalledProcessError):
             if strict:
@@ -90,7 +90,7 @@ class CcLinker(BuildCommand):
         try:
             output = self.env.execute(
                 self.command + self.global_flags + ['-print-search-dirs'],
-                stdout=shell.Mode.pipe, stderr=shell.Mode.devnull
+                stdout=shell.Mode.pipe, stderr=shell.Mode.devnull, probe=True
             )
             m = re.search(r'^libraries: =(.*)', output, re.MULTILINE)
             search_dirs = shell.split_paths(m.group(1), fn=abspath)
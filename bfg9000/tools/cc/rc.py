@@ -29,7 +29,7 @@ class CcRcBuilder(Builder):
     @staticmethod
     def check_command(env, command):
         return env.execute(command + ['--version'], stdout=shell.Mode.pipe,
-                           stderr=shell.Mode.devnull)
+                           stderr=shell.Mode.devnull, probe=True)
 
     @property
     def flavor(self):
@@ -92,7 +92,7 @@ class Command:
 
     def run(self, *args, **kwargs):
         run_kwargs = slice_dict(kwargs, ('env', 'extra_env', 'stdout',
-                                         'stderr'))
+                                         'stderr', 'probe'))
         run_kwargs.setdefault('stdout', shell.Mode.pipe)
         if run_kwargs['stdout'] == shell.Mode.normal:
             run_kwargs.setdefault('stderr', shell.Mode.normal)
@@ -36,7 +36,7 @@ class LdLinker:
         for args in (['--version'], ['-v']):
             try:
                 return env.execute(command + args, stdout=shell.Mode.pipe,
-                                   stderr=shell.Mode.stdout)
+                                   stderr=shell.Mode.stdout, probe=True)
             except shell.CalledProcessError:
                 pass
         return None
@@ -57,7 +57,7 @@ class LdLinker:
         try:
             output = self.env.execute(
                 self.command + ['--verbose'], stdout=shell.Mode.pipe,
-                stderr=shell.Mode.devnull
+                stderr=shell.Mode.devnull, probe=True
             )
             search_dirs = [i.group(1) for i in re.finditer(
                 r'SEARCH_DIR\("((?:[^"\\]|\\.)*)"\)', output)
@@ -1,4 +1,7 @@
 import argparse
+import hashlib
+import json
+import os
 import re
 import subprocess
 
@@ -11,6 +14,7 @@ from ..iterutils import iterate, listify
 from ..objutils import memoize_method
 from ..packages import Package, PackageKind
 from ..path import Path, Root
+from ..pcfile import PcFileError, PcNotFoundError, PcResolver
 from ..shell import posix as pshell, which
 from ..versioning import check_version, SpecifierSet, Version
 
@@ -90,16 +94,142 @@ class PkgConfig(Command):
             result.append('--msvc-syntax')
         return result
 
-    def run(self, names, type, *args, extra_env=None, installed=None,
-            **kwargs):
+    def _pkg_config_var(self, name):
+        try:
+            return shell.split_paths(self.env.execute(
+                self.command + ['--variable=' + name, 'pkg-config'],
+                stdout=shell.Mode.pipe, stderr=shell.Mode.devnull, probe=True
+            ).strip())
+        except (OSError, shell.CalledProcessError):
+            return None
+
+    @memoize_method
+    def _default_search_dirs(self):
+        if libdir := self.env.getvar('PKG_CONFIG_LIBDIR'):
+            return shell.split_paths(libdir)
+        return self._pkg_config_var('pc_path')
+
+    @memoize_method
+    def _search_stamp(self, search_path):
+        # Get a digest of the state of every .pc file that pkg-config could
+        # look at with this search path. If anything changes (including adding
+        # or removing files), any cached results will be invalidated.
+        default_dirs = self._default_search_dirs()
+        if default_dirs is None:
+            return None
+
+        stamp = []
+        for i in shell.split_paths(search_path) + default_dirs:
+            try:
+                with os.scandir(i) as it:
+                    stamp.append([i, sorted(
+                        (j.name, j.stat().st_mtime_ns, j.stat().st_size)
+                        for j in it if j.name.endswith('.pc')
+                    )])
+            except OSError:
+                stamp.append([i, None])
+        return hashlib.sha1(json.dumps(stamp).encode('utf-8')).hexdigest()
+
+    @memoize_method
+    def _resolver(self, search_path, disable_uninstalled, allow_system_cflags,
+                  allow_system_libs):
+        default_dirs = self._default_search_dirs()
+        if default_dirs is None:
+            return None
+
+        # Only pkgconf reports its system directories. The resolver mimics
+        # pkgconf, so if we can't get these, we're probably using a different
+        # pkg-config implementation and should just run it.
+        include_dirs = self._pkg_config_var('pc_system_includedirs')
+        lib_dirs = self._pkg_config_var('pc_system_libdirs')
+        if not include_dirs or not lib_dirs:
+            return None
+
+        getvar = self.env.getvar
+        if var := getvar('PKG_CONFIG_SYSTEM_INCLUDE_PATH'):
+            include_dirs = shell.split_paths(var)
+        if var := getvar('PKG_CONFIG_SYSTEM_LIBRARY_PATH'):
+            lib_dirs = shell.split_paths(var)
+
+        return PcResolver(
+            shell.split_paths(search_path) + default_dirs,
+            system_include_dirs=include_dirs, system_lib_dirs=lib_dirs,
+            allow_system_cflags=allow_system_cflags,
+            allow_system_libs=allow_system_libs,
+            disable_uninstalled=disable_uninstalled
+        )
+
+    def _native_run(self, names, type, static, env):
+        # The reference pkg-config implementation redefines `prefix` on
+        # Windows, and adjusts paths when using a sysroot. Leave those cases to
+        # the real pkg-config.
+        if ( self.env.host_platform.family == 'windows' or
+             env.get('PKG_CONFIG_SYSROOT_DIR') ):
+            return None
+
+        resolver = self._resolver(
+            env.get('PKG_CONFIG_PATH', ''),
+            bool(env.get('PKG_CONFIG_DISABLE_UNINSTALLED')),
+            bool(env.get('PKG_CONFIG_ALLOW_SYSTEM_CFLAGS')),
+            bool(env.get('PKG_CONFIG_ALLOW_SYSTEM_LIBS')),
+        )
+        if resolver is None:
+            return None
+
+        names = listify(names)
+        flag = self._options[type][0][0]
+        try:
+            if flag == '--modversion':
+                return resolver.modversion(names)
+            elif flag.startswith('--variable='):
+                return resolver.variable(names, flag[len('--variable='):])
+            elif flag == '--print-requires':
+                return '\n'.join(resolver.requires(names))
+            elif flag.startswith('--cflags-only-'):
+                flags = resolver.cflags(names, flag[len('--cflags-only-'):],
+                                        static)
+            else:
+                flags = resolver.libs(names, flag[len('--libs-only-'):],
+                                      static)
+            return opts.option_list(flags)
+        except PcNotFoundError as e:
+            raise shell.ExecutionError(
+                1, self.command + names + self._options[type][0], '',
+                'Package {} was not found in the pkg-config search path'
+                .format(e)
+            )
+        except PcFileError:
+            return None
+
+    def run(self, names, type, static=False, msvc_syntax=False, options=[], *,
+            extra_env=None, installed=None, **kwargs):
         if installed is True:
             extra_env = dict(PKG_CONFIG_DISABLE_UNINSTALLED='1',
                              **(extra_env or {}))
         elif installed is False:
             names = [i + '-uninstalled' for i in iterate(names)]
 
-        result = super().run(names, type, *args, extra_env=extra_env,
-                             **kwargs).strip()
+        # Try to read the .pc files ourselves to avoid running pkg-config. If
+        # we can't, fall back to the real thing.
+        if not msvc_syntax and not options and 'env' not in kwargs:
+            env = dict(self.env.variables, **(extra_env or {}))
+            result = self._native_run(names, type, static, env)
+            if result is not None:
+                if isinstance(result, str) and self._options[type][1]:
+                    return self._options[type][1](result)
+                return result
+
+        # pkg-config's results only depend on the .pc files it finds, so if
+        # we're caching probe results, we can reuse them as long as those files
+        # are unchanged.
+        if self.env.probe_cache is not None:
+            search_path = (extra_env or {}).get(
+                'PKG_CONFIG_PATH', self.env.getvar('PKG_CONFIG_PATH', '')
+            )
+            kwargs['probe'] = self._search_stamp(search_path) or False
+
+        result = super().run(names, type, static, msvc_syntax, options,
+                             extra_env=extra_env, **kwargs).strip()
         if self._options[type][1]:
             return self._options[type][1](result)
         return result
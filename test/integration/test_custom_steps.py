@@ -22,6 +22,7 @@ class TestCustomSteps(IntegrationTest):
         if self.backend == 'make':
             self.clean()
             self.assertDirectory('.', {
-                '.bfg_environ', 'compile_commands.json', 'Makefile',
+                '.bfg_environ', '.bfg_find_cache', '.bfg_probe_cache',
+                'compile_commands.json', 'Makefile',
                 os.path.join('goodbye.int', '.dir'),
             })
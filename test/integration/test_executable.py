@@ -26,10 +26,12 @@ class TestExecutable(IntegrationTest):
         self.assertOutput([executable('simple')], 'hello, world!\n')
 
         self.clean()
-        common = {'.bfg_environ', 'compile_commands.json'}
+        common = {'.bfg_environ', '.bfg_probe_cache', 'compile_commands.json'}
         files = {
-            'ninja': [common | {'.ninja_deps', '.ninja_log', 'build.ninja'}],
-            'make': [common | {'Makefile', pjoin('simple.int', '.dir')}],
+            'ninja': [common | {'.bfg_find_cache', '.ninja_deps', '.ninja_log',
+                                'build.ninja'}],
+            'make': [common | {'.bfg_find_cache', 'Makefile',
+                               pjoin('simple.int', '.dir')}],
             'msbuild': [common | {
                 '.bfg_uuid', 'simple.sln', pjoin('simple', 'simple.vcxproj'),
                 target_path('simple.Build.CppClean.log', prefix='simple'),
@@ -44,11 +44,26 @@ class TestRegenerateGlob(IntegrationTest):
     def test_modify_build_bfg(self):
         self.wait()
         with open(pjoin(self.srcdir, 'build.bfg'), 'a') as out:
-            out.write('# hello\n')
+            out.write("hello = 'hello'\n")
 
         self.assertRegex(self.build(executable('hello')), regen_ex)
         self.assertOutput([executable('hello')], 'Hello, world!\n')
 
+    def test_modify_build_bfg_comment(self):
+        self.wait()
+        with open(pjoin(self.srcdir, 'build.bfg'), 'a') as out:
+            out.write('# hello\n')
+
+        self.assertNotRegex(self.build(executable('hello')), regen_ex)
+        self.assertOutput([executable('hello')], 'Hello, world!\n')
+
+    def test_touch_build_bfg(self):
+        self.wait()
+        os.utime(pjoin(self.srcdir, 'build.bfg'))
+
+        self.assertNotRegex(self.build(executable('hello')), regen_ex)
+        self.assertOutput([executable('hello')], 'Hello, world!\n')
+
     def test_add_file(self):
         self.wait()
         self.copyfile(pjoin('src', 'hello', 'bonjour.hpp'))
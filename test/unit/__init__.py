@@ -1,6 +1,7 @@
 import ntpath
 import os.path
 import posixpath
+from contextlib import nullcontext
 from itertools import zip_longest
 
 from .. import *
@@ -39,6 +40,30 @@ def mock_bad_which(*args, **kwargs):
     raise FileNotFoundError()
 
 
+class MockDirEntry:
+    def __init__(self, name, is_dir=False, is_symlink=False):
+        self.name = name
+        self._is_dir = is_dir
+        self._is_symlink = is_symlink
+
+    def is_dir(self):
+        return self._is_dir
+
+    def is_symlink(self):
+        return self._is_symlink
+
+
+def mock_scandir(listdir, isdir, islink=lambda path: False):
+    def scandir(path):
+        return nullcontext([
+            MockDirEntry(i, isdir(os.path.join(path, i)),
+                         islink(os.path.join(path, i)))
+            for i in listdir(path)
+        ])
+
+    return scandir
+
+
 class AttrDict:
     def __init__(self, **kwargs):
         for k, v in kwargs.items():
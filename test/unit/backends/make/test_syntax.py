@@ -1,4 +1,5 @@
 from io import StringIO
+from unittest import mock
 
 from ... import *
 
@@ -209,6 +210,18 @@ class TestWritePath(PathTestCase):
         self.assertEqual(self.out.stream.getvalue(),
                          self.ospath.join('$(srcdir)', 'foo'))
 
+    def test_reuse(self):
+        p = self.Path('foo', path.Root.srcdir)
+        with mock.patch.object(self.Path, 'realize', autospec=True,
+                               side_effect=self.Path.realize) as m:
+            self.out.write_each([p, p], Syntax.shell)
+            self.out.write_literal(' ')
+            self.out.write(p, Syntax.target)
+        self.assertEqual(m.call_count, 2)
+        p_str = self.ospath.join('$(srcdir)', 'foo')
+        self.assertEqual(self.out.stream.getvalue(),
+                         quoted(p_str) + ' ' + quoted(p_str) + ' ' + p_str)
+
 
 class TestWriteSyntaxString(PathTestCase):
     def make_writer(self):
@@ -649,6 +662,44 @@ class TestMakefile(TestCase):
         self.makefile._write_variable(out, var, ['command'])
         self.assertEqual(out.stream.getvalue(), 'CMD := command\n')
 
+    def test_shared_variable(self):
+        value = ['-I', path.Path('include'), '-DFOO']
+        shared = self.makefile.shared_variable
+        self.assertEqual(shared('CFLAGS', value), value)
+        self.assertEqual(shared('CFLAGS', value), Variable('CFLAGS_1'))
+        self.assertEqual(shared('CFLAGS', value), Variable('CFLAGS_1'))
+        self.assertEqual(shared('CFLAGS', ['-DFOO']), ['-DFOO'])
+
+        self.makefile.variable('CFLAGS_2', 'value')
+        self.assertEqual(shared('CFLAGS', ['-DFOO']), Variable('CFLAGS_3'))
+        self.assertEqual(shared('OTHER', value), value)
+
+        self.assertEqual(self.makefile._global_variables[Section.flags], [
+            (Variable('CFLAGS_1'), value),
+            (Variable('CFLAGS_3'), ['-DFOO']),
+        ])
+
+    def test_shared_variable_key(self):
+        shared = self.makefile.shared_variable
+        value = [var('CFLAGS'), safe_str.jbos('-I', path.Path('include'))]
+        with mock.patch.object(self.makefile, '_shell_str') as m:
+            self.assertEqual(shared('CFLAGS', value), value)
+            self.assertEqual(shared('CFLAGS', [
+                var('CFLAGS'), safe_str.jbos('-I', path.Path('include'))
+            ]), Variable('CFLAGS_1'))
+            m.assert_not_called()
+
+        # Quoting changes how a variable is rendered, so it should change the
+        # key too.
+        qvalue = [qvar('CFLAGS'), safe_str.jbos('-I', path.Path('include'))]
+        self.assertEqual(shared('CFLAGS', qvalue), qvalue)
+
+        # Values we can't key without rendering are compared by their text.
+        fvalue = [Function('foo', 'bar')]
+        self.assertEqual(shared('CFLAGS', fvalue), fvalue)
+        self.assertEqual(shared('CFLAGS', [Function('foo', 'bar')]),
+                         Variable('CFLAGS_2'))
+
     def test_rule(self):
         self.makefile.rule('target', variables={'name': 'value'},
                            recipe=['cmd'])
@@ -716,3 +767,22 @@ class TestMakefile(TestCase):
             'include inc1\n'
             '-include inc2\n'
         )
+
+    def test_write_stream(self):
+        def fill(makefile):
+            makefile.variable('var', 'foo')
+            makefile.rule('target', deps=['dep'], recipe=['cmd'],
+                          variables={'tvar': 'bar'})
+            makefile.rule(['phony'], deps=['target'], phony=True)
+            makefile.include('inc1')
+
+            out = StringIO()
+            makefile.write(out)
+            return out.getvalue()
+
+        streamed = Makefile('build.bfg', stream=True)
+        self.assertEqual(fill(streamed), fill(self.makefile))
+        self.assertTrue(streamed._rule_stream.stream.closed)
+        self.assertEqual(streamed._rules, [])
+        self.assertTrue(streamed.has_rule('target'))
+        self.assertRaises(ValueError, streamed.rule, 'target')
@@ -1,4 +1,5 @@
 from io import StringIO
+from unittest import mock
 
 from ... import *
 
@@ -135,6 +136,18 @@ class TestWritePath(PathTestCase):
         self.assertEqual(self.out.stream.getvalue(),
                          self.ospath.join('${srcdir}', 'foo'))
 
+    def test_reuse(self):
+        p = self.Path('foo', path.Root.srcdir)
+        with mock.patch.object(self.Path, 'realize', autospec=True,
+                               side_effect=self.Path.realize) as m:
+            self.out.write_each([p, p], Syntax.shell)
+            self.out.write_literal(' ')
+            self.out.write(p, Syntax.output)
+        self.assertEqual(m.call_count, 2)
+        p_str = self.ospath.join('${srcdir}', 'foo')
+        self.assertEqual(self.out.stream.getvalue(),
+                         quoted(p_str) + ' ' + quoted(p_str) + ' ' + p_str)
+
 
 class TestWriteInvalid(TestCase):
     def setUp(self):
@@ -249,6 +262,38 @@ class TestNinjaFile(TestCase):
         self.ninjafile._write_variable(out, var, ['command'])
         self.assertEqual(out.stream.getvalue(), 'cmd = command\n')
 
+    def test_shared_variable(self):
+        value = ['-I', path.Path('include'), '-DFOO']
+        shared = self.ninjafile.shared_variable
+        self.assertEqual(shared('cflags', value), value)
+        self.assertEqual(shared('cflags', value), Variable('cflags_1'))
+        self.assertEqual(shared('cflags', value), Variable('cflags_1'))
+        self.assertEqual(shared('cflags', ['-DFOO']), ['-DFOO'])
+
+        self.ninjafile.variable('cflags_2', 'value')
+        self.assertEqual(shared('cflags', ['-DFOO']), Variable('cflags_3'))
+        self.assertEqual(shared('OTHER', value), value)
+
+        self.assertEqual(self.ninjafile._variables[Section.flags], [
+            (Variable('cflags_1'), value),
+            (Variable('cflags_3'), ['-DFOO']),
+        ])
+
+    def test_shared_variable_key(self):
+        shared = self.ninjafile.shared_variable
+        value = [var('cflags'), safe_str.jbos('-I', path.Path('include'))]
+        with mock.patch.object(self.ninjafile, '_shell_str') as m:
+            self.assertEqual(shared('cflags', value), value)
+            self.assertEqual(shared('cflags', [
+                var('cflags'), safe_str.jbos('-I', path.Path('include'))
+            ]), Variable('cflags_1'))
+            m.assert_not_called()
+
+        lvalue = [var('cflags'), safe_str.jbos(
+            '-I', safe_str.literal('include')
+        )]
+        self.assertEqual(shared('cflags', lvalue), lvalue)
+
     def test_rule(self):
         self.ninjafile.rule('my_rule', ['cmd'])
         out = self.ninjafile.writer(StringIO())
@@ -347,3 +392,23 @@ class TestNinjaFile(TestCase):
             'build output: my_rule\n\n'
             'default output\n'
         )
+
+    def test_write_stream(self):
+        def fill(ninjafile):
+            ninjafile.variable('var', 'foo')
+            ninjafile.rule('my_rule', ['cmd'])
+            ninjafile.build('output', 'my_rule', inputs='input',
+                            variables={'var': 'value'})
+            ninjafile.build(['output2', 'output 3'], 'my_rule')
+            ninjafile.default('output')
+
+            out = StringIO()
+            ninjafile.write(out)
+            return out.getvalue()
+
+        streamed = NinjaFile('build.bfg', stream=True)
+        self.assertEqual(fill(streamed), fill(self.ninjafile))
+        self.assertTrue(streamed._build_stream.stream.closed)
+        self.assertEqual(streamed._builds, [])
+        self.assertTrue(streamed.has_build('output$ 3'))
+        self.assertRaises(ValueError, streamed.build, 'output', 'my_rule')
@@ -655,6 +655,42 @@ class TestMakeBackend(BuiltinTestCase):
             makefile.rule.assert_called_once_with(result, [src, dep], [],
                                                   mock.ANY, mock.ANY, None)
 
+    def test_depfile(self):
+        makefile = make.Makefile(None)
+        src = self.context['source_file']('dir/main.cpp')
+        result = self.context['object_file'](file=src)
+
+        with mock.patch('logging.log'):
+            compile.make_compile(result.creator, self.build, makefile,
+                                 self.env)
+            compile.make_depfile_db_rules(self.build, makefile, self.env)
+        self.assertEqual(makefile._includes, [
+            make.Include(Path('dir/main.o.d'), True),
+        ])
+        self.assertFalse(makefile.has_rule('dir/.deps'))
+
+    def test_merge_depfiles(self):
+        self.env.merge_depfiles = True
+        makefile = make.Makefile(None)
+        srcs = [self.context['source_file'](i)
+                for i in ('dir/main.cpp', 'dir/foo.cpp')]
+        results = [self.context['object_file'](file=i) for i in srcs]
+
+        with mock.patch('logging.log'):
+            for i in results:
+                compile.make_compile(i.creator, self.build, makefile,
+                                     self.env)
+            compile.make_depfile_db_rules(self.build, makefile, self.env)
+        self.assertEqual(makefile._includes, [
+            make.Include(Path('dir/.deps'), True),
+        ])
+        self.assertTrue(makefile.has_rule('dir/.deps'))
+        self.assertEqual(self.build['make_depfiles'], {
+            Path('dir/.deps'): [Path('dir/main.o.d'), Path('dir/foo.o.d')],
+        })
+        self.assertIn(Path('dir/.deps'),
+                      [i.path for i in self.build.targets()])
+
     def test_local_options(self):
         env = make_env('winnt', clear_variables=True,
                        variables={'CXX': 'nonexist'})
@@ -2,14 +2,14 @@ import os
 from contextlib import contextmanager, ExitStack
 from unittest import mock
 
-from .. import TestCase
+from .. import mock_scandir, TestCase
 from .common import BuiltinTestCase
 
 from bfg9000.builtins import find, project, regenerate, version  # noqa: F401
 from bfg9000.exceptions import SerializationError
 from bfg9000.file_types import Directory, File, HeaderDirectory, SourceFile
 from bfg9000.iterutils import uniques
-from bfg9000.path import Path, Root
+from bfg9000.path import DirectorySnapshot, Path, PathTable, Root
 from bfg9000.platforms import known_platforms
 
 path_vars = {
@@ -42,14 +42,13 @@ def mock_filesystem():
         paths = mock_listdir(path.parent().suffix)
         return path.basename() in paths
 
-    def mock_isdir(path, variables=None):
-        return not path.basename().startswith('file')
+    def mock_isdir(path):
+        return not os.path.basename(path).startswith('file')
 
-    with mock.patch('os.listdir', mock_listdir) as a, \
-         mock.patch('bfg9000.path.exists', mock_exists) as b, \
-         mock.patch('bfg9000.path.isdir', mock_isdir) as c, \
-         mock.patch('bfg9000.path.islink', return_value=False) as d:
-        yield a, b, c, d
+    scandir = mock_scandir(mock_listdir, mock_isdir)
+    with mock.patch('os.scandir', side_effect=scandir) as a, \
+         mock.patch('bfg9000.path.exists', mock_exists) as b:
+        yield a, b
 
 
 class TestFindCache(BuiltinTestCase):
@@ -92,27 +91,35 @@ class TestFindCache(BuiltinTestCase):
         self.assertEqual(len(self.cache), 1)
 
     def test_to_json(self):
-        self.assertEqual(self.cache.to_json(), [])
+        self.assertEqual(self.cache.to_json(PathTable()), [])
         self.cache.add(find.FileFilter('*'), [Path('found')], [Path('extra')])
-        self.assertEqual(self.cache.to_json(), [
+        paths = PathTable()
+        self.assertEqual(self.cache.to_json(paths), [
             [{'include': [{'pattern': ['*', 'srcdir', False], 'type': 'f'}],
               'extra': [], 'exclude': [], 'filter_fn': None},
-             [['found', 'builddir', False]],
-             [['extra', 'builddir', False]]],
+             [1], [2]],
+        ])
+        self.assertEqual(paths.to_json(), [
+            [None, 'builddir', False], [0, 'found', False],
+            [0, 'extra', False],
         ])
 
     def test_from_json(self):
-        self.assertEqual(find.FindCache.from_json([], self.context),
+        self.assertEqual(find.FindCache.from_json([], self.context,
+                                                  PathTable()),
                          find.FindCache())
 
         cache = find.FindCache()
         cache.add(find.FileFilter('*'), [Path('found')], [Path('extra')])
+        paths = PathTable.from_json([
+            [None, 'builddir', False], [0, 'found', False],
+            [0, 'extra', False],
+        ])
         self.assertEqual(find.FindCache.from_json([
             [{'include': [{'pattern': ['*', 'srcdir', False], 'type': 'f'}],
               'extra': [], 'exclude': [], 'filter_fn': None},
-             [['found', 'builddir', False]],
-             [['extra', 'builddir', False]]]
-        ], self.context), cache)
+             [1], [2]]
+        ], self.context, paths), cache)
 
 
 class TestFindResult(TestCase):
@@ -262,6 +269,31 @@ class TestFileFilter(BuiltinTestCase):
         self.assertEqual(f.match(srcpath('foo.hpp')),
                          find.FindResult.exclude_recursive)
 
+    def test_match_subtree(self):
+        R = find.FindResult
+        f = find.FileFilter('dir/*/*.cpp')
+        self.assertEqual(f.match_subtree(srcpath('dir/')), (R.exclude, True))
+        self.assertEqual(f.match_subtree(srcpath('dir/sub/')),
+                         (R.exclude, True))
+        self.assertEqual(f.match_subtree(srcpath('dir/sub/foo.cpp')),
+                         (R.include, False))
+        self.assertEqual(f.match_subtree(srcpath('dir/sub/foo.cpp/')),
+                         (R.exclude, False))
+        self.assertEqual(f.match_subtree(srcpath('dir/sub/sub2/')),
+                         (R.exclude_recursive, False))
+
+        f = find.FileFilter('dir/*/')
+        self.assertEqual(f.match_subtree(srcpath('dir/sub/')),
+                         (R.include, False))
+
+        f = find.FileFilter('dir/*/', extra='*.txt')
+        self.assertEqual(f.match_subtree(srcpath('dir/sub/')),
+                         (R.include, True))
+
+        f = find.FileFilter('**/*.cpp')
+        self.assertEqual(f.match_subtree(srcpath('dir/sub/foo.cpp/')),
+                         (R.exclude, True))
+
     def test_bases(self):
         self.assertEqual(find.FileFilter('*').bases(), [Path('', Root.srcdir)])
         self.assertEqual(
@@ -368,15 +400,18 @@ class TestFindCacheFile(BuiltinTestCase):
             find.FindCacheFile(regenerate.RegenerateFiles([], []),
                                cache).save('path')
             mock_dump.assert_called_once_with({
-                'version': 1,
+                'version': 3,
                 'data': {
-                    'regen_files': {'inputs': [], 'outputs': []},
+                    'regen_files': {'inputs': [], 'outputs': [],
+                                    'digests': [], 'environment': None},
                     'cache': [
                         [{'include': [{'pattern': ['*', 'srcdir', False],
                                        'type': 'f'}],
                           'extra': [], 'exclude': [], 'filter_fn': None},
                          [], []]
-                    ]
+                    ],
+                    'snapshot': [],
+                    'paths': [],
                 }
             }, mock.ANY)
             mock_remove.assert_not_called()
@@ -387,8 +422,17 @@ class TestFindCacheFile(BuiltinTestCase):
              mock.patch('os.remove') as mock_remove:
             find.FindCacheFile(regenerate.RegenerateFiles([], []),
                                find.FindCache()).save('path')
-            mock_dump.assert_not_called()
-            mock_remove.assert_called_once()
+            mock_dump.assert_called_once_with({
+                'version': 3,
+                'data': {
+                    'regen_files': {'inputs': [], 'outputs': [],
+                                    'digests': [], 'environment': None},
+                    'cache': [],
+                    'snapshot': [],
+                    'paths': [],
+                }
+            }, mock.ANY)
+            mock_remove.assert_not_called()
 
     def test_save_unserializable(self):
         with mock.patch('builtins.open'), \
@@ -401,18 +445,72 @@ class TestFindCacheFile(BuiltinTestCase):
             mock_dump.assert_not_called()
             mock_remove.assert_called_once()
 
+    def test_save_snapshot(self):
+        table = [[None, 'srcdir', False], [0, 'dir', True], [1, 'sub', True],
+                 [1, 'file', False]]
+        snapshot = DirectorySnapshot.from_json(
+            [[1, 1000, [2], [3], []]], PathTable.from_json(table)
+        )
+        d = Path('dir/', Root.srcdir)
+        snapshot._mtimes[d], snapshot._listings[d] = snapshot._saved[d]
+
+        with mock.patch('builtins.open'), \
+             mock.patch('json.dump') as mock_dump:
+            find.FindCacheFile(regenerate.RegenerateFiles([], []),
+                               find.FindCache(), snapshot).save('path')
+            data = mock_dump.call_args[0][0]['data']
+            self.assertEqual(data['snapshot'], [[1, 1000, [2], [3], []]])
+            self.assertEqual(data['paths'], table)
+
     def test_load(self):
         with mock.patch('builtins.open', mock.mock_open(read_data="""\
-            {"version": 1, "data": {
+            {"version": 3, "data": {
                 "regen_files": {"inputs": [], "outputs": []},
-                "cache": []
+                "cache": [[{"include": [{"pattern": ["*", "srcdir", false],
+                                         "type": "f"}],
+                            "extra": [], "exclude": [], "filter_fn": null},
+                           [3], []]],
+                "snapshot": [[1, 1000, [2], [3], []]],
+                "paths": [[null, "srcdir", false], [0, "dir", true],
+                          [1, "sub", true], [1, "file", false]]
             }}
         """)):
-            self.assertEqual(
-                find.FindCacheFile.load('path', self.context),
-                find.FindCacheFile(regenerate.RegenerateFiles([], []),
-                                   find.FindCache())
+            regen_files, cache, snapshot = find.FindCacheFile.load(
+                'path', self.context
             )
+            self.assertEqual(regen_files, regenerate.RegenerateFiles([], []))
+            expected = find.FindCache()
+            expected.add(find.FileFilter('*'),
+                         [Path('dir/file', Root.srcdir)], [])
+            self.assertEqual(cache, expected)
+            self.assertEqual(snapshot._saved, {
+                Path('dir/', Root.srcdir): (1000, (
+                    [Path('dir/sub/', Root.srcdir)],
+                    [Path('dir/file', Root.srcdir)], set()
+                )),
+            })
+
+    def test_load_v2(self):
+        with mock.patch('builtins.open', mock.mock_open(read_data="""\
+            {"version": 2, "data": {
+                "regen_files": {"inputs": [], "outputs": []},
+                "cache": [[{"include": [{"pattern": ["*", "srcdir", false],
+                                         "type": "f"}],
+                            "extra": [], "exclude": [], "filter_fn": null},
+                           [["dir/file", "srcdir", false]], []]],
+                "snapshot": [[["dir/", "srcdir", false], 1000, ["sub"],
+                              ["file"], []]]
+            }}
+        """)):
+            regen_files, cache, snapshot = find.FindCacheFile.load(
+                'path', self.context
+            )
+            self.assertEqual(regen_files, regenerate.RegenerateFiles([], []))
+            expected = find.FindCache()
+            expected.add(find.FileFilter('*'),
+                         [Path('dir/file', Root.srcdir)], [])
+            self.assertEqual(cache, expected)
+            self.assertEqual(snapshot._saved, {})
 
     def test_load_bad_version(self):
         with mock.patch('builtins.open', mock.mock_open(read_data="""\
@@ -871,6 +969,30 @@ class TestFindFiles(FindTestCase):
         self.assertCached(dict())
         self.assertSeenDirs(set())
 
+    def test_prune(self):
+        # `dir/sub/` can't contain anything matching our pattern, so we
+        # shouldn't look inside it.
+        expected = [Directory(srcpath('dir/sub/'))]
+        self.assertFound(self.find('dir/*/'), expected)
+        self.assertSeenDirs({srcpath('dir/')})
+
+    def test_find_jobs(self):
+        self.env.find_jobs = 4
+        expected = [SourceFile(srcpath('file.cpp'), 'c++'),
+                    File(srcpath('dir/file2.txt'))]
+        self.assertFound(self.find('**'), expected)
+        self.assertSeenDirs({srcpath(''), srcpath('dir/'),
+                             srcpath('dir/sub/'), srcpath('dir2/')})
+
+    def test_shared_traversal(self):
+        scandir = self._ctx[0]
+        self.find('**/*.cpp')
+        calls = scandir.call_count
+        self.assertFound(self.find('dir/**/*.txt'),
+                         [File(srcpath('dir/file2.txt'))],
+                         pre=[SourceFile(srcpath('file.cpp'), 'c++')])
+        self.assertEqual(scandir.call_count, calls)
+
 
 class TestFindPaths(TestFindFiles):
     def setUp(self):
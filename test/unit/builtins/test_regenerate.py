@@ -0,0 +1,104 @@
+from unittest import mock
+
+from .common import BuiltinTestCase
+
+from bfg9000.builtins import regenerate
+from bfg9000.path import Path, Root
+
+
+def mock_open(source):
+    return mock.patch('builtins.open', mock.mock_open(read_data=source))
+
+
+class TestInputDigest(BuiltinTestCase):
+    def digest(self, source, kind='script'):
+        with mock_open(source):
+            return regenerate.input_digest(Path('build.bfg', Root.srcdir),
+                                           self.env, kind)
+
+    def test_same(self):
+        self.assertEqual(self.digest(b"project('foo')\n"),
+                         self.digest(b"project('foo')\n"))
+
+    def test_cosmetic_change(self):
+        self.assertEqual(
+            self.digest(b"project('foo')\n"),
+            self.digest(b"# comment\nproject(\n    'foo',\n)  # comment\n")
+        )
+        self.assertNotEqual(
+            self.digest(b"project('foo')\n", 'file'),
+            self.digest(b"project('foo')  # comment\n", 'file')
+        )
+
+    def test_change(self):
+        self.assertNotEqual(self.digest(b"project('foo')\n"),
+                            self.digest(b"project('bar')\n"))
+
+    def test_invalid(self):
+        self.assertEqual(self.digest(b'project(\n'), None)
+        self.assertNotEqual(self.digest(b'project(\n', 'file'), None)
+        with mock.patch('builtins.open', side_effect=FileNotFoundError()):
+            self.assertEqual(regenerate.input_digest(
+                Path('build.bfg', Root.srcdir), self.env
+            ), None)
+
+
+class TestRegenerateFiles(BuiltinTestCase):
+    def setUp(self):
+        super().setUp()
+        self.env.backend = 'make'
+
+    def make(self, source=b"project('foo')\n"):
+        with mock_open(source):
+            return regenerate.RegenerateFiles.make(self.build, self.env)
+
+    def changed(self, files, source=b"project('foo')\n"):
+        with mock_open(source):
+            return files.changed(self.env)
+
+    def test_make(self):
+        self.build.add_bootstrap(Path('options.bfg', Root.srcdir))
+        files = self.make()
+        self.assertEqual(files.inputs, [Path('build.bfg', Root.srcdir),
+                                        Path('options.bfg', Root.srcdir)])
+        self.assertEqual(len(files.digests), 2)
+        self.assertEqual(files.digests[0][0], 'script')
+        self.assertEqual(files.digests[0], files.digests[1])
+        self.assertEqual(files.environment, self.env.digest())
+
+    def test_changed(self):
+        files = self.make()
+        self.assertFalse(self.changed(files))
+        self.assertFalse(self.changed(files, b"project('foo')  # comment\n"))
+        self.assertTrue(self.changed(files, b"project('bar')\n"))
+
+    def test_changed_environment(self):
+        files = self.make()
+        self.env.extra_args = ['--foo']
+        self.assertTrue(self.changed(files))
+
+    def test_changed_mtime(self):
+        files = regenerate.RegenerateFiles(
+            [Path('build.bfg', Root.srcdir)], [Path('Makefile')]
+        )
+        with mock.patch('bfg9000.builtins.regenerate.getmtime_ns',
+                        side_effect=[2, 1]):
+            self.assertFalse(files.changed(self.env))
+        with mock.patch('bfg9000.builtins.regenerate.getmtime_ns',
+                        side_effect=[1, 2]):
+            self.assertTrue(files.changed(self.env))
+
+    def test_json(self):
+        files = regenerate.RegenerateFiles(
+            [Path('build.bfg', Root.srcdir)], [Path('build.ninja')],
+            [['script', 'digest']], 'env'
+        )
+        self.assertEqual(regenerate.RegenerateFiles.from_json(files.to_json()),
+                         files)
+
+    def test_json_no_digests(self):
+        self.assertEqual(regenerate.RegenerateFiles.from_json({
+            'inputs': [Path('build.bfg', Root.srcdir).to_json()],
+            'outputs': [],
+        }), regenerate.RegenerateFiles([Path('build.bfg', Root.srcdir)], [],
+                                       [None], None))
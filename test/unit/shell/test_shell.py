@@ -5,8 +5,8 @@ from .. import *
 
 from bfg9000.path import Root
 from bfg9000.safe_str import jbos
-from bfg9000.shell import (CalledProcessError, convert_args, execute, Mode,
-                           split_paths, which)
+from bfg9000.shell import (CalledProcessError, convert_args, execute,
+                           execute_hook, Mode, split_paths, which)
 
 base_dirs = {
     Root.srcdir: '$(srcdir)',
@@ -153,3 +153,25 @@ class TestExecute(TestCase):
     def test_shell(self):
         self.assertEqual(execute('echo hello', shell=True, stdout=Mode.pipe),
                          'hello\n')
+
+    def test_execute_hook(self):
+        hook = mock.Mock()
+        with execute_hook(hook):
+            execute([sys.executable, '-c', 'print("hello"); exit(1)'],
+                    stdout=Mode.pipe, returncode=1)
+            with self.assertRaises(OSError):
+                execute(['nonexistent-command'])
+        execute([sys.executable, '-c', 'exit()'])
+
+        self.assertEqual(hook.call_count, 2)
+        result = hook.call_args_list[0][0][0]
+        self.assertEqual(result.args, [sys.executable, '-c',
+                                       'print("hello"); exit(1)'])
+        self.assertEqual(result.returncode, 1)
+        self.assertEqual(result.output_size, 6)
+        self.assertGreaterEqual(result.duration, 0)
+
+        result = hook.call_args_list[1][0][0]
+        self.assertEqual(result.args, ['nonexistent-command'])
+        self.assertEqual(result.returncode, None)
+        self.assertEqual(result.output_size, 0)
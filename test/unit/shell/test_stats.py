@@ -0,0 +1,59 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from .. import *
+
+from bfg9000.shell import ExecuteResult
+from bfg9000.shell.stats import ExecuteStats, ToolStats
+
+
+class TestExecuteStats(TestCase):
+    def setUp(self):
+        self.stats = ExecuteStats()
+        self.stats.add(ExecuteResult(['/usr/bin/cc', '--version'], 0, 0.5,
+                                     100))
+        self.stats.add(ExecuteResult(['cc', '-v'], 1, 0.25, 2048))
+        self.stats.add(ExecuteResult('pkg-config --libs foo', 0, 1, 10))
+
+    def test_add(self):
+        self.assertEqual(self.stats.tools, {
+            'cc': ToolStats(2, 1, 0.75, 2148),
+            'pkg-config': ToolStats(1, 0, 1, 10),
+        })
+        self.assertEqual(self.stats.calls, 3)
+        self.assertEqual(self.stats.duration, 1.75)
+
+    def test_add_threads(self):
+        stats = ExecuteStats()
+        result = ExecuteResult(['cc', '--version'], 0, 1, 1)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for i in range(8):
+                executor.submit(lambda: [stats.add(result)
+                                         for j in range(1000)])
+        self.assertEqual(stats.tools['cc'], ToolStats(8000, 0, 8000, 8000))
+
+    def test_update(self):
+        other = ExecuteStats()
+        other.add(ExecuteResult(['cc', '--version'], 0, 0.25, 10))
+        other.add(ExecuteResult(['make', '--version'], 0, 0.5, 20))
+        self.stats.update(other)
+        self.assertEqual(self.stats.tools, {
+            'cc': ToolStats(3, 1, 1, 2158),
+            'make': ToolStats(1, 0, 0.5, 20),
+            'pkg-config': ToolStats(1, 0, 1, 10),
+        })
+
+    def test_not_started(self):
+        self.stats.add(ExecuteResult(['nonexist'], None, 0, 0))
+        self.assertEqual(self.stats.tools['nonexist'], ToolStats(1, 1, 0, 0))
+
+    def test_summary(self):
+        self.assertEqual(self.stats.summary(), (
+            'ran 3 subprocesses in 1.750s\n'
+            '  pkg-config     1 call      1.000s        10 B output\n'
+            '  cc             2 calls     0.750s     2.1 KiB output '
+            '(1 exited non-zero)'
+        ))
+
+    def test_summary_empty(self):
+        self.assertEqual(ExecuteStats().summary(),
+                         'ran 0 subprocesses in 0.000s')
@@ -1,4 +1,5 @@
 from io import StringIO
+from unittest import mock
 
 from . import *
 
@@ -66,6 +67,36 @@ class TestEmitDeps(TestCase):
         depfixer.emit_deps(instream, outstream)
         self.assertEqual(outstream.getvalue(), 'baz:\n')
 
+    def test_escaped_chars(self):
+        instream = StringIO('foo: bar\\ baz c\\:quux a::b\n')
+        outstream = StringIO()
+        depfixer.emit_deps(instream, outstream)
+        self.assertEqual(outstream.getvalue(),
+                         'bar\\ baz:\nc\\:quux:\na::b:\n')
+
+    def test_escaped_newline_in_dep(self):
+        instream = StringIO('foo: ba\\\nr\n')
+        outstream = StringIO()
+        depfixer.emit_deps(instream, outstream)
+        self.assertEqual(outstream.getvalue(), 'bar:\n')
+
+    def test_chunks(self):
+        data = 'foo: bar \\\n c:\\baz\\ quux\nfoo2 : a::b\n'
+        expected = 'bar:\nc:\\baz\\ quux:\na::b:\n'
+        for size in range(1, len(data) + 1):
+            instream = StringIO(data)
+            outstream = StringIO()
+            with mock.patch('bfg9000.depfixer._chunk_size', size):
+                depfixer.emit_deps(instream, outstream)
+            self.assertEqual(outstream.getvalue(), expected)
+
+    def test_no_output_on_error(self):
+        instream = StringIO('foo: bar baz :\n')
+        outstream = StringIO()
+        self.assertRaises(depfixer.UnexpectedTokenError, depfixer.emit_deps,
+                          instream, outstream)
+        self.assertEqual(outstream.getvalue(), '')
+
     def test_unexpected_newline(self):
         instream = StringIO('foo\n')
         outstream = StringIO()
@@ -1,12 +1,16 @@
 import argparse
 import re
+import subprocess
 from io import StringIO
 from unittest import mock
 
 from . import *
 
 from bfg9000 import driver, log, path
+from bfg9000.backends import list_backends
 from bfg9000.environment import EnvVersionError
+from bfg9000.shell.stats import ExecuteStats
+from bfg9000.versioning import Version
 
 
 class TestEnvironmentFromArgs(TestCase):
@@ -29,6 +33,9 @@ class TestEnvironmentFromArgs(TestCase):
             shared=True,
             static=False,
             compdb=True,
+            prefetch=None,
+            find_jobs=1,
+            merge_depfiles=False,
         )
 
     def test_basic(self):
@@ -46,6 +53,49 @@ class TestEnvironmentFromArgs(TestCase):
         driver.finalize_environment(env, self.args, ['--foo'])
         self.assertEqual(env.extra_args, ['--foo'])
 
+    def test_merge_depfiles(self):
+        self.args.merge_depfiles = True
+        env, backend = driver.environment_from_args(self.args)
+        env.backend_version = Version('4.3')
+        with mock.patch('warnings.warn') as m:
+            driver.finalize_environment(env, self.args)
+            m.assert_not_called()
+        self.assertEqual(env.merge_depfiles, True)
+
+    def test_merge_depfiles_unsupported(self):
+        self.args.merge_depfiles = True
+        for backend, version in [('make', None), ('ninja', Version('1.10')),
+                                 ('msbuild', Version('16.0'))]:
+            env, _ = driver.environment_from_args(self.args)
+            env.backend = backend
+            env.backend_version = version
+            with mock.patch('warnings.warn') as m:
+                driver.finalize_environment(env, self.args)
+                m.assert_called_once()
+            self.assertEqual(env.merge_depfiles, False)
+
+
+class TestSubprocessStats(TestCase):
+    def setUp(self):
+        list_backends._reset()
+        self.addCleanup(list_backends._reset)
+
+    def mock_run(self, args, **kwargs):
+        return subprocess.CompletedProcess(args, 0, '1.0', '')
+
+    def test_startup(self):
+        # Checking backend versions happens while building the parser, before
+        # the stats hook is installed, but should still be reported.
+        with mock.patch('bfg9000.driver._startup_stats', ExecuteStats()), \
+             mock.patch('subprocess.run', self.mock_run), \
+             mock.patch.object(driver.logger, 'info') as info:
+            driver.startup_parser(driver.simple_parser)
+            with driver.subprocess_stats(True):
+                pass
+            summary = info.call_args[0][0]
+        self.assertRegex(summary, r'(?m)^  make +1 call ')
+        self.assertRegex(summary, r'(?m)^  ninja +1 call ')
+
 
 class TestDirectoryPair(TestCase):
     def setUp(self):
@@ -1,4 +1,7 @@
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
 from . import *
 
@@ -6,6 +9,7 @@ from bfg9000.environment import Environment, EnvVarDict, LibraryMode
 from bfg9000.exceptions import ToolNotFoundError
 from bfg9000.file_types import SourceFile
 from bfg9000.path import Path, Root, InstallRoot
+from bfg9000.probe_cache import ProbeCache
 from bfg9000.tools import rm, lex, scripts  # noqa: F401
 
 this_dir = os.path.abspath(os.path.dirname(__file__))
@@ -183,6 +187,25 @@ class TestEnvironment(TestCase):
         }
         self.assertFalse(env.supports_destdir)
 
+    def test_base_dirs(self):
+        env = self.make_env()
+        base_dirs = env.base_dirs
+        self.assertEqual(base_dirs, {
+            Root.srcdir: Path('/srcdir/'),
+            Root.builddir: Path('/builddir/'),
+            InstallRoot.prefix: Path('/prefix/'),
+            InstallRoot.exec_prefix: Path('/exec-prefix/'),
+        })
+        self.assertIs(env.base_dirs, base_dirs)
+
+        env.install_dirs[InstallRoot.prefix] = Path('/other-prefix/')
+        self.assertIsNot(env.base_dirs, base_dirs)
+        self.assertEqual(env.base_dirs[InstallRoot.prefix],
+                         Path('/other-prefix/'))
+
+        env.install_dirs[InstallRoot.bindir] = None
+        self.assertEqual(env.base_dirs[InstallRoot.bindir], None)
+
     def test_builder(self):
         env = self.make_env()
         self.assertIsInstance(env.builder('lex'), lex.LexBuilder)
@@ -202,6 +225,92 @@ class TestEnvironment(TestCase):
         with self.assertRaises(TypeError):
             env.run_arguments(src, 'nonexist')
 
+    def test_prefetch(self):
+        env = self.make_env()
+        with mock.patch('bfg9000.tools.get_builder',
+                        side_effect=lambda env, lang: lang) as mbuilder, \
+             mock.patch('bfg9000.tools.get_tool',
+                        side_effect=lambda env, name: name) as mtool:
+            env.prefetch(['lex', 'yacc', 'rm'])
+            self.assertEqual(mbuilder.call_count, 2)
+            self.assertEqual(mtool.call_count, 1)
+
+            self.assertEqual(env.builder('lex'), 'lex')
+            self.assertEqual(env.builder('yacc'), 'yacc')
+            self.assertEqual(env.tool('rm'), 'rm')
+            env.prefetch(['lex', 'rm'])
+            self.assertEqual(mbuilder.call_count, 2)
+            self.assertEqual(mtool.call_count, 1)
+
+    def test_prefetch_dependent(self):
+        env = self.make_env()
+
+        def get_tool(env, name):
+            return (name, env.builder('lex'))
+
+        with mock.patch('bfg9000.tools.get_builder',
+                        side_effect=lambda env, lang: lang), \
+             mock.patch('bfg9000.tools.get_tool', side_effect=get_tool):
+            env.prefetch(['lex', 'rm'])
+            self.assertEqual(env.tool('rm'), ('rm', 'lex'))
+
+    def test_prefetch_no_duplicates(self):
+        env = self.make_env()
+
+        def get_builder(env, lang):
+            time.sleep(0.01)
+            return object()
+
+        def get_tool(env, name):
+            return (name, env.builder('lex'))
+
+        # `rm` is submitted first and asks for `lex` right away, so make sure
+        # it waits for the prefetched builder instead of making another one.
+        with mock.patch('bfg9000.tools.get_builder',
+                        side_effect=get_builder) as mbuilder, \
+             mock.patch('bfg9000.tools.get_tool', side_effect=get_tool):
+            env.prefetch(['rm', 'lex'])
+            self.assertEqual(mbuilder.call_count, 1)
+            self.assertIs(env.tool('rm')[1], env.builder('lex'))
+
+    def test_fetch_threads(self):
+        env = self.make_env()
+
+        def get_builder(env, lang):
+            time.sleep(0.01)
+            return object()
+
+        with mock.patch('bfg9000.tools.get_builder',
+                        side_effect=get_builder) as mbuilder, \
+             ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda i: env.builder('lex'),
+                                        range(4)))
+            self.assertEqual(mbuilder.call_count, 1)
+        self.assertTrue(all(i is results[0] for i in results))
+
+    def test_prefetch_error(self):
+        env = self.make_env()
+        env.prefetch(['nonexist'])
+        with self.assertRaises(ToolNotFoundError):
+            env.tool('nonexist')
+
+    def test_execute_probe(self):
+        env = self.make_env()
+        with mock.patch('bfg9000.shell.execute',
+                        return_value='output') as m:
+            self.assertEqual(env.execute(['cmd'], probe=True), 'output')
+            m.assert_called_once_with(['cmd'], env=env.variables,
+                                      base_dirs=env.base_dirs)
+
+        env.probe_cache = ProbeCache()
+        with mock.patch('bfg9000.shell.execute', return_value='output') as m, \
+             mock.patch('bfg9000.probe_cache.ProbeCache._command_stat',
+                        return_value=['/cmd', 1, 2, 3]):
+            self.assertEqual(env.execute(['cmd'], probe=True), 'output')
+            self.assertEqual(env.execute(['cmd'], probe=True), 'output')
+            self.assertEqual(env.execute(['cmd']), 'output')
+            self.assertEqual(m.call_count, 2)
+
     def test_upgrade_from_v4(self):
         env = Environment.load(
             os.path.join(test_data_dir, 'environment', 'v4')
@@ -224,6 +333,9 @@ class TestEnvironment(TestCase):
 
         self.assertEqual(env.library_mode, LibraryMode(True, False))
         self.assertEqual(env.extra_args, [])
+        self.assertEqual(env.prefetch_names, [])
+        self.assertEqual(env.find_jobs, 1)
+        self.assertEqual(env.merge_depfiles, False)
 
         variables = {'HOME': '/home/user'}
         self.assertEqual(env.variables, variables)
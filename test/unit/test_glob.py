@@ -266,3 +266,78 @@ class TestNameGlob(TestCase):
     def test_hash(self):
         self.assertEqual(hash(NameGlob('*')), hash(NameGlob('*')))
         self.assertEqual(hash(NameGlob('*')), hash(NameGlob('*', type='f')))
+
+
+class TestPathGlobSet(TestCase):
+    paths = [Path(i, root) for root in (Root.srcdir, Root.builddir) for i in (
+        '', 'file.txt', 'dir/', 'dir/file.txt', 'dir/sub/', 'dir/sub/file.txt',
+        'foo/bar/baz/file.txt', 'a/foo/bar/baz/', 'baz/bar/file.cpp',
+    )]
+
+    def assertMatchesGlobs(self, globs, skip_base=False):
+        globs = [PathGlob(i) for i in globs]
+        glob_set = PathGlobSet(globs)
+        for p in self.paths:
+            expected = PathGlob.Result.never
+            for i in globs:
+                expected |= i.match(p, skip_base)
+            self.assertEqual(glob_set.match(p, skip_base), expected, p)
+
+    def test_single(self):
+        for i in ('file*', '*', '*/', 'dir/*', 'dir/sub/*', '**', '**/',
+                  '**/file.txt', '**/*a*/**/*.txt', '**/*a*/baz/**/*.txt',
+                  'dir/**', 'dir/**/', '**/**', '[bd]*/**/*.?pp'):
+            self.assertMatchesGlobs([i])
+            self.assertMatchesGlobs([i], True)
+
+    def test_multiple(self):
+        self.assertMatchesGlobs(['dir/*', 'dir/sub/*'])
+        self.assertMatchesGlobs(['**/*.txt', '**/*.cpp'])
+        self.assertMatchesGlobs(['dir/**/', 'foo/**/*.txt', 'baz/*/*'])
+        self.assertMatchesGlobs(['*', Path('**', Root.builddir)])
+
+    def test_results(self):
+        g = PathGlobSet([PathGlob('dir/sub/*'), PathGlob('foo/**/*.txt')])
+        self.assertEqual(g.match(Path('dir/sub/file.txt', Root.srcdir)),
+                         PathGlob.Result.yes)
+        self.assertEqual(g.match(Path('dir/', Root.srcdir)),
+                         PathGlob.Result.no)
+        self.assertEqual(g.match(Path('bar/', Root.srcdir)),
+                         PathGlob.Result.never)
+        self.assertEqual(g.match(Path('foo/bar/', Root.builddir)),
+                         PathGlob.Result.no)
+
+    def test_match_subtree(self):
+        R = PathGlob.Result
+        g = PathGlobSet([PathGlob('*.c')])
+        self.assertEqual(g.match_subtree(Path('foo.c', Root.srcdir)),
+                         (R.yes, False))
+        self.assertEqual(g.match_subtree(Path('foo.c/', Root.srcdir)),
+                         (R.no, False))
+        self.assertEqual(g.match_subtree(Path('dir/', Root.srcdir)),
+                         (R.never, False))
+
+        g = PathGlobSet([PathGlob('*.c'), PathGlob('*/*.h')])
+        self.assertEqual(g.match_subtree(Path('foo.c/', Root.srcdir)),
+                         (R.no, True))
+        self.assertEqual(g.match_subtree(Path('foo.c/bar/', Root.srcdir)),
+                         (R.never, False))
+
+        g = PathGlobSet([PathGlob('dir/**/*.c')])
+        self.assertEqual(g.match_subtree(Path('dir/foo.c', Root.srcdir)),
+                         (R.yes, True))
+        self.assertEqual(g.match_subtree(Path('', Root.srcdir)),
+                         (R.no, True))
+
+
+class TestNameGlobSet(TestCase):
+    def test_match(self):
+        paths = [src_file_txt, src_dir, src_dir_file_txt, build_file_txt]
+        for globs in ([], ['file*'], ['*/'], ['dir/', '*.txt'],
+                      [NameGlob('*', type='*'), NameGlob('f*', type='d')]):
+            globs = [i if isinstance(i, NameGlob) else NameGlob(i)
+                     for i in globs]
+            glob_set = NameGlobSet(globs)
+            for p in paths:
+                self.assertEqual(glob_set.match(p),
+                                 any(i.match(p) for i in globs), p)
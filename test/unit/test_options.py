@@ -1,6 +1,7 @@
 from . import *
 
 from bfg9000 import options
+from bfg9000.packages import Framework
 
 
 class TestOptionList(TestCase):
@@ -29,6 +30,30 @@ class TestOptionList(TestCase):
         opts.append('-v')
         self.assertEqual(list(opts), ['-v', '-v'])
 
+    def test_append_unhashable(self):
+        lib = options.lib(Framework('foo'))
+        self.assertEqual(lib.match_key(), None)
+
+        opts = options.option_list()
+        opts.append(lib)
+        opts.append(options.lib(Framework('foo')))
+        opts.append(options.lib(Framework('bar')))
+        self.assertEqual(list(opts), [lib, options.lib(Framework('bar'))])
+
+    def test_append_custom_matches(self):
+        class my_option(options.Option):
+            value: str
+
+            def matches(self, rhs):
+                return type(self) is type(rhs)
+
+        self.assertEqual(my_option('foo').match_key(), None)
+
+        opts = options.option_list()
+        opts.append(my_option('foo'))
+        opts.append(my_option('bar'))
+        self.assertEqual(list(opts), [my_option('foo')])
+
     def test_extend(self):
         opts = options.option_list()
         opts.extend([options.pthread(), options.pic()])
@@ -204,6 +229,21 @@ class TestOption(TestCase):
         self.assertTrue(o1.matches(o2))
         self.assertFalse(o1.matches(o3))
 
+    def test_match_key(self):
+        my_option = options.option('my_option', value=object)
+        self.assertEqual(my_option('foo').match_key(),
+                         my_option('foo').match_key())
+        self.assertNotEqual(my_option('foo').match_key(),
+                            my_option('bar').match_key())
+        self.assertEqual(my_option({}).match_key(), None)
+        self.assertNotEqual(my_option([]).match_key(),
+                            my_option(()).match_key())
+
+        self.assertEqual(options.warning('all', 'error').match_key(),
+                         options.warning('all', 'error').match_key())
+        self.assertNotEqual(options.warning('all').match_key(),
+                            options.warning('all', 'error').match_key())
+
     def test_equality(self):
         my_option = options.option('my_option', value=object)
         o1 = my_option('foo')
@@ -232,3 +272,50 @@ class TestDefine(TestCase):
     def test_invalid_type(self):
         self.assertRaises(TypeError, options.define, 1)
         self.assertRaises(TypeError, options.define, 'NAME', 1)
+
+
+class TestForwardOptions(TestCase):
+    def lib(self, name, libs=[], packages=[], compile_options=None):
+        return AttrDict(name=name, forward_opts=options.ForwardOptions(
+            compile_options=compile_options, libs=libs, packages=packages
+        ))
+
+    def test_recurse_empty(self):
+        self.assertEqual(options.ForwardOptions.recurse([]),
+                         options.ForwardOptions())
+        self.assertEqual(options.ForwardOptions.recurse(['foo']),
+                         options.ForwardOptions())
+
+    def test_recurse(self):
+        defs = [options.define('A'), options.define('B')]
+        a = self.lib('a', packages=['pkga'],
+                     compile_options=options.option_list(defs[0]))
+        b = self.lib('b', libs=[a], packages=['pkgb'],
+                     compile_options=options.option_list(defs[1]))
+        c = self.lib('c', libs=[b, 'other'])
+
+        self.assertEqual(options.ForwardOptions.recurse([c]),
+                         options.ForwardOptions(
+                             compile_options=options.option_list(defs[1],
+                                                                 defs[0]),
+                             libs=[b, 'other', a], packages=['pkgb', 'pkga']
+                         ))
+
+    def test_recurse_diamond(self):
+        a = self.lib('a', packages=['pkg'])
+        b = self.lib('b', libs=[a])
+        c = self.lib('c', libs=[a], packages=['pkg'])
+        d = self.lib('d', libs=[b, c])
+
+        self.assertEqual(options.ForwardOptions.recurse([d, a]),
+                         options.ForwardOptions(libs=[b, c, a],
+                                                packages=['pkg']))
+        self.assertEqual(d.forward_opts.inherited().libs, [a])
+        self.assertIs(a.forward_opts.inherited(), a.forward_opts.inherited())
+
+    def test_recurse_deep(self):
+        lib = self.lib('lib0')
+        for i in range(1, 5000):
+            lib = self.lib('lib{}'.format(i), libs=[lib])
+        self.assertEqual(len(options.ForwardOptions.recurse([lib]).libs),
+                         4999)
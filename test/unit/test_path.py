@@ -1,5 +1,6 @@
 import os
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from unittest import mock
 
@@ -32,17 +33,17 @@ def mock_filesystem(*, listdir=None, exists=None, isdir=None, islink=None):
     def mock_exists(path, variables=None):
         return True
 
-    def mock_isdir(path, variables=None):
-        return not path.basename().startswith('file')
+    def mock_isdir(path):
+        return not os.path.basename(path).startswith('file')
 
-    def mock_islink(path, variables=None):
+    def mock_islink(path):
         return False
 
-    with mock.patch('os.listdir', listdir or mock_listdir) as a, \
-         mock.patch('bfg9000.path.exists', exists or mock_exists) as b, \
-         mock.patch('bfg9000.path.isdir', isdir or mock_isdir) as c, \
-         mock.patch('bfg9000.path.islink', islink or mock_islink) as d:
-        yield a, b, c, d
+    scandir = mock_scandir(listdir or mock_listdir, isdir or mock_isdir,
+                           islink or mock_islink)
+    with mock.patch('os.scandir', side_effect=scandir) as a, \
+         mock.patch('bfg9000.path.exists', exists or mock_exists) as b:
+        yield a, b
 
 
 class TestPath(PathTestCase):
@@ -376,6 +377,22 @@ class TestPath(PathTestCase):
         self.assertPathEqual(f.as_directory(), d)
         self.assertIs(d.as_directory(), d)
 
+    def test_interning(self):
+        p = self.Path('foo/bar', path.Root.srcdir)
+        self.assertIsNot(p.parent(), p.parent())
+
+        with path.interning():
+            parent = p.parent()
+            self.assertIs(p.parent(), parent)
+            self.assertIs(p.addext('.o'), p.addext('.o'))
+            self.assertIs(p.reroot(), p.reroot())
+            self.assertIsNot(p.stripext(), p.as_directory())
+            self.assertPathEqual(p.append('..'), parent)
+            self.assertIs(p.append('..'), parent)
+
+        self.assertIsNot(p.parent(), parent)
+        self.assertPathEqual(p.parent(), parent)
+
     def test_parent(self):
         p = self.Path('foo/bar', path.Root.srcdir)
         self.assertPathEqual(p.parent(), self.Path('foo/', path.Root.srcdir))
@@ -702,6 +719,25 @@ class TestPath(PathTestCase):
         p = self.Path('.', path.Root.srcdir)
         self.assertEqual(p.string(paths), ospath.join(ospath.sep, 'srcdir'))
 
+    def test_string_cache(self):
+        ospath = self.ospath
+        paths = {path.Root.srcdir: self.Path('/srcdir', path.Root.absolute)}
+        other = {path.Root.srcdir: self.Path('/other', path.Root.absolute)}
+
+        p = self.Path('foo', path.Root.srcdir)
+        with mock.patch.object(self.Path, 'realize', autospec=True,
+                               side_effect=self.Path.realize) as m:
+            self.assertEqual(p.string(paths),
+                             ospath.join(ospath.sep, 'srcdir', 'foo'))
+            self.assertEqual(m.call_count, 2)
+            self.assertEqual(p.string(paths),
+                             ospath.join(ospath.sep, 'srcdir', 'foo'))
+            self.assertEqual(m.call_count, 2)
+
+            self.assertEqual(p.string(other),
+                             ospath.join(ospath.sep, 'other', 'foo'))
+            self.assertEqual(m.call_count, 4)
+
     def test_hash(self):
         d = {self.Path('.', path.Root.srcdir),
              self.Path('.', path.Root.builddir),
@@ -861,6 +897,57 @@ class TestTouch(TestCase):
             )
 
 
+class TestUpdateFile(TestCase):
+    def setUp(self):
+        self.filename = path.Path('/foo/bar').string()
+        self.tmpname = '{}.{}.tmp'.format(self.filename, os.getpid())
+
+    @contextmanager
+    def mock_update(self, same):
+        with mock.patch('builtins.open', mock.mock_open()) as mock_open, \
+             mock.patch('bfg9000.path._same_contents',
+                        return_value=same), \
+             mock.patch('os.replace') as mock_replace, \
+             mock.patch('os.remove') as mock_remove, \
+             mock.patch('os.utime') as mock_utime:
+            yield mock_open, mock_replace, mock_remove, mock_utime
+
+    def test_changed(self):
+        with self.mock_update(False) as (m_open, m_replace, m_remove, m_utime):
+            with path.update_file(path.Path('/foo/bar')) as f:
+                f.write('contents')
+            m_open.assert_called_once_with(self.tmpname, 'w')
+            m_open().write.assert_called_once_with('contents')
+            m_replace.assert_called_once_with(self.tmpname, self.filename)
+            m_remove.assert_not_called()
+            m_utime.assert_not_called()
+
+    def test_unchanged(self):
+        with self.mock_update(True) as (m_open, m_replace, m_remove, m_utime):
+            with path.update_file(path.Path('/foo/bar'), mode='wb'):
+                pass
+            m_open.assert_called_once_with(self.tmpname, 'wb')
+            m_replace.assert_not_called()
+            m_remove.assert_called_once_with(self.tmpname)
+            m_utime.assert_not_called()
+
+    def test_unchanged_touch(self):
+        with self.mock_update(True) as (m_open, m_replace, m_remove, m_utime):
+            with path.update_file(path.Path('/foo/bar'), touch=True):
+                pass
+            m_replace.assert_not_called()
+            m_remove.assert_called_once_with(self.tmpname)
+            m_utime.assert_called_once_with(self.filename, None)
+
+    def test_error(self):
+        with self.mock_update(False) as (m_open, m_replace, m_remove, m_utime):
+            with self.assertRaises(ValueError):
+                with path.update_file(path.Path('/foo/bar')):
+                    raise ValueError()
+            m_replace.assert_not_called()
+            m_remove.assert_called_once_with(self.tmpname)
+
+
 class TestListdir(TestCase):
     path_vars = {path.Root.builddir: None}
 
@@ -871,7 +958,7 @@ class TestListdir(TestCase):
             self.assertPathListEqual(nondirs, [path.Path('file.cpp')])
 
     def test_not_found(self):
-        with mock.patch('os.listdir', side_effect=OSError()):
+        with mock.patch('os.scandir', side_effect=OSError()):
             dirs, nondirs = path.listdir(path.Path('.'), self.path_vars)
             self.assertEqual(dirs, [])
             self.assertEqual(nondirs, [])
@@ -895,8 +982,8 @@ class TestWalk(TestCase):
                              [])
 
     def test_link(self):
-        def mock_islink(path, variables=None):
-            return path.basename() == 'dir'
+        def mock_islink(path):
+            return os.path.basename(path) == 'dir'
 
         Path = path.Path
         with mock_filesystem(islink=mock_islink):
@@ -904,6 +991,134 @@ class TestWalk(TestCase):
                 (Path('.'), [Path('dir')], [Path('file.cpp')]),
             ])
 
+    def test_snapshot(self):
+        Path = path.Path
+        snapshot = path.DirectorySnapshot()
+        with mock_filesystem() as (scandir, _):
+            expected = list(path.walk(Path('.'), self.path_vars))
+            self.assertEqual(scandir.call_count, 3)
+
+            self.assertEqual(
+                list(path.walk(Path('.'), self.path_vars, snapshot)), expected
+            )
+            self.assertEqual(
+                list(path.walk(Path('dir'), self.path_vars, snapshot)),
+                expected[1:]
+            )
+            self.assertEqual(scandir.call_count, 6)
+            self.assertEqual(len(snapshot), 3)
+
+    def test_snapshot_mtime(self):
+        Path = path.Path
+        mtimes = {}
+
+        def mock_stat(p):
+            return mock.Mock(st_mtime_ns=mtimes.get(os.path.basename(p), 1))
+
+        with mock_filesystem() as (scandir, _), \
+             mock.patch('os.stat', mock_stat), \
+             mock.patch('time.time_ns', return_value=10**10):
+            snapshot = path.DirectorySnapshot()
+            expected = list(path.walk(Path('.'), self.path_vars, snapshot))
+            self.assertEqual(scandir.call_count, 3)
+            paths = path.PathTable()
+            data = snapshot.to_json(paths)
+            self.assertEqual(data, [
+                [0, 1, [1], [2], []],
+                [1, 1, [3], [4], []],
+                [3, 1, [], [], []],
+            ])
+            paths = path.PathTable.from_json(paths.to_json())
+
+            # Unchanged directories shouldn't be listed again.
+            snapshot = path.DirectorySnapshot()
+            snapshot.reuse(path.DirectorySnapshot.from_json(data, paths))
+            self.assertEqual(
+                list(path.walk(Path('.'), self.path_vars, snapshot)), expected
+            )
+            self.assertEqual(scandir.call_count, 3)
+
+            # Only changed directories should be listed again.
+            mtimes['dir'] = 2
+            snapshot = path.DirectorySnapshot()
+            snapshot.reuse(path.DirectorySnapshot.from_json(data, paths))
+            self.assertEqual(
+                list(path.walk(Path('.'), self.path_vars, snapshot)), expected
+            )
+            self.assertEqual(scandir.call_count, 4)
+
+            # Recently-modified directories shouldn't be recorded.
+            mtimes['dir'] = 10**10
+            snapshot = path.DirectorySnapshot()
+            list(path.walk(Path('.'), self.path_vars, snapshot))
+            paths = path.PathTable()
+            self.assertEqual([paths[i[0]] for i in snapshot.to_json(paths)],
+                             [Path('.'), Path('dir/sub/')])
+
+    def test_executor(self):
+        Path = path.Path
+        with mock_filesystem(), ThreadPoolExecutor(max_workers=2) as e:
+            expected = list(path.walk(Path('.'), self.path_vars))
+            self.assertEqual(
+                list(path.walk(Path('.'), self.path_vars, executor=e)),
+                expected
+            )
+
+            snapshot = path.DirectorySnapshot()
+            self.assertEqual(
+                list(path.walk(Path('.'), self.path_vars, snapshot, e)),
+                expected
+            )
+            self.assertEqual(len(snapshot), 3)
+
+    def test_prune(self):
+        Path = path.Path
+        with mock_filesystem():
+            result = []
+            for base, dirs, files in path.walk(Path('.'), self.path_vars):
+                result.append(base)
+                dirs.clear()
+            self.assertEqual(result, [Path('.')])
+
+
+class TestPathTable(TestCase):
+    def test_add(self):
+        Path = path.Path
+        paths = path.PathTable()
+        self.assertEqual(paths.add(Path('dir/file', path.Root.srcdir)), 2)
+        self.assertEqual(paths.add(Path('dir/', path.Root.srcdir)), 1)
+        self.assertEqual(paths.add(Path('dir/file', path.Root.srcdir)), 2)
+        self.assertEqual(paths.add(Path('dir', path.Root.srcdir)), 3)
+        self.assertEqual(paths.add(Path('/abs/file')), 5)
+        self.assertEqual(paths.add(Path('file', path.InstallRoot.bindir,
+                                        True)), 7)
+
+        self.assertEqual(paths[2], Path('dir/file', path.Root.srcdir))
+        self.assertEqual(paths.to_json(), [
+            [None, 'srcdir', False],
+            [0, 'dir', True],
+            [1, 'file', False],
+            [0, 'dir', False],
+            [None, 'absolute', False],
+            [4, '/abs/file', False],
+            [None, 'bindir', True],
+            [6, 'file', False],
+        ])
+
+    def test_round_trip(self):
+        Path = path.Path
+        src = [Path('.', path.Root.srcdir), Path('dir/sub/file'),
+               Path('dir/sub/'), Path('/abs/dir/'), Path('/'),
+               Path('file', path.InstallRoot.bindir, True)]
+
+        paths = path.PathTable()
+        indices = [paths.add(i) for i in src]
+        loaded = path.PathTable.from_json(paths.to_json())
+        for i, p in zip(indices, src):
+            self.assertEqual(loaded[i], p)
+            self.assertEqual(loaded[i].directory, p.directory)
+            self.assertEqual(loaded[i].to_json(), p.to_json())
+
 
 class TestPushd(TestCase):
     def test_basic(self):
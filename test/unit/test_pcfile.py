@@ -0,0 +1,377 @@
+import os
+import subprocess
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from . import *
+
+from bfg9000.pcfile import (_compare_versions, PcFile, PcFileError,
+                            PcNotFoundError, PcResolver)
+from bfg9000.shell import posix as pshell
+
+this_dir = os.path.abspath(os.path.dirname(__file__))
+pcfile_dir = os.path.join(this_dir, '..', 'data', 'pcfile')
+
+pcfiles = {
+    os.path.join('/usr/lib/pkgconfig', 'foo.pc'): """\
+prefix=/usr
+libdir=${prefix}/lib
+includedir=${prefix}/include/foo
+
+Name: foo
+Description: The foo package
+Version: 1.2
+Requires: bar >= 1.0
+Requires.private: baz
+Cflags: -I${includedir} -DFOO
+Libs: -L${libdir} -lfoo
+Libs.private: -lm
+""",
+    os.path.join('/opt/pkgconfig', 'bar.pc'): """\
+prefix=/opt
+Name: bar
+Description: The bar package
+Version: 1.1
+Cflags: -I${prefix}/include -pthread
+Libs: -L${prefix}/lib -lbar -pthread
+""",
+    os.path.join('/usr/lib/pkgconfig', 'baz.pc'): """\
+Name: baz
+Description: The baz package
+Version: 2.0
+Cflags: -I/usr/include # A system directory
+Libs: -lbaz
+""",
+    os.path.join('/usr/lib/pkgconfig', 'bad.pc'): """\
+Name: bad
+Description: The bad package
+Version: 1.0
+Requires: bar > 2.0
+""",
+    os.path.join('/usr/lib/pkgconfig', 'odd.pc'): """\
+Name: odd
+Description: The odd package
+Version: 1.0
+Libs: -L /usr/lib
+""",
+    os.path.join('/usr/lib/pkgconfig', 'dup.pc'): """\
+Name: dup
+Description: The dup package
+Version: 1.0
+Requires: bar, foo
+Cflags: -DFOO -I/opt/include
+Cflags.private: -DDUP_STATIC
+Libs: -ldup -pthread
+""",
+    os.path.join('/usr/lib/pkgconfig', 'ver.pc'): """\
+Name: ver
+Description: The ver package
+Version: 1.0
+Requires: bar >= 1.1~rc1, bar > v2, bar <= 1.1-beta(2)
+Cflags: -DVER
+""",
+    os.path.join('/usr/lib/pkgconfig', 'epoch.pc'): """\
+Name: epoch
+Description: The epoch package
+Version: 1.0
+Requires: bar >= 1:2.0
+""",
+    os.path.join('/usr/lib/pkgconfig', 'beta.pc'): """\
+Name: beta
+Description: The beta package
+Version: 1.0
+Requires: bar >= 1.1-beta(2)
+""",
+    os.path.join('/usr/lib/pkgconfig', 'nodesc.pc'): """\
+Name: nodesc
+Version: 1.0
+""",
+    os.path.join('/opt/pkgconfig', 'qux-uninstalled.pc'): """\
+Name: qux
+Description: The qux package
+Version: 1.0
+""",
+}
+
+
+# Pairs of versions and how they compare according to pkgconf.
+version_pairs = [
+    ('1.0', '1.0', 0), ('1.0', '1.00', 0), ('1.01', '1.1', 0),
+    ('1.0', '1.0.0', -1), ('1.10', '1.9', 1), ('1.0a', '1.0', 1),
+    ('1.0a', '1.0.1', -1), ('1.0~rc1', '1.0', -1), ('1.0~rc1', '1.0~rc2', -1),
+    ('1:2.0', '1.0', 1), ('1:2.0', '1.2.0', 0), ('v2', '1.0', -1),
+    ('1.0-beta(2)', '1.0', 1), ('1.0-beta(2)', '1.0.beta.2', 0),
+    ('1.0.A', '1.0.a', 0), ('1.0.A', '1.0.b', -1),
+]
+
+
+def mock_isfile(path):
+    return path in pcfiles
+
+
+def mock_open(path, *args, **kwargs):
+    return mock.mock_open(read_data=pcfiles[path])()
+
+
+class TestPcFile(TestCase):
+    def test_parse(self):
+        pc = PcFile.parse('foo', '/path/to/foo.pc', (
+            'prefix=/usr\n'
+            'libdir=${prefix}/lib # comment\n'
+            '\n'
+            'Name: foo\n'
+            'Version: 1.0\n'
+            'Requires: bar >= 1.0, baz\n'
+            'Cflags: -I"${prefix}/include dir" \\\n'
+            '  -DVALUE=\\#1\n'
+            'Libs: -L${libdir} -lfoo\n'
+            'Libs.private: -lm\n'
+        ))
+        self.assertEqual(pc.variables, {
+            'pcfiledir': '/path/to', 'pc_sysrootdir': '/', 'prefix': '/usr',
+            'libdir': '/usr/lib',
+        })
+        self.assertEqual(pc.version, '1.0')
+        self.assertEqual(pc.requires(), [('bar', ('>=', '1.0')),
+                                         ('baz', None)])
+        self.assertEqual(pc.cflags(), ['-I/usr/include dir', '-DVALUE=#1'])
+        self.assertEqual(pc.libs(), ['-L/usr/lib', '-lfoo'])
+        self.assertEqual(pc.libs_private(), ['-lm'])
+
+    def test_escaped_dollar(self):
+        pc = PcFile.parse('foo', '/foo.pc', 'var=$${value}\n')
+        self.assertEqual(pc.variables['var'], '${value}')
+
+    def test_undefined_variable(self):
+        with self.assertRaises(PcFileError):
+            PcFile.parse('foo', '/foo.pc', 'Libs: -L${libdir}\n')
+
+    def test_invalid(self):
+        with self.assertRaises(PcFileError):
+            PcFile.parse('foo', '/foo.pc', 'garbage\n')
+        with self.assertRaises(PcFileError):
+            PcFile.parse('foo', '/foo.pc', 'Name: foo\n').version
+
+
+class TestCompareVersions(TestCase):
+    def test_compare(self):
+        for a, b, expected in version_pairs:
+            self.assertEqual(_compare_versions(a, b), expected, (a, b))
+            self.assertEqual(_compare_versions(b, a), -expected, (b, a))
+
+
+class TestPcResolver(TestCase):
+    def setUp(self):
+        self.resolver = PcResolver(
+            ['/opt/pkgconfig', '/usr/lib/pkgconfig'],
+            system_include_dirs=['/usr/include'],
+            system_lib_dirs=['/usr/lib']
+        )
+
+    def query(self, fn, *args, **kwargs):
+        with mock.patch('os.path.isfile', mock_isfile), \
+             mock.patch('builtins.open', mock_open):
+            return fn(*args, **kwargs)
+
+    def test_modversion(self):
+        self.assertEqual(self.query(self.resolver.modversion, ['foo']), '1.2')
+        self.assertEqual(self.query(self.resolver.modversion, ['foo', 'bar']),
+                         '1.2\n1.1')
+
+    def test_variable(self):
+        self.assertEqual(self.query(self.resolver.variable, ['foo'],
+                                    'includedir'), '/usr/include/foo')
+        self.assertEqual(self.query(self.resolver.variable, ['foo'],
+                                    'pcfiledir'), '/usr/lib/pkgconfig')
+        self.assertEqual(self.query(self.resolver.variable, ['foo'],
+                                    'nonexist'), '')
+        with self.assertRaises(PcFileError):
+            self.query(self.resolver.variable, ['foo', 'bar'], 'prefix')
+
+    def test_requires(self):
+        self.assertEqual(self.query(self.resolver.requires, ['foo']),
+                         ['bar >= 1.0'])
+        self.assertEqual(self.query(self.resolver.requires, ['bar']), [])
+
+    def test_cflags(self):
+        self.assertEqual(self.query(self.resolver.cflags, ['foo'], 'I'),
+                         ['-I/usr/include/foo', '-I/opt/include'])
+        self.assertEqual(self.query(self.resolver.cflags, ['foo'], 'other'),
+                         ['-DFOO', '-pthread'])
+
+    def test_libs(self):
+        self.assertEqual(self.query(self.resolver.libs, ['foo'], 'L'),
+                         ['-L/opt/lib'])
+        self.assertEqual(self.query(self.resolver.libs, ['foo'], 'l'),
+                         ['-lfoo', '-lbar'])
+        self.assertEqual(self.query(self.resolver.libs, ['foo'], 'l', True),
+                         ['-lfoo', '-lm', '-lbar', '-lbaz'])
+        self.assertEqual(self.query(self.resolver.libs, ['foo'], 'other'),
+                         ['-pthread'])
+
+    def test_duplicates(self):
+        # Flags from packages we see more than once are merged like pkgconf:
+        # -I and -L keep their first occurrence, while libraries and other
+        # flags move to their last.
+        self.assertEqual(self.query(self.resolver.cflags, ['dup'], 'I'),
+                         ['-I/opt/include', '-I/usr/include/foo'])
+        self.assertEqual(self.query(self.resolver.cflags, ['dup'], 'other'),
+                         ['-DFOO', '-pthread'])
+        self.assertEqual(self.query(self.resolver.libs, ['dup'], 'l'),
+                         ['-ldup', '-lfoo', '-lbar'])
+        self.assertEqual(self.query(self.resolver.libs, ['dup'], 'other'),
+                         ['-pthread'])
+
+    def test_static(self):
+        self.assertEqual(self.query(self.resolver.cflags, ['dup'], 'other',
+                                    True),
+                         ['-DFOO', '-pthread', '-DDUP_STATIC'])
+        self.assertEqual(self.query(self.resolver.libs, ['dup'], 'l', True),
+                         ['-ldup', '-lfoo', '-lm', '-lbar', '-lbaz'])
+
+    def test_version_requirements(self):
+        self.assertEqual(self.query(self.resolver.cflags, ['ver'], 'other'),
+                         ['-DVER', '-pthread'])
+        # pkgconf compares versions like RPM, so `1:2.0` is like `1.2.0` and
+        # `1.1-beta(2)` is newer than `1.1`.
+        for i in ('epoch', 'beta'):
+            with self.assertRaises(PcFileError):
+                self.query(self.resolver.cflags, [i], 'other')
+
+    def test_allow_system(self):
+        resolver = PcResolver(
+            ['/opt/pkgconfig', '/usr/lib/pkgconfig'],
+            system_include_dirs=['/usr/include'],
+            system_lib_dirs=['/usr/lib'], allow_system_cflags=True,
+            allow_system_libs=True
+        )
+        self.assertEqual(self.query(resolver.cflags, ['baz'], 'I'),
+                         ['-I/usr/include'])
+        self.assertEqual(self.query(resolver.libs, ['foo'], 'L'),
+                         ['-L/usr/lib', '-L/opt/lib'])
+
+    def test_not_found(self):
+        with self.assertRaises(PcNotFoundError):
+            self.query(self.resolver.modversion, ['nonexist'])
+
+    def test_unsupported(self):
+        # Missing or unsatisfied requirements are left to pkg-config.
+        with self.assertRaises(PcFileError):
+            self.query(self.resolver.cflags, ['bad'], 'I')
+        # So are uninstalled packages...
+        with self.assertRaises(PcFileError):
+            self.query(self.resolver.modversion, ['qux'])
+        # ... and weird flags...
+        with self.assertRaises(PcFileError):
+            self.query(self.resolver.libs, ['odd'], 'L')
+        # ... and files missing required fields...
+        with self.assertRaises(PcFileError):
+            self.query(self.resolver.modversion, ['nodesc'])
+        # ... and large dependency graphs.
+        self.resolver.max_visits = 2
+        with self.assertRaises(PcFileError):
+            self.query(self.resolver.libs, ['dup'], 'l')
+
+    def test_disable_uninstalled(self):
+        resolver = PcResolver(['/opt/pkgconfig'], disable_uninstalled=True)
+        with self.assertRaises(PcNotFoundError):
+            self.query(resolver.modversion, ['qux'])
+
+
+def pkg_config(args, env):
+    try:
+        return subprocess.run(
+            [os.getenv('PKG_CONFIG', 'pkg-config')] + args, env=env,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            universal_newlines=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Only run pkg-config with the PKG_CONFIG_* variables we set ourselves.
+clean_env = {k: v for k, v in os.environ.items()
+             if not k.startswith('PKG_CONFIG_')}
+# The resolver mimics pkgconf, which (unlike the reference pkg-config) reports
+# its system directories.
+pkgconf_system_dirs = [pkg_config(['--variable=' + i, 'pkg-config'],
+                                  clean_env)
+                       for i in ('pc_system_includedirs', 'pc_system_libdirs')]
+
+
+@skip_if(not all(pkgconf_system_dirs), 'pkgconf not found')
+class TestPcResolverPkgconf(TestCase):
+    # Compare the resolver's results with pkgconf's for real .pc files.
+    queries = [('cflags', 'I'), ('cflags', 'other'), ('libs', 'L'),
+               ('libs', 'l'), ('libs', 'other')]
+    max_installed = 25
+
+    def assertMatchesPkgconf(self, resolver, name, env):
+        for kind, only in self.queries:
+            for static in (False, True):
+                args = [name, '--{}-only-{}'.format(kind, only)]
+                if static:
+                    args.append('--static')
+                expected = pkg_config(args, env)
+                fn = resolver.cflags if kind == 'cflags' else resolver.libs
+                self.assertEqual(fn([name], only, static),
+                                 pshell.split(expected, escapes=True),
+                                 ' '.join(args))
+
+    def test_data(self):
+        search_dirs = [os.path.join(pcfile_dir, i)
+                       for i in ('first', 'second')]
+        env = dict(clean_env, PKG_CONFIG_LIBDIR=os.pathsep.join(search_dirs),
+                   PKG_CONFIG_SYSTEM_INCLUDE_PATH='/usr/include',
+                   PKG_CONFIG_SYSTEM_LIBRARY_PATH='/usr/lib')
+        resolver = PcResolver(search_dirs,
+                              system_include_dirs=['/usr/include'],
+                              system_lib_dirs=['/usr/lib'])
+
+        for i in search_dirs:
+            for j in sorted(os.listdir(i)):
+                name = os.path.splitext(j)[0]
+                with self.subTest(name=name):
+                    self.assertMatchesPkgconf(resolver, name, env)
+
+    def test_versions(self):
+        with TemporaryDirectory() as tmpdir:
+            env = dict(clean_env, PKG_CONFIG_LIBDIR=tmpdir)
+            for a, b, expected in version_pairs:
+                with open(os.path.join(tmpdir, 'pkg.pc'), 'w') as f:
+                    f.write('Name: pkg\nDescription: pkg\nVersion: {}\n'
+                            .format(a))
+                for op, result in (('atleast', expected >= 0),
+                                   ('exact', expected == 0),
+                                   ('max', expected <= 0)):
+                    arg = '--{}-version={}'.format(op, b)
+                    self.assertEqual(pkg_config([arg, 'pkg'], env) is not None,
+                                     result, '{} {}'.format(a, arg))
+
+    def test_installed(self):
+        search_dirs = pkg_config(['--variable=pc_path', 'pkg-config'],
+                                 clean_env)
+        packages = pkg_config(['--list-all'], clean_env)
+        if not search_dirs or not packages:
+            raise self.skipTest('no installed packages')
+
+        include_dirs, lib_dirs = (i.split(os.pathsep)
+                                  for i in pkgconf_system_dirs)
+        resolver = PcResolver(search_dirs.split(os.pathsep),
+                              system_include_dirs=include_dirs,
+                              system_lib_dirs=lib_dirs)
+
+        # Only check packages the resolver can handle; it falls back to
+        # pkg-config for everything else.
+        checked = 0
+        for name in sorted(i.split(' ')[0] for i in packages.splitlines()):
+            try:
+                resolver.libs([name], 'l', True)
+                resolver.cflags([name], 'I', True)
+            except (PcFileError, PcNotFoundError):
+                continue
+            with self.subTest(name=name):
+                self.assertMatchesPkgconf(resolver, name, clean_env)
+            checked += 1
+            if checked == self.max_installed:
+                break
@@ -0,0 +1,166 @@
+import json
+import os
+from unittest import mock
+
+from . import *
+
+from bfg9000 import shell
+from bfg9000.probe_cache import ProbeCache
+
+
+def mock_stat(path):
+    return mock.Mock(st_mtime_ns=1, st_ino=2, st_size=3)
+
+
+def mock_execute(args, **kwargs):
+    if '--fail' in args:
+        raise shell.ExecutionError(1, args, 'output', None)
+    return 'version 1.0'
+
+
+class TestProbeCache(TestCase):
+    def setUp(self):
+        self.env = {'PATH': '/usr/bin', 'CFLAGS': '-O2'}
+
+    def execute(self, cache, args, **kwargs):
+        with mock.patch('bfg9000.shell.which', mock_which), \
+             mock.patch('os.stat', mock_stat), \
+             mock.patch('bfg9000.shell.execute',
+                        side_effect=mock_execute) as m:
+            return cache.execute(args, env=self.env, **kwargs), m.call_count
+
+    def test_execute(self):
+        cache = ProbeCache()
+        self.assertEqual(self.execute(cache, ['cc', '--version']),
+                         ('version 1.0', 1))
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(self.execute(cache, ['cc', '--version']),
+                         ('version 1.0', 0))
+        self.assertEqual(len(cache), 1)
+
+    def test_different_args(self):
+        cache = ProbeCache()
+        self.assertEqual(self.execute(cache, ['cc', '--version']),
+                         ('version 1.0', 1))
+        self.assertEqual(self.execute(cache, ['cc', '-v']),
+                         ('version 1.0', 1))
+        self.assertEqual(self.execute(cache, ['cc', '--version'],
+                                      stdout=shell.Mode.pipe),
+                         ('version 1.0', 1))
+        self.assertEqual(len(cache), 3)
+
+    def test_different_env(self):
+        cache = ProbeCache()
+        self.assertEqual(self.execute(cache, ['cc', '--version']),
+                         ('version 1.0', 1))
+        self.env['CFLAGS'] = '-O3'
+        self.assertEqual(self.execute(cache, ['cc', '--version']),
+                         ('version 1.0', 1))
+        self.env['UNRELATED'] = 'value'
+        self.assertEqual(self.execute(cache, ['cc', '--version']),
+                         ('version 1.0', 0))
+
+    def test_changed_command(self):
+        cache = ProbeCache()
+        self.assertEqual(self.execute(cache, ['cc', '--version']),
+                         ('version 1.0', 1))
+        with mock.patch('bfg9000.probe_cache.ProbeCache._command_stat',
+                        return_value=['/cc', 4, 5, 6]):
+            self.assertEqual(self.execute(cache, ['cc', '--version']),
+                             ('version 1.0', 1))
+
+    def test_missing_command(self):
+        cache = ProbeCache()
+        with mock.patch('bfg9000.shell.which', mock_bad_which), \
+             mock.patch('bfg9000.shell.execute',
+                        side_effect=mock_execute) as m:
+            self.assertEqual(cache.execute(['cc', '--version'], env=self.env),
+                             'version 1.0')
+            self.assertEqual(m.call_count, 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_error(self):
+        cache = ProbeCache()
+        for i in range(2):
+            with self.assertRaises(shell.CalledProcessError) as e, \
+                 mock.patch('bfg9000.shell.which', mock_which), \
+                 mock.patch('os.stat', mock_stat), \
+                 mock.patch('bfg9000.shell.execute',
+                            side_effect=mock_execute) as m:
+                cache.execute(['cc', '--fail'], env=self.env)
+            self.assertEqual(e.exception.returncode, 1)
+            self.assertEqual(e.exception.stdout, 'output')
+            self.assertEqual(m.call_count, 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_save(self):
+        cache = ProbeCache()
+        with mock.patch('builtins.open'), \
+             mock.patch('json.dump') as mock_dump:
+            cache.save('path')
+            mock_dump.assert_not_called()
+
+        self.execute(cache, ['cc', '--version'])
+        with mock.patch('builtins.open') as mock_open, \
+             mock.patch('json.dump') as mock_dump:
+            cache.save('path')
+            mock_open.assert_called_once_with(
+                os.path.join('path', '.bfg_probe_cache'), 'w'
+            )
+            mock_dump.assert_called_once()
+            data = mock_dump.call_args[0][0]
+            self.assertEqual(data['version'], 1)
+            self.assertEqual(list(data['data'].values()),
+                             [{'result': 'version 1.0'}])
+
+            mock_dump.reset_mock()
+            cache.save('path')
+            mock_dump.assert_not_called()
+
+    def test_load(self):
+        cache = ProbeCache()
+        self.execute(cache, ['cc', '--version'])
+        key = next(iter(cache._entries))
+
+        data = json.dumps({'version': 1,
+                           'data': {key: {'result': 'cached'}}})
+        with mock.patch('builtins.open', mock.mock_open(read_data=data)):
+            cache = ProbeCache.load('path')
+        self.assertEqual(self.execute(cache, ['cc', '--version']),
+                         ('cached', 0))
+
+    def test_prune(self):
+        cache = ProbeCache()
+        self.execute(cache, ['cc', '--version'])
+        data = json.dumps({'version': 1, 'data': {
+            next(iter(cache._entries)): {'result': 'cached'},
+            'unused': {'result': 'value'},
+        }})
+        with mock.patch('builtins.open', mock.mock_open(read_data=data)):
+            cache = ProbeCache.load('path')
+        self.assertEqual(len(cache), 2)
+        self.execute(cache, ['cc', '--version'])
+
+        with mock.patch('builtins.open'), \
+             mock.patch('json.dump') as mock_dump:
+            cache.save('path')
+            self.assertEqual(list(mock_dump.call_args[0][0]['data'].values()),
+                             [{'result': 'cached'}])
+        self.assertEqual(len(cache), 1)
+
+    def test_load_error(self):
+        data = json.dumps({'version': 1, 'data': {
+            'key': {'error': [1, 'output', None]},
+        }})
+        with mock.patch('builtins.open', mock.mock_open(read_data=data)):
+            self.assertEqual(len(ProbeCache.load('path')), 0)
+
+    def test_load_missing(self):
+        with mock.patch('builtins.open', side_effect=FileNotFoundError()):
+            self.assertEqual(len(ProbeCache.load('path')), 0)
+
+    def test_load_bad_version(self):
+        with mock.patch('builtins.open', mock.mock_open(read_data="""\
+            {"version": 999, "data": {"key": {"result": "value"}}}
+        """)):
+            self.assertEqual(len(ProbeCache.load('path')), 0)
@@ -0,0 +1,89 @@
+from unittest import mock
+
+from . import *
+
+from bfg9000 import profiler
+from bfg9000.backends import BuildHook, BuildRuleHandler
+
+
+class TestProfiler(TestCase):
+    def tearDown(self):
+        profiler.disable()
+
+    def test_disabled(self):
+        self.assertFalse(profiler.enabled())
+        with profiler.phase('foo', 'test'):
+            pass
+        self.assertEqual(profiler.events(), [])
+
+    def test_phase(self):
+        profiler.enable()
+        self.assertTrue(profiler.enabled())
+        with profiler.phase('foo', 'test'):
+            with profiler.phase('bar', 'test', value=1):
+                pass
+
+        bar, foo = profiler.events()
+        self.assertEqual(foo['name'], 'foo')
+        self.assertEqual(foo['cat'], 'test')
+        self.assertEqual(foo['ph'], 'X')
+        self.assertNotIn('args', foo)
+        self.assertEqual(bar['name'], 'bar')
+        self.assertEqual(bar['args'], {'value': 1})
+        self.assertGreaterEqual(bar['ts'], foo['ts'])
+        self.assertLessEqual(bar['dur'], foo['dur'])
+
+    def test_phase_exception(self):
+        profiler.enable()
+        with self.assertRaises(ValueError), \
+             profiler.phase('foo', 'test'):
+            raise ValueError()
+        self.assertEqual([i['name'] for i in profiler.events()], ['foo'])
+
+    def test_profiling(self):
+        with mock.patch('builtins.open', mock.mock_open()), \
+             mock.patch('json.dump') as m:
+            with profiler.profiling('trace.json', 'configure'):
+                self.assertTrue(profiler.enabled())
+                with profiler.phase('foo', 'test'):
+                    pass
+            self.assertFalse(profiler.enabled())
+
+        trace = m.call_args[0][0]
+        self.assertEqual([i['name'] for i in trace['traceEvents']],
+                         ['foo', 'configure'])
+
+    def test_profiling_disabled(self):
+        with mock.patch('builtins.open', mock.mock_open()) as m:
+            with profiler.profiling(None, 'configure'):
+                self.assertFalse(profiler.enabled())
+        m.assert_not_called()
+
+
+class TestProfileBackend(TestCase):
+    def tearDown(self):
+        profiler.disable()
+
+    def test_rule_handler(self):
+        handler = BuildRuleHandler()
+        fn = mock.Mock()
+        handler(int, str)(fn)
+
+        profiler.enable()
+        handler.run([1, 'foo'], 'arg')
+        self.assertEqual(fn.mock_calls, [mock.call(1, 'arg'),
+                                         mock.call('foo', 'arg')])
+        self.assertEqual([(i['name'], i['cat']) for i in profiler.events()],
+                         [('int', 'rule_handler'), ('str', 'rule_handler')])
+
+    def test_hook(self):
+        hook = BuildHook()
+
+        @hook
+        def my_hook(arg):
+            pass
+
+        profiler.enable()
+        hook.run('arg')
+        self.assertEqual([(i['name'], i['cat']) for i in profiler.events()],
+                         [('my_hook', 'hook')])
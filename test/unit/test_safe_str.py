@@ -1,4 +1,4 @@
-from bfg9000 import safe_str
+from bfg9000 import path, safe_str
 
 from . import *
 
@@ -182,6 +182,31 @@ class TestJbos(TestCase):
         self.assertFalse(jbos('foo') == jbos('foo', literal('bar')))
         self.assertTrue(jbos('foo') != jbos('foo', literal('bar')))
 
+    def test_concatenate_shared(self):
+        # Appending to the same jbos more than once shouldn't affect the
+        # original or any of the other results.
+        base = jbos('foo', literal('bar'))
+        a = base + 'baz'
+        b = base + literal('quux')
+        c = a + a
+        self.assertEqual(base.bits, ('foo', literal('bar')))
+        self.assertEqual(a.bits, ('foo', literal('bar'), 'baz'))
+        self.assertEqual(b.bits, ('foo', literal('barquux')))
+        self.assertEqual(c.bits, ('foo', literal('bar'), 'bazfoo',
+                                  literal('bar'), 'baz'))
+
+        d = a + 'x'
+        e = a + 'y'
+        self.assertEqual(d.bits, ('foo', literal('bar'), 'bazx'))
+        self.assertEqual(e.bits, ('foo', literal('bar'), 'bazy'))
+        self.assertEqual(a.bits, ('foo', literal('bar'), 'baz'))
+
+    def test_concatenate_many(self):
+        s = jbos()
+        for i in range(1000):
+            s = s + 'a' + literal('b')
+        self.assertEqual(s.bits, ('a', literal('b')) * 1000)
+
 
 class TestJoin(TestCase):
     def test_join_empty(self):
@@ -212,6 +237,50 @@ class TestJoin(TestCase):
         self.assertEqual(s.bits, (shell_literal('foo,'), 'bar'))
 
 
+class TestRenderKey(TestCase):
+    def assertSameKey(self, a, b):
+        self.assertEqual(safe_str.render_key(a), safe_str.render_key(b))
+        self.assertEqual(hash(safe_str.render_key(a)),
+                         hash(safe_str.render_key(b)))
+
+    def assertDifferentKey(self, a, b):
+        self.assertNotEqual(safe_str.render_key(a), safe_str.render_key(b))
+
+    def test_string(self):
+        self.assertSameKey('foo', 'foo')
+        self.assertDifferentKey('foo', 'bar')
+
+    def test_literal(self):
+        self.assertSameKey(literal('foo'), literal('foo'))
+        self.assertDifferentKey(literal('foo'), literal('bar'))
+        self.assertDifferentKey(literal('foo'), shell_literal('foo'))
+        self.assertDifferentKey(literal('foo'), 'foo')
+
+    def test_jbos(self):
+        self.assertSameKey(jbos('foo', literal('bar')),
+                           jbos('f', 'oo', literal('bar')))
+        self.assertDifferentKey(jbos('foo', literal('bar')),
+                                jbos('foo', shell_literal('bar')))
+
+    def test_path(self):
+        self.assertSameKey(path.Path('foo'), path.Path('foo'))
+        self.assertDifferentKey(path.Path('foo'),
+                                path.Path('foo', path.Root.srcdir))
+        self.assertDifferentKey(path.Path('foo'), 'foo')
+
+    def test_safe_str(self):
+        self.assertSameKey(MyString(), 'foo')
+        self.assertSameKey(MyLiteral(), literal('foo'))
+
+    def test_iterable(self):
+        self.assertSameKey(['foo', literal('bar')], ('foo', literal('bar')))
+        self.assertDifferentKey(['foo', 'bar'], ['foo bar'])
+
+    def test_invalid(self):
+        self.assertRaises(TypeError, safe_str.render_key, 1)
+        self.assertRaises(TypeError, safe_str.render_key, MySafeStr(1))
+
+
 class TestSafeFormat(TestCase):
     def test_simple(self):
         self.assertEqual(safe_str.safe_format('foo'), 'foo')
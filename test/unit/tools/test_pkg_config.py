@@ -1,9 +1,13 @@
+import os
+
 from . import *
 
 from bfg9000 import options as opts
+from bfg9000.exceptions import PackageResolutionError
 from bfg9000.file_types import Directory, HeaderDirectory
 from bfg9000.iterutils import first
 from bfg9000.path import Path
+from bfg9000.probe_cache import ProbeCache
 from bfg9000.shell import CalledProcessError
 from bfg9000.tools.pkg_config import PkgConfig, PkgConfigPackage
 from bfg9000.packages import PackageKind
@@ -292,3 +296,146 @@ class TestPkgConfigPackage(ToolTestCase):
                 '-pthread', opts.lib_dir(Directory(Path('/usr/lib'))),
                 opts.lib_literal('-lfoo'), opts.lib_literal('-lstatic')
             ))
+
+
+class TestPkgConfigProbeCache(ToolTestCase):
+    tool_type = PkgConfig
+
+    def setUp(self):
+        with mock.patch('bfg9000.shell.execute', mock_execute_cc):
+            super().setUp()
+        self.env.probe_cache = ProbeCache()
+        self.pc_mtime = 1
+
+    def mock_execute(self, args, **kwargs):
+        if '--variable=pc_path' in args:
+            return '/usr/lib/pkgconfig\n'
+        return mock_execute(args, **kwargs)
+
+    def mock_scandir(self, path):
+        entries = [AttrDict(name='foo.pc', stat=lambda: AttrDict(
+            st_mtime_ns=self.pc_mtime, st_size=10
+        ))] if path == '/usr/lib/pkgconfig' else []
+        scandir = mock.MagicMock()
+        scandir.__enter__.return_value = iter(entries)
+        return scandir
+
+    def make_package(self):
+        with mock.patch('bfg9000.probe_cache.ProbeCache._command_stat',
+                        return_value=['/pkg-config', 1, 2, 3]), \
+             mock.patch.object(PkgConfig, '_native_run', return_value=None), \
+             mock.patch('os.scandir', self.mock_scandir), \
+             mock.patch('bfg9000.shell.execute',
+                        side_effect=self.mock_execute) as m:
+            pkg = PkgConfigPackage(self.tool, 'foo', format='elf')
+            self.assertEqual(pkg.version, Version('1.0'))
+            self.assertEqual(pkg.include_dirs(), [Path('/usr/include')])
+            return m.call_count
+
+    def test_reuse(self):
+        self.assertEqual(self.make_package(), 4)
+        self.assertEqual(self.make_package(), 0)
+
+    def test_changed_pc_file(self):
+        self.assertEqual(self.make_package(), 4)
+        self.pc_mtime = 2
+        self.tool._search_stamp._reset(self.tool)
+        self.assertEqual(self.make_package(), 3)
+
+    def test_no_default_path(self):
+        def mock_execute_no_path(args, **kwargs):
+            if '--variable=pc_path' in args:
+                raise CalledProcessError(1, args)
+            return mock_execute(args, **kwargs)
+
+        for i in range(2):
+            with mock.patch('bfg9000.shell.execute',
+                            side_effect=mock_execute_no_path) as m:
+                PkgConfigPackage(self.tool, 'foo', format='elf')
+                self.assertEqual(m.call_count, 3 - i)
+        self.assertEqual(len(self.env.probe_cache), 0)
+
+
+class TestPkgConfigNative(ToolTestCase):
+    tool_type = PkgConfig
+
+    pcfile = ('prefix=/usr/local\n'
+              'Name: foo\n'
+              'Description: The foo package\n'
+              'Version: 2.0\n'
+              'Cflags: -I${prefix}/include -DMACRO\n'
+              'Libs: -L${prefix}/lib -lfoo -pthread\n'
+              'Libs.private: -lstatic\n')
+
+    def setUp(self):
+        with mock.patch('bfg9000.shell.execute', mock_execute_cc):
+            super().setUp()
+
+    def mock_execute(self, args, **kwargs):
+        if '--variable=pc_path' in args:
+            return '/usr/lib/pkgconfig\n'
+        elif '--variable=pc_system_includedirs' in args:
+            return '/usr/include\n'
+        elif '--variable=pc_system_libdirs' in args:
+            return '/usr/lib\n'
+        return mock_execute(args, **kwargs)
+
+    def mock_execute_pkg_config(self, args, **kwargs):
+        # The reference pkg-config doesn't report its system directories.
+        if '--variable=pc_path' in args:
+            return '/usr/lib/pkgconfig\n'
+        elif '--variable=pc_system_' in args[-2]:
+            return '\n'
+        return mock_execute(args, **kwargs)
+
+    def mock_isfile(self, path):
+        return path == os.path.join('/usr/lib/pkgconfig', 'foo.pc')
+
+    def make_package(self, *args, mock_execute=None, **kwargs):
+        with mock.patch('os.path.isfile', self.mock_isfile), \
+             mock.patch('builtins.open',
+                        mock.mock_open(read_data=self.pcfile)), \
+             mock.patch('bfg9000.shell.execute',
+                        side_effect=mock_execute or self.mock_execute) as m:
+            pkg = PkgConfigPackage(self.tool, *args, format='elf', **kwargs)
+            return pkg, m
+
+    def test_native(self):
+        pkg, m = self.make_package('foo', kind=PackageKind.static)
+        if self.env.host_platform.family == 'windows':
+            self.assertEqual(pkg.version, Version('1.0'))
+            return
+
+        self.assertEqual(m.call_count, 3)
+        self.assertEqual(pkg.version, Version('2.0'))
+        self.assertEqual(pkg.include_dirs(), [Path('/usr/local/include')])
+        self.assertEqual(pkg.lib_dirs(), [Path('/usr/local/lib')])
+        self.assertEqual(pkg.compile_options(None, raw=True), opts.option_list(
+            '-DMACRO',
+            opts.include_dir(HeaderDirectory(Path('/usr/local/include')))
+        ))
+
+    def test_not_pkgconf(self):
+        pkg, m = self.make_package(
+            'foo', mock_execute=self.mock_execute_pkg_config
+        )
+        self.assertEqual(pkg.version, Version('1.0'))
+
+    def test_system_dirs(self):
+        self.env.variables['PKG_CONFIG_SYSTEM_LIBRARY_PATH'] = '/usr/local/lib'
+        pkg, m = self.make_package('foo')
+        if self.env.host_platform.family == 'windows':
+            return
+        self.assertEqual(pkg.version, Version('2.0'))
+        self.assertEqual(pkg.lib_dirs(), [])
+
+    def test_not_found(self):
+        if self.env.host_platform.family == 'windows':
+            return
+        with self.assertRaises(PackageResolutionError):
+            self.make_package('nonexist')
+
+    def test_sysroot(self):
+        self.env.variables['PKG_CONFIG_SYSROOT_DIR'] = '/sysroot'
+        pkg, m = self.make_package('foo')
+        self.assertEqual(pkg.version, Version('1.0'))